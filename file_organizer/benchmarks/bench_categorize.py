@@ -0,0 +1,68 @@
+"""
+Benchmark: Categorizer.update_database, row by row versus bulk.
+
+Fills a temporary catalog with uncategorized synthetic paths (mostly known
+extensions, some unknown ones and names matching the filename patterns),
+then categorizes it with one UPDATE per file (bulk=False) and with the
+set-based bulk mode, and checks that both assign the same categories.
+
+Usage:
+    python benchmarks/bench_categorize.py --rows 2000000
+"""
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from categorizer import Categorizer
+from connection import connect
+from schema import ensure_schema
+
+EXTENSIONS = ['pdf', 'JPG', 'dwg', 'py', 'zip', 'mp4', 'docx', 'xlsx', 'txt', 'png', 'xyz', 'tmp', '']
+STEMS = ['file', 'Screenshot', 'invoice', 'report', 'photo', 'notes', 'cad model']
+
+
+def fill(db_path: str, rows: int):
+    rng = random.Random(42)
+    conn = connect(db_path, 'bulk')
+    ensure_schema(conn)
+
+    def generate():
+        for i in range(rows):
+            ext = rng.choice(EXTENSIONS)
+            name = f"{rng.choice(STEMS)} {i}" + (f".{ext}" if ext else '')
+            yield f"/share/project{i % 50}/dir{i % 997}/{name}", name, f".{ext.lower()}" if ext else None
+
+    conn.executemany("INSERT INTO files (path, name, extension) VALUES (?, ?, ?)", generate())
+    conn.commit()
+    return conn
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=500000, help='Synthetic rows')
+    parser.add_argument('--categories', default=str(Path(__file__).parent.parent / 'config' / 'categories.yaml'))
+    args = parser.parse_args()
+
+    categorizer = Categorizer(args.categories)
+    with tempfile.TemporaryDirectory() as tmp:
+        results = []
+        for bulk in (False, True):
+            conn = fill(str(Path(tmp) / f"bench_{bulk}.db"), args.rows)
+            start = time.perf_counter()
+            categorizer.update_database(conn, bulk=bulk)
+            seconds = time.perf_counter() - start
+            results.append((seconds, conn.execute(
+                "SELECT category, subcategory FROM files ORDER BY id").fetchall()))
+            conn.close()
+        (slow, expected), (fast, categories) = results
+        print(f"{args.rows} rows: per row {slow:.2f} s, bulk {fast:.2f} s, "
+              f"{slow / fast:.1f}x{'' if categories == expected else '  MISMATCH'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark: filename pattern matching with many patterns.
+
+Compares the former Categorizer loop (one case-insensitive \\b-delimited
+regex per keyword, tried in order) with FilenameMatcher (one word scan and
+a dict lookup per word) on synthetic file names, for a growing number of
+keyword patterns. Both must pick the same pattern for every name.
+
+Usage:
+    python benchmarks/bench_filename_patterns.py --names 200000 --patterns 500
+"""
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from categorizer import FilenameMatcher
+
+DEFAULT = {'category': 'Miscellaneous', 'subcategory': 'Unknown'}
+WORDS = ['final', 'draft', 'copy', 'scan', 'v2', 'notes', 'IMG', 'backup', 'new', 'old']
+
+
+def regex_loop(patterns, name):
+    """Categorizer.categorize_by_filename before FilenameMatcher."""
+    for pattern, cats in patterns:
+        if pattern.search(name):
+            return cats
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--names', type=int, default=200000, help='Synthetic file names')
+    parser.add_argument('--patterns', type=int, default=500, help='Largest number of keyword patterns')
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    keywords = [f"kw{i:04d}" for i in range(args.patterns)]
+    names = []
+    for i in range(args.names):
+        words = rng.sample(WORDS, 3)
+        if rng.random() < 0.5:
+            words.insert(rng.randrange(4), rng.choice(keywords).upper())
+        names.append(f"{'_'.join(words[:2])} {' '.join(words[2:])} {i}.bin")
+
+    count = 10
+    while True:
+        count = min(count, args.patterns)
+        entries = [{'keywords': [keyword], 'category': 'Pattern', 'subcategory': keyword}
+                   for keyword in keywords[:count]]
+        patterns = [(re.compile(rf"(?i)\b{keyword}\b"), ('Pattern', keyword))
+                    for keyword in keywords[:count]]
+        start = time.perf_counter()
+        expected = [regex_loop(patterns, name) for name in names]
+        slow = time.perf_counter() - start
+        matcher = FilenameMatcher(entries, DEFAULT)
+        start = time.perf_counter()
+        matched = [matcher.match(name) for name in names]
+        fast = time.perf_counter() - start
+        print(f"{count} patterns, {args.names} names: regex loop {slow:.2f} s, "
+              f"matcher {fast:.2f} s, {slow / fast:.1f}x{'' if matched == expected else '  MISMATCH'}")
+        if count == args.patterns:
+            break
+        count *= 5
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark: links per second of LinkCreator.create_links.
+
+Links a synthetic view of N mappings (sources do not need to exist for
+symbolic links) into a fresh directory on each given file system, first
+the former way (one mkdir call per link, one thread), then with the target
+directories created once and the links created by 1, 4 and 8 threads.
+By default it runs on tmpfs (/dev/shm) and in the system temp directory
+(usually ext4 or similar); pass --dirs to measure e.g. a network share.
+
+Usage:
+    python benchmarks/bench_link_create.py --links 100000 --dirs /dev/shm /tmp
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from link_creator import LinkCreator
+
+
+def mappings(count: int):
+    for i in range(count):
+        yield {'source_path': f"/data/share{i % 7}/file_{i}.pdf",
+               'target_path': f"Cat{i % 20}/Sub{i % 300}/file_{i}.pdf"}
+
+
+def legacy_creator(creator: LinkCreator) -> LinkCreator:
+    """create_links as before directories were created up front: mkdir per link."""
+    create = creator._create_single_link
+    creator._make_dirs = lambda directories, made: None
+    creator._create_single_link = lambda source, link_path, make_parent=True: create(source, link_path)
+    return creator
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--links', type=int, default=100000, help='Links per run')
+    parser.add_argument('--dirs', nargs='+', help='Directories on the file systems to measure')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8], help='Thread counts')
+    args = parser.parse_args()
+    # Per-link INFO messages would dominate the timings
+    logging.basicConfig(level=logging.WARNING)
+    dirs = args.dirs or [d for d in ('/dev/shm', tempfile.gettempdir()) if os.path.isdir(d)]
+
+    for base in dirs:
+        with tempfile.TemporaryDirectory(dir=base) as tmp:
+            creator = LinkCreator(str(Path(tmp) / 'bench.db'), views_root=str(Path(tmp) / '_Views'))
+            legacy = legacy_creator(LinkCreator(str(Path(tmp) / 'legacy.db'),
+                                                views_root=str(Path(tmp) / '_Views')))
+            start = time.perf_counter()
+            legacy.create_links(mappings(args.links), 'legacy', dry_run=False)
+            seconds = time.perf_counter() - start
+            legacy.close()
+            print(f"{base}: mkdir per link, 1 thread: {args.links / seconds:,.0f} links/s")
+            for workers in args.workers:
+                start = time.perf_counter()
+                created, errors = creator.create_links(mappings(args.links), f"w{workers}",
+                                                       dry_run=False, workers=workers)
+                seconds = time.perf_counter() - start
+                print(f"{base}: directories first, {workers} thread(s): {args.links / seconds:,.0f} links/s"
+                      f"{'' if (created, errors) == (args.links, 0) else f'  ERRORS {errors}'}")
+            creator.close()
+
+
+if __name__ == '__main__':
+    main()
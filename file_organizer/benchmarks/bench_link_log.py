@@ -0,0 +1,128 @@
+"""
+Benchmark: size and query time of the link transaction log.
+
+Builds a catalog with the former link_transactions layout holding R daily
+runs that each re-linked the same N cataloged files, then migrates it to
+the compact link_log layout and finally compacts it. For comparison, the
+same runs are also logged directly in the compact layout. Each step
+reports the size of the log tables and their indexes and the time to
+rebuild the logged state of the view (what rollback_view and
+sync_links(state='log') read).
+
+Usage:
+    python benchmarks/bench_link_log.py --links 200000 --runs 5
+"""
+import argparse
+import logging
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from link_creator import LinkCreator, _WriteAheadLog
+from schema import MIGRATIONS
+
+VIEWS_ROOT = '/srv/_Views'
+
+
+def source_paths(links: int):
+    return [f"/share/project{i % 50}/dir{i % 997}/document_{i}.pdf" for i in range(links)]
+
+
+def legacy_catalog(db_path: str, links: int, runs: int):
+    """A catalog at schema version 5 with the log of ``runs`` full runs."""
+    conn = sqlite3.connect(db_path)
+    for version, _, migrate in MIGRATIONS[:5]:
+        migrate(conn.cursor())
+        conn.execute(f"PRAGMA user_version = {version}")
+    paths = source_paths(links)
+    conn.executemany("INSERT INTO files (path, name) VALUES (?, ?)",
+                     ((path, path.rsplit('/', 1)[-1]) for path in paths))
+    start = datetime(2024, 1, 1)
+    for run in range(runs):
+        day = start + timedelta(days=run)
+        conn.executemany("""
+            INSERT INTO link_transactions (timestamp, operation, view_name, source_path, link_path, success, error)
+            VALUES (?, 'create', 'ByCategory', ?, ?, 1, NULL)
+        """, (((day + timedelta(microseconds=i)).isoformat(), path,
+               f"{VIEWS_ROOT}/ByCategory/Documents/PDF/{path.rsplit('/', 1)[-1]}")
+              for i, path in enumerate(paths)))
+    conn.commit()
+    conn.execute("VACUUM")
+    conn.close()
+
+
+def compact_catalog(db_path: str, links: int, runs: int) -> LinkCreator:
+    """The same runs, logged by current code (without touching the file system)."""
+    creator = LinkCreator(db_path, views_root=VIEWS_ROOT)
+    paths = source_paths(links)
+    creator.conn.executemany("INSERT INTO files (path, name) VALUES (?, ?)",
+                             ((path, path.rsplit('/', 1)[-1]) for path in paths))
+    creator.conn.commit()
+    view_dir = Path(VIEWS_ROOT) / 'ByCategory'
+    for _ in range(runs):
+        log = _WriteAheadLog(creator.conn, 'ByCategory', 'create', view_dir)
+        for i in range(0, links, 10000):
+            batch = [(path, view_dir / 'Documents' / 'PDF' / path.rsplit('/', 1)[-1])
+                     for path in paths[i:i + 10000]]
+            log.resolve(log.intend('create', batch), [(True, None)] * len(batch))
+        log.finish()
+    creator.conn.execute("VACUUM")
+    return creator
+
+
+def log_size(conn: sqlite3.Connection) -> float:
+    return conn.execute("""
+        SELECT SUM(pgsize) FROM dbstat
+        WHERE name IN ('link_transactions', 'link_log', 'link_runs') OR name LIKE 'idx_link%'
+    """).fetchone()[0] / 2 ** 20
+
+
+def measure(label: str, conn: sqlite3.Connection, creator: LinkCreator = None):
+    size = log_size(conn)
+    if creator is None:
+        print(f"{label}: log {size:.1f} MiB")
+        return
+    start = time.perf_counter()
+    links = creator._logged_links('ByCategory')
+    print(f"{label}: log {size:.1f} MiB, logged state of {len(links)} links in "
+          f"{time.perf_counter() - start:.2f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--links', type=int, default=200000, help='Links per run')
+    parser.add_argument('--runs', type=int, default=5, help='Logged runs')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp) / 'bench.db')
+        legacy_catalog(db_path, args.links, args.runs)
+        conn = sqlite3.connect(db_path)
+        measure(f"former layout, {args.links * args.runs} rows", conn)
+        conn.close()
+
+        start = time.perf_counter()
+        creator = LinkCreator(db_path, views_root=VIEWS_ROOT)
+        print(f"migration: {time.perf_counter() - start:.2f} s")
+        creator.conn.execute("VACUUM")
+        measure("migrated (imported rows keep full link paths)", creator.conn, creator)
+
+        start = time.perf_counter()
+        stats = creator.compact_log(vacuum=True)
+        print(f"compact-log: {time.perf_counter() - start:.2f} s, {stats['removed']} rows removed")
+        measure(f"after compact-log, {stats['kept']} rows", creator.conn, creator)
+        creator.close()
+
+        creator = compact_catalog(str(Path(tmp) / 'compact.db'), args.links, args.runs)
+        measure(f"logged in the compact layout, {args.links * args.runs} rows", creator.conn, creator)
+        creator.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark: rendering the ByDate target template.
+
+Compares the former RuleEngine._render_template (one re.sub per template,
+a datetime conversion and strftime per date placeholder, a regex per
+sanitized field) with the renderer built by rule_compiler.build_renderer
+(pre-split segments, date parts cached per day, str.translate),
+first on in-memory rows, then end to end through the ByDate view of a
+synthetic catalog, with the interpreter and with compiled rules. Both
+renderers must produce the same paths.
+
+Usage:
+    python benchmarks/bench_render.py --rows 1000000
+"""
+import argparse
+import random
+import re
+import sys
+import tempfile
+import time
+from datetime import datetime
+from functools import partial
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from bench_rule_engine import synthetic_catalog
+from rule_compiler import build_renderer
+from rule_engine import RuleEngine
+
+TEMPLATE = "Date/{year}/{month_name}/{name}"
+
+
+def legacy_render(template, file_row):
+    """RuleEngine._render_template before templates were pre-split."""
+    def parse_date(timestamp):
+        if timestamp:
+            try:
+                return datetime.fromtimestamp(timestamp)
+            except (ValueError, OSError):
+                pass
+        return None
+
+    def replace(match):
+        key = match.group(1)
+        if key == 'year':
+            dt = parse_date(file_row.get('created'))
+            return dt.strftime('%Y') if dt else 'Unknown'
+        if key == 'month':
+            dt = parse_date(file_row.get('created'))
+            return dt.strftime('%m') if dt else '00'
+        if key == 'month_name':
+            dt = parse_date(file_row.get('created'))
+            return dt.strftime('%B') if dt else 'Unknown'
+        if key == 'day':
+            dt = parse_date(file_row.get('created'))
+            return dt.strftime('%d') if dt else '00'
+        return re.sub(r'[<>:"/\\|?*]', '_', str(file_row.get(key, '')))
+
+    result = re.sub(r'\{(\w+)\}', replace, template)
+    result = re.sub(r'/+', '/', result)
+    return result.strip('/')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000, help='Synthetic rows')
+    parser.add_argument('--rules', default=str(Path(__file__).parent.parent / 'config' / 'views.yaml'))
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    now = time.time()
+    rows = [{'name': f"file_{i}.pdf", 'created': now - rng.uniform(0, 10 * 365) * 86400}
+            for i in range(args.rows)]
+
+    start = time.perf_counter()
+    expected = [legacy_render(TEMPLATE, row) for row in rows]
+    legacy = time.perf_counter() - start
+    render = build_renderer(TEMPLATE)
+    start = time.perf_counter()
+    rendered = [render(row) for row in rows]
+    segmented = time.perf_counter() - start
+    print(f"render only, {args.rows} rows: legacy {legacy:.2f} s, segmented {segmented:.2f} s, "
+          f"{legacy / segmented:.1f}x{'' if rendered == expected else '  MISMATCH'}")
+    del rows, expected, rendered
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp) / 'bench.db')
+        synthetic_catalog(db_path, args.rows)
+        for label, compiled in (('interpreted', False), ('compiled', True)):
+            results = []
+            for renderer in ('legacy', 'segmented'):
+                engine = RuleEngine(db_path, args.rules, compiled=compiled)
+                if renderer == 'legacy':
+                    engine._render_template = legacy_render
+                    view = engine.compiled_views.get('ByDate')
+                    if view:
+                        view.rules = [rule._replace(render=partial(legacy_render, rule.target))
+                                      for rule in view.rules]
+                start = time.perf_counter()
+                mappings = engine.generate_view('ByDate')
+                results.append((time.perf_counter() - start, mappings))
+                engine.close()
+            (slow, expected), (fast, mappings) = results
+            print(f"ByDate view, {label}, {args.rows} rows: legacy {slow:.2f} s, segmented {fast:.2f} s, "
+                  f"{slow / fast:.1f}x{'' if mappings == expected else '  MISMATCH'}")
+
+
+if __name__ == '__main__':
+    main()
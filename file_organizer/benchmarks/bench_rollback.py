@@ -0,0 +1,80 @@
+"""
+Benchmark: rolling back a linked view.
+
+Links a synthetic view of N mappings (sources do not need to exist for
+symbolic links), then removes it with the former rollback loop (exists
+check and unlink per link, then a directory listing up the tree after
+every unlink) and with LinkCreator.rollback_view (unlinks by a thread
+pool, one bottom-up rmdir pass at the end), each on a fresh copy.
+
+Usage:
+    python benchmarks/bench_rollback.py --links 100000 --workers 1 4
+"""
+import argparse
+import logging
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from link_creator import LinkCreator, is_junction
+
+
+def mappings(count: int):
+    for i in range(count):
+        yield {'source_path': f"/data/share{i % 7}/file_{i}.pdf",
+               'target_path': f"Cat{i % 20}/Sub{i % 300}/file_{i}.pdf"}
+
+
+def legacy_rollback(creator: LinkCreator, view_name: str) -> int:
+    """rollback_view before runs: one link at a time, parents listed after every unlink."""
+    rows = creator.conn.execute("""
+        SELECT link_path FROM link_transactions
+        WHERE view_name = ? AND operation = 'create' AND success = 1
+    """, (view_name,)).fetchall()
+    deleted = 0
+    for (link_path,) in rows:
+        path = Path(link_path)
+        if path.is_symlink() or is_junction(path):
+            path.unlink()
+            directory = path.parent
+            while directory != creator.views_root and directory.exists():
+                if any(directory.iterdir()):
+                    break
+                directory.rmdir()
+                directory = directory.parent
+        deleted += 1
+    return deleted
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--links', type=int, default=100000, help='Links in the view')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4], help='Thread counts')
+    parser.add_argument('--dir', help='Directory on the file system to measure (default: temp directory)')
+    args = parser.parse_args()
+    # Per-link INFO messages would dominate the timings
+    logging.basicConfig(level=logging.WARNING)
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        creator = LinkCreator(str(Path(tmp) / 'bench.db'), views_root=str(Path(tmp) / '_Views'))
+        runs = [('legacy', None)] + [(f"{workers} thread(s)", workers) for workers in args.workers]
+        for label, workers in runs:
+            view_name = f"Bench{workers}"
+            creator.create_links(mappings(args.links), view_name, dry_run=False)
+            start = time.perf_counter()
+            if workers is None:
+                deleted = legacy_rollback(creator, view_name)
+            else:
+                deleted, _ = creator.rollback_view(view_name, workers=workers)
+            seconds = time.perf_counter() - start
+            left = (Path(tmp) / '_Views' / view_name).exists()
+            print(f"rollback, {label}: {seconds:.2f} s, {deleted / seconds:,.0f} links/s"
+                  f"{'  LEFTOVER DIRECTORIES' if left else ''}")
+        creator.close()
+
+
+if __name__ == '__main__':
+    main()
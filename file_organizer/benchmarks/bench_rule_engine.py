@@ -0,0 +1,118 @@
+"""
+Benchmark: view generation with the rule interpreter, compiled rules,
+compiled rules pushed down into SQLite, and compiled rules evaluated over
+NumPy arrays (when NumPy is installed).
+
+Fills a temporary catalog with synthetic rows (or uses an existing catalog
+via --db) and times RuleEngine.generate_view for every view in the rules
+file: with the interpreter that re-parses conditions per file, with the
+closures built by rule_compiler evaluated in Python, and with query_planner
+letting SQLite evaluate the conditions, and with vectorized.py evaluating
+numeric conditions batch by batch. All must return the same mappings.
+Finally all views are generated together in a single pass over the catalog,
+serially and sharded over --jobs worker processes.
+
+Usage:
+    python benchmarks/bench_rule_engine.py --rows 1000000
+    python benchmarks/bench_rule_engine.py --db catalog.db --rules config/views.yaml
+"""
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from rule_engine import RuleEngine
+from scanner import FileScanner
+from vectorized import HAS_NUMPY
+
+CATEGORIES = ['Documents', 'Images', 'CAD', 'Code', 'Archives', 'Media', 'System', None]
+EXTENSIONS = ['.pdf', '.jpg', '.dwg', '.py', '.zip', '.mp4', '.dll', '.txt']
+
+
+def synthetic_catalog(db_path: str, rows: int):
+    rng = random.Random(42)
+    now = time.time()
+    scanner = FileScanner(db_path)
+
+    def generate():
+        for i in range(rows):
+            category = rng.choice(CATEGORIES)
+            yield (f"/share/project{i % 50}/dir{i % 997}/file_{i}{EXTENSIONS[i % 8]}",
+                   f"file_{i}{EXTENSIONS[i % 8]}", EXTENSIONS[i % 8],
+                   int(rng.lognormvariate(11, 2.5)),
+                   now - rng.uniform(0, 10 * 365) * 86400,
+                   now - rng.uniform(0, 2 * 365) * 86400,
+                   category, 'General' if category else None,
+                   f"project{i % 50}" if i % 3 else None,
+                   'AutoCAD' if category == 'CAD' else None)
+
+    scanner.conn.executemany("""INSERT INTO files (path, name, extension, size, created, accessed,
+                                category, subcategory, project, software)
+                                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""", generate())
+    scanner.conn.commit()
+    scanner.close()
+
+
+def timed(engine: RuleEngine, view_name: str):
+    start = time.perf_counter()
+    mappings = engine.generate_view(view_name)
+    return time.perf_counter() - start, mappings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200000, help='Synthetic rows (ignored with --db)')
+    parser.add_argument('--db', help='Existing catalog to use instead of synthetic rows')
+    parser.add_argument('--rules', default=str(Path(__file__).parent.parent / 'config' / 'views.yaml'))
+    parser.add_argument('--jobs', type=int, default=4, help='Worker processes for the parallel run')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db
+        if not db_path:
+            db_path = str(Path(tmp) / 'bench.db')
+            synthetic_catalog(db_path, args.rows)
+        engines = [RuleEngine(db_path, args.rules, compiled=False),
+                   RuleEngine(db_path, args.rules, pushdown=False),
+                   RuleEngine(db_path, args.rules)]
+        labels = ['interpreted s', 'compiled s', 'pushdown s']
+        if HAS_NUMPY:
+            engines.append(RuleEngine(db_path, args.rules, vectorized=True))
+            labels.append('vectorized s')
+        print(f"{'view':>12} {'mappings':>10} " + ' '.join(f"{label:>13}" for label in labels)
+              + f" {'speedup':>8}")
+        totals = [0.0] * len(engines)
+        for view_name in engines[0].rules.get('views', {}):
+            results = [timed(engine, view_name) for engine in engines]
+            expected = results[0][1]
+            same = all(mappings == expected for _, mappings in results)
+            for i, (seconds, _) in enumerate(results):
+                totals[i] += seconds
+            timings = [seconds for seconds, _ in results]
+            print(f"{view_name:>12} {len(expected):>10} " + ' '.join(f"{t:>13.2f}" for t in timings)
+                  + f" {timings[0] / min(timings[1:]):>7.1f}x{'' if same else '  MISMATCH'}")
+        print(f"{'total':>12} {'':>10} " + ' '.join(f"{t:>13.2f}" for t in totals)
+              + f" {totals[0] / min(totals[1:]):>7.1f}x")
+        # All views in one pass (ViewGenerator.generate_all_views)
+        for label, engine in zip(('compiled', 'pushdown', 'vectorized'), engines[1:]):
+            start = time.perf_counter()
+            engine.generate_views()
+            print(f"all views, single pass, {label}: {time.perf_counter() - start:.2f} s")
+        # Shards evaluated by worker processes (generate/dryrun --jobs)
+        parallel = RuleEngine(db_path, args.rules, jobs=args.jobs)
+        start = time.perf_counter()
+        result = parallel.generate_views()
+        seconds = time.perf_counter() - start
+        same = result == engines[2].generate_views()
+        print(f"all views, pushdown, {args.jobs} jobs: {seconds:.2f} s{'' if same else '  MISMATCH'}")
+        parallel.close()
+        for engine in engines:
+            engine.close()
+
+
+if __name__ == '__main__':
+    main()
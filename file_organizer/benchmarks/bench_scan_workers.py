@@ -0,0 +1,83 @@
+"""
+Benchmark: scan throughput versus number of directory-listing workers.
+
+Builds a synthetic deep directory tree and scans it with different values of
+FileScanner.scan(workers=...). Use --latency-ms to add an artificial delay to
+every directory listing, which approximates an SMB/NFS share where round trips
+dominate.
+
+Usage:
+    python benchmarks/bench_scan_workers.py --depth 4 --fanout 5 --files 20 --latency-ms 5
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+import scanner as scanner_module
+from scanner import FileScanner
+
+
+def build_tree(root: Path, depth: int, fanout: int, files_per_dir: int) -> int:
+    """Create fanout^depth directories with files_per_dir files each."""
+    count = 0
+    level = [root]
+    for _ in range(depth):
+        next_level = []
+        for parent in level:
+            for i in range(fanout):
+                d = parent / f"d{i}"
+                d.mkdir()
+                for j in range(files_per_dir):
+                    (d / f"f{j}.txt").write_bytes(b"x" * 32)
+                    count += 1
+                next_level.append(d)
+        level = next_level
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--depth', type=int, default=4)
+    parser.add_argument('--fanout', type=int, default=5)
+    parser.add_argument('--files', type=int, default=20, help='Files per directory')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Simulated per-directory listing latency')
+    parser.add_argument('--workers', type=int, nargs='*', default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    if args.latency_ms:
+        real_scandir = os.scandir
+
+        def slow_scandir(path):
+            time.sleep(args.latency_ms / 1000.0)
+            return real_scandir(path)
+
+        scanner_module.os.scandir = slow_scandir
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tree = Path(tmp) / 'tree'
+        tree.mkdir()
+        total = build_tree(tree, args.depth, args.fanout, args.files)
+        print(f"Synthetic tree: {total} files, depth {args.depth}, fanout {args.fanout}, "
+              f"latency {args.latency_ms} ms/dir")
+        print(f"{'workers':>8} {'seconds':>10} {'files/s':>12}")
+        for workers in args.workers:
+            db_path = Path(tmp) / f'bench_{workers}.db'
+            scanner = FileScanner(str(db_path))
+            start = time.perf_counter()
+            result = scanner.scan(str(tree), workers=workers)
+            elapsed = time.perf_counter() - start
+            scanner.close()
+            assert result['scanned'] == total, result
+            print(f"{workers:>8} {elapsed:>10.3f} {total / elapsed:>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
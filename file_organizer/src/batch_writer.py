@@ -0,0 +1,79 @@
+"""
+Buffered executemany writer for bulk SQLite inserts and updates.
+"""
+import sqlite3
+import time
+import logging
+from typing import Callable, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+class BatchWriter:
+    """
+    Buffers parameter rows and writes them with ``executemany``.
+
+    A flush happens every ``batch_size`` rows or every ``flush_interval``
+    seconds, whichever comes first. Each flush runs in its own explicit
+    transaction and is committed before returning, so every flush is a durable
+    checkpoint: if the process dies, everything up to the last flush is kept.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, sql: str, batch_size: int = 5000,
+                 flush_interval: float = 2.0,
+                 on_flush: Optional[Callable[[sqlite3.Cursor, int], None]] = None):
+        """
+        Args:
+            conn: Connection to write to. Must only be used from this thread.
+            sql: Statement passed to executemany for every flush.
+            batch_size: Maximum number of buffered rows.
+            flush_interval: Maximum age in seconds of the oldest buffered row.
+            on_flush: Optional callback ``(cursor, row_count)`` executed inside
+                the same transaction, e.g. to record a checkpoint.
+        """
+        self.conn = conn
+        self.sql = sql
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.on_flush = on_flush
+        self.rows = []
+        self.written = 0
+        self._last_flush = time.monotonic()
+
+    def add(self, row: Sequence):
+        """Buffer a row, flushing if the batch is full or old enough."""
+        self.rows.append(row)
+        if (len(self.rows) >= self.batch_size or
+                time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """Write all buffered rows in a single committed transaction."""
+        self._last_flush = time.monotonic()
+        if not self.rows:
+            return
+        if not self.conn.in_transaction:
+            self.conn.execute("BEGIN")
+        try:
+            cursor = self.conn.cursor()
+            cursor.executemany(self.sql, self.rows)
+            if self.on_flush:
+                self.on_flush(cursor, len(self.rows))
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        self.written += len(self.rows)
+        logger.debug(f"Flushed {len(self.rows)} rows ({self.written} total)")
+        self.rows = []
+
+    def close(self):
+        """Flush any remaining rows."""
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
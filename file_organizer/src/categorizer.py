@@ -3,12 +3,121 @@ Categorize files based on extension mapping and heuristic rules.
 """
 import yaml
 import re
-from pathlib import Path
-from typing import Dict, Tuple, Optional
+import sqlite3
+from pathlib import Path, PurePath, PureWindowsPath
+from typing import Dict, List, Tuple, Optional
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Rows read at a time by the filename-pattern pass of the bulk update
+FETCH_SIZE = 10000
+
+
+_WINDOWS_PATHS = isinstance(PurePath(), PureWindowsPath)
+_SEPARATORS = '\\/' if _WINDOWS_PATHS else '/'
+
+
+def _path_name(path: str) -> str:
+    """
+    PurePath(path).name without building a PurePath for ordinary paths.
+    
+    The text after the last separator is the name unless it is empty or '.',
+    contains a drive (':'), ends with a dot (suffix rules differ between
+    Python versions) or the path is a bare UNC share; those go through pathlib.
+    """
+    cut = max(path.rfind('/'), path.rfind('\\')) if _WINDOWS_PATHS else path.rfind('/')
+    name = path[cut + 1:]
+    if (not name or name[-1] == '.' or ':' in name
+            or (_WINDOWS_PATHS and path[:1] in _SEPARATORS and path[1:2] in _SEPARATORS
+                and sum(path.count(sep, 2) for sep in _SEPARATORS) < 2)):
+        return PurePath(path).name
+    return name
+
+
+def _path_extension(path):
+    """Extension of a stored path as categorize() derives it: lower case, without the dot."""
+    if not isinstance(path, str):
+        return None
+    name = _path_name(path)
+    if name.endswith('.'):
+        return PurePath(name).suffix[1:].lower()
+    dot = name.rfind('.')
+    return name[dot + 1:].lower() if dot > 0 else ''
+
+
+# Filename heuristics used when categories.yaml has no filename_patterns section
+DEFAULT_FILENAME_PATTERNS = [
+    {'keywords': ['screenshot'], 'category': 'Images', 'subcategory': 'Screenshots'},
+    {'keywords': ['invoice'], 'category': 'Documents', 'subcategory': 'Invoices'},
+    {'keywords': ['resume'], 'category': 'Documents', 'subcategory': 'Resumes'},
+    {'keywords': ['diagram'], 'category': 'Images', 'subcategory': 'Diagrams'},
+    {'keywords': ['cad'], 'category': 'CAD', 'subcategory': 'AutoCAD'},
+    {'keywords': ['drawing'], 'category': 'CAD', 'subcategory': 'Drawings'},
+    {'keywords': ['report'], 'category': 'Documents', 'subcategory': 'Reports'},
+    {'keywords': ['photo'], 'category': 'Images', 'subcategory': 'Photos'},
+    {'keywords': ['project'], 'category': 'Projects', 'subcategory': 'General'},
+]
+
+_WORD_RE = re.compile(r'\w+')
+
+
+class FilenameMatcher:
+    """
+    Finds the highest-priority filename pattern occurring in a name.
+    
+    Keywords are whole words (as delimited by \\b), matched anywhere in the
+    name and case-insensitively; a keyword of several words matches those
+    words in sequence. All keywords live in one dict keyed by their first
+    word, so a name is scanned once and the cost does not grow with the
+    number of keywords. Entries with a regular expression ("pattern") are
+    searched only when they could beat the best keyword match.
+    """
+    
+    def __init__(self, entries: List[Dict], default: Dict):
+        # first word -> [(priority, remaining words)]
+        self.keywords: Dict[str, List[Tuple[int, Tuple[str, ...]]]] = {}
+        self.regexes: List[Tuple[int, re.Pattern]] = []
+        self.results: List[Tuple[str, str]] = []
+        for priority, entry in enumerate(entries):
+            self.results.append((entry.get('category', default['category']),
+                                 entry.get('subcategory', default['subcategory'])))
+            for keyword in entry.get('keywords') or []:
+                words = _WORD_RE.findall(str(keyword).lower())
+                if not words:
+                    raise ValueError(f"Filename keyword {keyword!r} contains no word characters")
+                self.keywords.setdefault(words[0], []).append((priority, tuple(words[1:])))
+            if entry.get('pattern'):
+                self.regexes.append((priority, re.compile(entry['pattern'], re.IGNORECASE)))
+        for candidates in self.keywords.values():
+            candidates.sort()
+    
+    def match(self, name: str) -> Optional[Tuple[str, str]]:
+        best = len(self.results)
+        if self.keywords:
+            words = _WORD_RE.findall(name.lower())
+            keywords = self.keywords
+            for i, word in enumerate(words):
+                candidates = keywords.get(word)
+                if candidates is None:
+                    continue
+                for priority, rest in candidates:
+                    if priority >= best:
+                        break
+                    if not rest or tuple(words[i + 1:i + 1 + len(rest)]) == rest:
+                        best = priority
+                        break
+                if best == 0:
+                    break
+        for priority, regex in self.regexes:
+            if priority >= best:
+                break
+            if regex.search(name):
+                best = priority
+                break
+        return self.results[best] if best < len(self.results) else None
+
+
 class Categorizer:
     def __init__(self, config_path: str):
         with open(config_path, 'r', encoding='utf-8') as f:
@@ -16,22 +125,12 @@ class Categorizer:
         self.mapping = config.get('mapping', {})
         self.default = config.get('default', {'category': 'Miscellaneous', 'subcategory': 'Unknown'})
         
-        # Pre-compile regex patterns for filename-based categorization
-        # Note: Patterns are evaluated in order, so more specific patterns should come first
-        # Using word boundaries (\b) to avoid false matches (e.g., "cascade" shouldn't match "cad")
-        self.patterns = [
-            # More specific patterns first
-            (re.compile(r'(?i)\bscreenshot\b'), ('Images', 'Screenshots')),
-            (re.compile(r'(?i)\binvoice\b'), ('Documents', 'Invoices')),
-            (re.compile(r'(?i)\bresume\b'), ('Documents', 'Resumes')),
-            (re.compile(r'(?i)\bdiagram\b'), ('Images', 'Diagrams')),
-            (re.compile(r'(?i)\bcad\b'), ('CAD', 'AutoCAD')),
-            (re.compile(r'(?i)\bdrawing\b'), ('CAD', 'Drawings')),
-            # More general patterns last
-            (re.compile(r'(?i)\breport\b'), ('Documents', 'Reports')),
-            (re.compile(r'(?i)\bphoto\b'), ('Images', 'Photos')),
-            (re.compile(r'(?i)\bproject\b'), ('Projects', 'General')),
-        ]
+        # Filename heuristics, in priority order (earlier entries win).
+        # Whole words only, so "cascade" does not match "cad"
+        patterns = config.get('filename_patterns')
+        if patterns is None:
+            patterns = DEFAULT_FILENAME_PATTERNS
+        self.filename_matcher = FilenameMatcher(patterns, self.default)
     
     def categorize_by_extension(self, extension: str) -> Tuple[str, str]:
         """Return (category, subcategory) for a given file extension (without dot)."""
@@ -43,11 +142,8 @@ class Categorizer:
         return self.default['category'], self.default['subcategory']
     
     def categorize_by_filename(self, filename: str) -> Optional[Tuple[str, str]]:
-        """Attempt to categorize based on filename patterns."""
-        for pattern, cats in self.patterns:
-            if pattern.match(filename):
-                return cats
-        return None
+        """Attempt to categorize based on filename patterns (highest priority match anywhere in the name)."""
+        return self.filename_matcher.match(filename)
     
     def categorize(self, file_path: Path, extension: str = None) -> Tuple[str, str]:
         """
@@ -70,10 +166,18 @@ class Categorizer:
         
         return ext_cat
     
-    def update_database(self, db_connection):
+    def update_database(self, db_connection, bulk: bool = True) -> int:
         """
         Update the 'files' table with category and subcategory for all entries.
+        
+        With bulk=True (default) files with a mapped extension are categorized
+        by one UPDATE joined with the mapping, and only the remaining files go
+        through the filename patterns in Python. bulk=False categorizes and
+        updates one row at a time. Both give the same result. Returns the
+        number of files categorized.
         """
+        if bulk:
+            return self._update_database_bulk(db_connection)
         cursor = db_connection.cursor()
         cursor.execute("SELECT id, path FROM files WHERE category IS NULL")
         rows = cursor.fetchall()
@@ -83,14 +187,83 @@ class Categorizer:
             path = Path(path_str)
             category, subcategory = self.categorize(path)
             cursor.execute(
-                "UPDATE files SET category = ?, subcategory = ? WHERE id = ?",
+                "UPDATE files SET category = ?, subcategory = ?, indexed_at = CURRENT_TIMESTAMP WHERE id = ?",
                 (category, subcategory, row_id)
             )
             updated += 1
         
         db_connection.commit()
         logger.info(f"Updated categories for {updated} files.")
-
+        return updated
+    
+    def _update_database_bulk(self, db_connection) -> int:
+        default = (self.default['category'], self.default['subcategory'])
+        # Extensions that map to the default pair still try the filename
+        # patterns (see categorize), so they are left to the second pass
+        known = []
+        for ext, entry in self.mapping.items():
+            if not isinstance(ext, str) or ext != ext.lower():
+                continue  # categorize_by_extension only looks up lower-case strings
+            pair = self.categorize_by_extension(ext)
+            if pair != default:
+                known.append((ext, pair[0], pair[1]))
+        
+        db_connection.create_function('path_extension', 1, _path_extension, deterministic=True)
+        cursor = db_connection.cursor()
+        cursor.execute("DROP TABLE IF EXISTS temp.category_map")
+        cursor.execute("""
+            CREATE TEMP TABLE category_map (
+                extension TEXT PRIMARY KEY, category TEXT, subcategory TEXT
+            ) WITHOUT ROWID
+        """)
+        cursor.executemany("INSERT INTO category_map VALUES (?, ?, ?)", known)
+        # The join runs on the stored extension (the scanner keeps the dot,
+        # other writers may not); only rows without one need the Python function
+        by_extension = 0
+        for key, condition in (("lower(ltrim(files.extension, '.'))", "files.extension <> ''"),
+                               ("path_extension(files.path)", "COALESCE(files.extension, '') = ''")):
+            if sqlite3.sqlite_version_info >= (3, 33, 0):
+                cursor.execute(f"""
+                    UPDATE files SET category = m.category, subcategory = m.subcategory,
+                                     indexed_at = CURRENT_TIMESTAMP
+                    FROM category_map m
+                    WHERE files.category IS NULL AND {condition} AND m.extension = {key}
+                """)
+            else:
+                cursor.execute(f"""
+                    UPDATE files SET
+                        category = (SELECT category FROM category_map WHERE extension = {key}),
+                        subcategory = (SELECT subcategory FROM category_map WHERE extension = {key}),
+                        indexed_at = CURRENT_TIMESTAMP
+                    WHERE category IS NULL AND {condition}
+                      AND {key} IN (SELECT extension FROM category_map)
+                """)
+            by_extension += cursor.rowcount
+        cursor.execute("DROP TABLE temp.category_map")
+        
+        # Filename patterns for the rest; whatever matches none gets the default
+        matched = []
+        cursor.execute("SELECT id, path FROM files WHERE category IS NULL")
+        while True:
+            rows = cursor.fetchmany(FETCH_SIZE)
+            if not rows:
+                break
+            for row_id, path_str in rows:
+                pair = self.categorize_by_filename(_path_name(path_str))
+                if pair:
+                    matched.append((pair[0], pair[1], row_id))
+        cursor.executemany(
+            "UPDATE files SET category = ?, subcategory = ?, indexed_at = CURRENT_TIMESTAMP WHERE id = ?",
+            matched)
+        cursor.execute(
+            "UPDATE files SET category = ?, subcategory = ?, indexed_at = CURRENT_TIMESTAMP WHERE category IS NULL",
+            default)
+        updated = by_extension + len(matched) + cursor.rowcount
+        
+        db_connection.commit()
+        logger.info(f"Updated categories for {updated} files "
+                    f"({by_extension} by extension, {len(matched)} by filename).")
+        return updated
 
 if __name__ == "__main__":
     # Simple test
@@ -0,0 +1,67 @@
+"""
+Single place to open SQLite connections with a tuned performance profile.
+"""
+import sqlite3
+import logging
+from typing import Any, Dict
+
+logger = logging.getLogger(__name__)
+
+MIB = 1024 * 1024
+
+# PRAGMA settings per workload. WAL lets readers (web UI, view generation)
+# run while a scan is writing; synchronous=NORMAL is durable across
+# application crashes in WAL mode and only risks the last commits on power loss.
+PROFILES: Dict[str, Dict[str, Any]] = {
+    # Scans, categorization, hashing, link logging: few connections, many writes
+    'bulk': {
+        'busy_timeout': 60000,
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -256 * 1024,      # negative = KiB, i.e. 256 MiB
+        'mmap_size': 1024 * MIB,
+        'temp_store': 'MEMORY',
+    },
+    # Web searches and view generation: short read queries next to a writer
+    'read': {
+        'busy_timeout': 10000,
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -64 * 1024,       # 64 MiB
+        'mmap_size': 256 * MIB,
+        'temp_store': 'MEMORY',
+        'query_only': 'ON',
+    },
+}
+
+
+def connect(db_path: str, profile: str = 'bulk', **overrides) -> sqlite3.Connection:
+    """
+    Open a connection to the catalog and apply a performance profile.
+
+    Args:
+        db_path: Path to the SQLite database.
+        profile: Name of an entry in PROFILES ('bulk' or 'read').
+        overrides: PRAGMA values replacing those of the profile, e.g.
+            cache_size=-16384. Pass None to leave a PRAGMA at SQLite's default.
+    Returns:
+        sqlite3.Connection
+    """
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown connection profile '{profile}'. Available: {', '.join(PROFILES)}")
+    settings = dict(PROFILES[profile])
+    settings.update(overrides)
+
+    conn = sqlite3.connect(db_path)
+    # busy_timeout first so that switching the journal mode waits for other writers
+    for pragma in sorted(settings, key=lambda name: name != 'busy_timeout'):
+        value = settings[pragma]
+        if value is None:
+            continue
+        try:
+            conn.execute(f"PRAGMA {pragma} = {value}")
+        except sqlite3.OperationalError as e:
+            # e.g. WAL cannot be enabled while another connection holds a lock;
+            # the setting is persistent, so the next writer will switch it
+            logger.debug(f"Could not apply PRAGMA {pragma} = {value}: {e}")
+    return conn
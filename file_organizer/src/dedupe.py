@@ -0,0 +1,158 @@
+"""
+Staged duplicate detection: size first, partial hash second, full hash last.
+"""
+import logging
+import sqlite3
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from batch_writer import BatchWriter
+from hashing import HashPipeline, compute_partial_hash, storage_for, KIB
+from scanner import _to_long_path
+
+logger = logging.getLogger(__name__)
+
+
+class DuplicateFinder:
+    """
+    Finds files with identical content while reading as little data as possible.
+
+    1. Only files sharing their exact size with another file can be duplicates.
+    2. Within a size group, the first and last ``partial_bytes`` of each file
+       are hashed; files with a unique partial hash are dropped.
+    3. Remaining candidates get a full content hash: SHA‑256 by default, or
+       any registered fingerprint algorithm. Stored digests are reused and
+       newly computed ones are written back to ``files.hash_sha256`` (or
+       ``files.fingerprint``).
+
+    Results replace the contents of ``duplicate_groups``/``duplicate_files``.
+    After run(), ``stats`` reports how many bytes each stage avoided reading.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, min_size: int = 1,
+                 partial_bytes: int = 4 * KIB, workers: int = 4,
+                 algorithm: str = 'sha256'):
+        self.conn = conn
+        self.algorithm = algorithm
+        self.column, self.value_prefix = storage_for(algorithm)
+        self.min_size = max(1, min_size)
+        self.partial_bytes = partial_bytes
+        self.workers = workers
+        self.stats = {}
+
+    def run(self) -> List[Tuple[str, List[int]]]:
+        """Run all stages and return a list of (digest, [file ids])."""
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT COUNT(*), COALESCE(SUM(size), 0) FROM files
+            WHERE size >= ? AND deleted_at IS NULL
+        """, (self.min_size,))
+        considered_files, considered_bytes = cursor.fetchone()
+
+        # Stage 1: size groups
+        cursor.execute(f"""
+            SELECT f.id, f.path, f.size, f.{self.column} FROM files f
+            JOIN (SELECT size FROM files
+                  WHERE size >= ? AND deleted_at IS NULL
+                  GROUP BY size HAVING COUNT(*) > 1) s ON s.size = f.size
+            WHERE f.deleted_at IS NULL
+            ORDER BY f.size, f.id
+        """, (self.min_size,))
+        by_size = defaultdict(list)
+        for file_id, path, size, hash_val in cursor:
+            by_size[size].append((file_id, path, hash_val))
+        size_candidates = sum(len(group) for group in by_size.values())
+        size_bytes = sum(size * len(group) for size, group in by_size.items())
+
+        # Stage 2: partial hashes for groups of files too large to read whole
+        partial_targets = [(size, item) for size, group in by_size.items()
+                           if size > 2 * self.partial_bytes for item in group]
+        with ThreadPoolExecutor(max_workers=max(1, self.workers)) as pool:
+            partials = pool.map(
+                lambda t: compute_partial_hash(self._fs_path(t[1][1]), t[0], self.partial_bytes),
+                partial_targets)
+            partial_groups = defaultdict(list)
+            for (size, item), partial in zip(partial_targets, partials):
+                if partial is not None:
+                    partial_groups[(size, partial)].append(item)
+        bytes_read_partial = sum(min(size, 2 * self.partial_bytes) for size, _ in partial_targets)
+
+        candidates = []  # (size, [(id, path, hash)])
+        for size, group in by_size.items():
+            if size <= 2 * self.partial_bytes:
+                candidates.append((size, group))
+        for (size, _), group in partial_groups.items():
+            if len(group) > 1:
+                candidates.append((size, group))
+        partial_candidates = sum(len(group) for _, group in candidates)
+        partial_bytes_left = sum(size * len(group) for size, group in candidates)
+
+        # Stage 3: full hashes, reusing stored ones
+        full_hashes: Dict[int, str] = {}
+        to_hash = []
+        bytes_reused = 0
+        for size, group in candidates:
+            for file_id, path, hash_val in group:
+                if hash_val and hash_val.startswith(self.value_prefix):
+                    full_hashes[file_id] = hash_val
+                    bytes_reused += size
+                else:
+                    to_hash.append((file_id, self._fs_path(path), size))
+        bytes_read_full = sum(size for _, _, size in to_hash)
+        writer = BatchWriter(self.conn, f"UPDATE files SET {self.column} = ? WHERE id = ?")
+        pipeline = HashPipeline(workers=self.workers, algorithm=self.algorithm)
+        with writer:
+            for file_id, digest in pipeline.run(to_hash):
+                if digest is None:
+                    continue
+                digest = self.value_prefix + digest
+                full_hashes[file_id] = digest
+                writer.add((digest, file_id))
+
+        by_hash = defaultdict(list)
+        for size, group in candidates:
+            for file_id, _, _ in group:
+                if file_id in full_hashes:
+                    by_hash[full_hashes[file_id]].append(file_id)
+        duplicates = sorted((h, sorted(ids)) for h, ids in by_hash.items() if len(ids) > 1)
+        self._store(duplicates)
+
+        self.stats = {
+            'files_considered': considered_files,
+            'files_after_size': size_candidates,
+            'files_after_partial': partial_candidates,
+            'duplicate_groups': len(duplicates),
+            'bytes_considered': considered_bytes,
+            'bytes_avoided_by_size': considered_bytes - size_bytes,
+            'bytes_read_partial': bytes_read_partial,
+            'bytes_avoided_by_partial': size_bytes - partial_bytes_left,
+            'bytes_reused_hashes': bytes_reused,
+            'bytes_read_full': bytes_read_full,
+        }
+        logger.info(
+            f"Duplicate scan: {considered_files} files; {size_candidates} share a size, "
+            f"{partial_candidates} share a partial hash. Bytes avoided: "
+            f"{self.stats['bytes_avoided_by_size']} by size, "
+            f"{self.stats['bytes_avoided_by_partial']} by partial hash "
+            f"({bytes_read_partial} read), {bytes_reused} by stored hashes; "
+            f"{bytes_read_full} bytes fully hashed.")
+        return duplicates
+
+    def _store(self, duplicates: List[Tuple[str, List[int]]]):
+        """Replace duplicate_groups/duplicate_files with the given groups."""
+        with self.conn:
+            cursor = self.conn.cursor()
+            cursor.execute("DELETE FROM duplicate_files")
+            cursor.execute("DELETE FROM duplicate_groups")
+            for hash_val, file_ids in duplicates:
+                cursor.execute("INSERT INTO duplicate_groups (hash_sha256, file_count) VALUES (?, ?)",
+                               (hash_val, len(file_ids)))
+                group_id = cursor.lastrowid
+                cursor.executemany("INSERT INTO duplicate_files (file_id, group_id) VALUES (?, ?)",
+                                   [(fid, group_id) for fid in file_ids])
+
+    @staticmethod
+    def _fs_path(path: str) -> Path:
+        return _to_long_path(Path(path))
@@ -0,0 +1,244 @@
+"""
+Content hashing for the file catalog, decoupled from metadata collection.
+"""
+import hashlib
+import logging
+import mmap
+import os
+import queue
+import threading
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+# Optional fast non-cryptographic hashes
+try:
+    import xxhash
+    HAS_XXHASH = True
+except ImportError:
+    HAS_XXHASH = False
+
+logger = logging.getLogger(__name__)
+
+KIB = 1024
+MIB = 1024 * KIB
+
+# Algorithm name -> factory returning a hashlib-style object (update/hexdigest)
+HASH_ALGORITHMS = {}
+
+
+def register_algorithm(name: str, factory: Callable):
+    """Make a hash algorithm available to compute_hash, scans and duplicate detection."""
+    HASH_ALGORITHMS[name] = factory
+
+
+def available_algorithms() -> List[str]:
+    return sorted(HASH_ALGORITHMS)
+
+
+def get_algorithm(name: str) -> Callable:
+    try:
+        return HASH_ALGORITHMS[name]
+    except KeyError:
+        raise ValueError(f"Unknown hash algorithm '{name}'. "
+                         f"Available: {', '.join(available_algorithms())}") from None
+
+
+def storage_for(algorithm: str) -> Tuple[str, str]:
+    """
+    Return (column, value_prefix) used to store digests of an algorithm.
+
+    SHA‑256 keeps its historical hash_sha256 column. Every other algorithm is a
+    fingerprint: stored in the fingerprint column as "<algorithm>:<hex>" so
+    values from different algorithms never compare equal.
+    """
+    get_algorithm(algorithm)
+    if algorithm == 'sha256':
+        return 'hash_sha256', ''
+    return 'fingerprint', algorithm + ':'
+
+
+register_algorithm('sha256', hashlib.sha256)
+register_algorithm('blake2b', lambda: hashlib.blake2b(digest_size=16))
+if HAS_XXHASH:
+    register_algorithm('xxh64', xxhash.xxh64)
+    if hasattr(xxhash, 'xxh3_128'):
+        register_algorithm('xxh3_128', xxhash.xxh3_128)
+
+
+def block_size_for(size: Optional[int]) -> int:
+    """Pick a read buffer size that grows with the file size."""
+    if size is None or size < 1 * MIB:
+        return 64 * KIB
+    if size < 64 * MIB:
+        return 1 * MIB
+    return 4 * MIB
+
+
+# Files at least this large are hashed through mmap by the 'auto' backend
+MMAP_THRESHOLD = 4 * MIB
+
+
+def _update_readinto(digest, f, block_size: int):
+    """Feed a file into digest through one reused buffer (no per-block allocation)."""
+    buf = bytearray(block_size)
+    view = memoryview(buf)
+    while True:
+        n = f.readinto(buf)
+        if not n:
+            break
+        digest.update(view[:n])
+
+
+def _update_mmap(digest, f):
+    """Feed a file into digest straight from a read-only memory map."""
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if hasattr(mm, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+            mm.madvise(mmap.MADV_SEQUENTIAL)
+        digest.update(mm)
+
+
+def compute_hash(filepath, size: Optional[int] = None,
+                 block_size: Optional[int] = None, backend: str = 'auto',
+                 algorithm: str = 'sha256') -> Optional[str]:
+    """
+    Compute the hex digest of a file, or None if it cannot be read.
+
+    Args:
+        filepath: File to hash.
+        size: File size if already known (avoids an fstat).
+        block_size: Read buffer size; chosen from the size when omitted.
+        backend: 'mmap', 'readinto', or 'auto' (mmap for files of at least
+            MMAP_THRESHOLD bytes). If mapping fails (empty files, pipes and
+            other special files, some network mounts) the readinto loop is used.
+        algorithm: Name of a registered algorithm (default SHA‑256).
+    """
+    new_digest = get_algorithm(algorithm)
+    digest = new_digest()
+    try:
+        with open(filepath, 'rb') as f:
+            if size is None:
+                size = os.fstat(f.fileno()).st_size
+            if backend == 'mmap' or (backend == 'auto' and size >= MMAP_THRESHOLD):
+                try:
+                    _update_mmap(digest, f)
+                    return digest.hexdigest()
+                except (ValueError, OSError):
+                    digest = new_digest()
+                    f.seek(0)
+            # Small files do not need (and should not pay for zeroing) a full block
+            block_size = block_size or block_size_for(size)
+            _update_readinto(digest, f, min(block_size, max(size, 4 * KIB)))
+        return digest.hexdigest()
+    except (OSError, PermissionError):
+        return None
+
+
+def compute_partial_hash(filepath, size: int, chunk: int = 4 * KIB) -> Optional[str]:
+    """
+    Hash the first and last ``chunk`` bytes of a file (plus its size).
+
+    Cheap pre-filter for duplicate detection: files whose partial hashes differ
+    cannot be identical. Returns None if the file cannot be read.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(size).encode())
+    try:
+        with open(filepath, 'rb') as f:
+            digest.update(f.read(chunk))
+            if size > 2 * chunk:
+                f.seek(size - chunk)
+                digest.update(f.read(chunk))
+            elif size > chunk:
+                digest.update(f.read())
+        return digest.hexdigest()
+    except (OSError, PermissionError):
+        return None
+
+
+class HashPipeline:
+    """
+    Hashes files on a pool of worker threads.
+
+    hashlib releases the GIL while digesting, so threads give real parallelism
+    without the pickling cost of a process pool. Work is split into two lanes:
+    files of at least ``large_threshold`` bytes go to a small group of
+    dedicated workers, so a handful of multi-GB files cannot hold up the
+    thousands of small files queued behind them.
+    """
+
+    def __init__(self, workers: int = 4, large_threshold: int = 64 * MIB,
+                 large_workers: Optional[int] = None, algorithm: str = 'sha256'):
+        self.algorithm = algorithm
+        get_algorithm(algorithm)
+        self.workers = max(1, workers)
+        self.large_threshold = large_threshold
+        if self.workers < 2:
+            self.large_workers = 0
+        elif large_workers is None:
+            self.large_workers = max(1, self.workers // 4)
+        else:
+            self.large_workers = min(max(1, large_workers), self.workers - 1)
+
+    def run(self, items: Iterable[Tuple[int, str, Optional[int]]]) -> Iterator[Tuple[int, Optional[str]]]:
+        """
+        Hash (id, path, size) items and yield (id, hex_digest) as they finish.
+
+        Items are consumed in the calling thread, so they may come straight
+        from a SQLite cursor. The digest is None for unreadable files. Results
+        are yielded in completion order, not input order.
+        """
+        small_workers = self.workers - self.large_workers
+        small_q = queue.Queue(maxsize=small_workers * 64)
+        large_q = queue.Queue() if self.large_workers else small_q
+        results = queue.Queue()
+        finished = object()
+
+        def worker(lane: queue.Queue):
+            # Always signal the end, or run() would wait for this worker forever
+            try:
+                while True:
+                    item = lane.get()
+                    if item is None:
+                        return
+                    file_id, path, size = item
+                    try:
+                        digest = compute_hash(path, size, algorithm=self.algorithm)
+                    except Exception as e:
+                        # e.g. ValueError from mmap on a file that shrank meanwhile
+                        logger.warning(f"Failed to hash {path}: {e}")
+                        digest = None
+                    results.put((file_id, digest))
+            finally:
+                results.put(finished)
+
+        threads = [threading.Thread(target=worker, args=(small_q,), daemon=True)
+                   for _ in range(small_workers)]
+        threads += [threading.Thread(target=worker, args=(large_q,), daemon=True)
+                    for _ in range(self.large_workers)]
+        for t in threads:
+            t.start()
+
+        try:
+            for item in items:
+                size = item[2] or 0
+                lane = large_q if size >= self.large_threshold else small_q
+                lane.put(item)
+                # Hand back whatever finished in the meantime
+                while True:
+                    try:
+                        result = results.get_nowait()
+                    except queue.Empty:
+                        break
+                    yield result
+        finally:
+            for _ in range(small_workers):
+                small_q.put(None)
+            for _ in range(self.large_workers):
+                large_q.put(None)
+
+        remaining = len(threads)
+        while remaining:
+            result = results.get()
+            if result is finished:
+                remaining -= 1
+            else:
+                yield result
@@ -1,20 +1,123 @@
 """
 Create symbolic links (or junctions) for virtual views, with safety and undo.
 """
+import contextlib
 import os
 import shutil
+import stat
 import sqlite3
 import json
 import logging
 import platform
 import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from pathlib import Path, PureWindowsPath
-from datetime import datetime
-from typing import List, Dict, Optional, Tuple
+from typing import Iterable, List, Dict, Optional, Tuple
 import sys
 
+from connection import connect
+from schema import LINK_OPERATIONS, ensure_schema
+
 logger = logging.getLogger(__name__)
 
+# Link transaction log entries buffered before they are written
+LOG_BATCH_SIZE = 10000
+# Source paths looked up in files per query
+FILE_ID_CHUNK_SIZE = 500
+# Links handed to a worker thread at a time
+LINK_CHUNK_SIZE = 256
+# Planned changes listed individually in the sync report
+PLAN_PREVIEW = 20
+
+
+def _batched(iterable: Iterable, size: int) -> Iterable[List]:
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class _WriteAheadLog:
+    """
+    link_log rows of one run on a view, written before the operations.
+    
+    Creating the log starts a run in link_runs, which holds the view name
+    and the view directory; rows store sources as files.id and links
+    relative to that directory where they can. intend() commits a batch of
+    pending rows (success NULL) with one timestamp; resolve() records the
+    outcomes once the batch is done; finish() closes the run.
+    """
+    
+    def __init__(self, conn: sqlite3.Connection, view_name: str, operation: str, view_dir: Path):
+        self.conn = conn
+        self.prefix = str(view_dir) + os.sep
+        self.links = 0
+        self.errors = 0
+        with conn:
+            self.run_id = conn.execute("""
+                INSERT INTO link_runs (view_name, operation, started_at, link_prefix) VALUES (?, ?, ?, ?)
+            """, (view_name, operation, int(time.time()), self.prefix)).lastrowid
+    
+    def _file_ids(self, sources: List[str]) -> Dict[str, int]:
+        ids = {}
+        unique = list(set(sources))
+        for i in range(0, len(unique), FILE_ID_CHUNK_SIZE):
+            chunk = unique[i:i + FILE_ID_CHUNK_SIZE]
+            ids.update((path, file_id) for file_id, path in self.conn.execute(
+                f"SELECT id, path FROM files WHERE path IN ({','.join('?' * len(chunk))})", chunk))
+        return ids
+    
+    def _row(self, operation: str, timestamp: int, file_ids: Dict[str, int], source: str, link_path: str):
+        file_id = file_ids.get(source)
+        if link_path.startswith(self.prefix):
+            target, link_path = link_path[len(self.prefix):], None
+        else:
+            target = None
+        return (self.run_id, LINK_OPERATIONS[operation], timestamp, file_id,
+                None if file_id is not None else source, target, link_path)
+    
+    def intend(self, operation: str, links: List[Tuple]) -> List[int]:
+        """Log pending operations on (source, link path) pairs; returns their row ids."""
+        timestamp = int(time.time())
+        links = [(str(source), str(link_path)) for source, link_path in links]
+        file_ids = self._file_ids([source for source, _ in links])
+        with self.conn:
+            self.conn.executemany("""
+                INSERT INTO link_log (run_id, operation, ts, file_id, source_path, target, link_path)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, [self._row(operation, timestamp, file_ids, source, link_path)
+                  for source, link_path in links])
+            # Rows inserted in one write transaction get consecutive ids
+            last = self.conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+        return list(range(last - len(links) + 1, last + 1))
+    
+    def resolve(self, ids: List[int], results: List[Tuple[bool, Optional[str]]]):
+        with self.conn:
+            self.conn.executemany("UPDATE link_log SET success = ?, error = ? WHERE id = ?",
+                                  [(success, error, row_id) for row_id, (success, error) in zip(ids, results)])
+        for success, _ in results:
+            if success:
+                self.links += 1
+            else:
+                self.errors += 1
+    
+    def mark_rollback(self, success: bool, error: str):
+        """Record that every link of the view was removed."""
+        with self.conn:
+            self.conn.execute("""
+                INSERT INTO link_log (run_id, operation, ts, target, success, error)
+                VALUES (?, ?, ?, '', ?, ?)
+            """, (self.run_id, LINK_OPERATIONS['rollback'], int(time.time()), success, error))
+    
+    def finish(self):
+        with self.conn:
+            self.conn.execute("UPDATE link_runs SET finished_at = ?, links = ?, errors = ? WHERE id = ?",
+                              (int(time.time()), self.links, self.errors, self.run_id))
+
 
 def is_junction(path: Path) -> bool:
     """
@@ -39,78 +142,404 @@ class LinkCreator:
     def __init__(self, db_path: str, views_root: str = "./_Views"):
         self.db_path = db_path
         self.views_root = Path(views_root)
-        self.conn = sqlite3.connect(db_path)
+        self.conn = connect(db_path, 'bulk')
         self._create_tables()
     
     def _create_tables(self):
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS link_transactions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp TEXT NOT NULL,
-                operation TEXT NOT NULL,  -- 'create', 'delete', 'rollback'
-                view_name TEXT NOT NULL,
-                source_path TEXT NOT NULL,
-                link_path TEXT NOT NULL,
-                success INTEGER DEFAULT 0,
-                error TEXT
-            )
-        """)
-        self.conn.commit()
-    
-    def create_links(self, mappings: List[Dict], view_name: str, dry_run: bool = True):
+        ensure_schema(self.conn)
+    
+    def create_links(self, mappings: Iterable[Dict], view_name: str, dry_run: bool = True,
+                     workers: int = 1):
         """
-        Create symbolic links for a list of source→target mappings.
+        Create symbolic links for source→target mappings.
         If dry_run is True, only log intended actions without creating anything.
+        
+        Mappings are consumed LOG_BATCH_SIZE at a time (e.g. from
+        mapping_io.read_mappings or RuleEngine.iter_view), so memory use does
+        not grow with the view. For each batch the missing target
+        directories are created first, once each, then the links, by
+        ``workers`` threads (useful on network shares).
+        
+        Each batch is written to the link log as pending before its
+        links are created and resolved afterwards, so rollback_view also
+        finds the links of a run that was interrupted.
         """
-        log_entries = []
         created = 0
         errors = 0
+        view_dir = self.views_root / view_name
+        made_dirs = set()
+        if not dry_run:
+            self.recover_pending(view_name)
+            log = _WriteAheadLog(self.conn, view_name, 'create', view_dir)
         
-        for mapping in mappings:
-            src = Path(mapping['source_path'])
-            rel_target = mapping['target_path']
-            # Determine link path
-            link_path = self.views_root / view_name / rel_target
-            
-            if dry_run:
-                logger.info(f"[DRY-RUN] Would link {src} → {link_path}")
-                success = True
-                error = None
-            else:
-                success, error = self._create_single_link(src, link_path)
-                if success:
-                    created += 1
-                else:
-                    errors += 1
-            
-            log_entries.append({
-                'timestamp': datetime.now().isoformat(),
-                'operation': 'create',
-                'view_name': view_name,
-                'source_path': str(src),
-                'link_path': str(link_path),
-                'success': success,
-                'error': error
-            })
-        
-        # Store log entries in database
+        with self._link_pool(workers) as pool:
+            for batch in _batched(mappings, LOG_BATCH_SIZE):
+                links = [(Path(mapping['source_path']), view_dir / mapping['target_path'])
+                         for mapping in batch]
+                if dry_run:
+                    for src, link_path in links:
+                        logger.info(f"[DRY-RUN] Would link {src} → {link_path}")
+                    continue
+                ids = log.intend('create', links)
+                self._make_dirs((link_path.parent for _, link_path in links), made_dirs)
+                results = self._link_many(links, pool)
+                log.resolve(ids, results)
+                for success, _ in results:
+                    if success:
+                        created += 1
+                    else:
+                        errors += 1
         if not dry_run:
-            self._store_logs(log_entries)
+            log.finish()
+            logger.info(f"Link run {log.run_id} of view '{view_name}' finished")
         
         logger.info(f"Links created: {created}, errors: {errors}")
         return created, errors
     
-    def _create_single_link(self, source: Path, link_path: Path) -> Tuple[bool, Optional[str]]:
-        """Create a symbolic link (or junction) on Windows, with fallbacks."""
-        # Ensure parent directory exists
-        link_path.parent.mkdir(parents=True, exist_ok=True)
+    def sync_links(self, mappings: Iterable[Dict], view_name: str, dry_run: bool = True,
+                   state: str = 'disk', workers: int = 1) -> Dict:
+        """
+        Bring the links of a view in line with ``mappings``, touching only what changed.
+        
+        The desired links are compared with the current ones, read from the
+        view directory (state='disk': one readlink per existing link) or
+        rebuilt from the successful entries of link_transactions since the
+        last rollback (state='log': no file system access at all). Only the
+        differences are applied: links to add, links to remove and links
+        pointing to a different source. The plan is logged before anything
+        is changed; with dry_run=True nothing else happens.
+        
+        Files that are not links are never removed or replaced. Links are
+        created as in create_links, by ``workers`` threads. Returns
+        counts: added, removed, retargeted, unchanged, conflicts, errors
+        (planned counts on a dry run).
+        """
+        if state not in ('disk', 'log'):
+            raise ValueError(f"Unknown link state source: {state}")
+        view_dir = self.views_root / view_name
+        desired = {}
+        for mapping in mappings:
+            desired[os.path.normpath(mapping['target_path'])] = mapping['source_path']
+        # Settle what an interrupted run left pending (this only updates the log)
+        self.recover_pending(view_name)
+        if state == 'disk':
+            current, others = self._scan_view_links(view_dir)
+        else:
+            current, others = self._logged_view_links(view_name, view_dir), set()
+        
+        adds, retargets, conflicts = [], [], []
+        unchanged = 0
+        for key, source in desired.items():
+            existing = current.pop(key, None)
+            if existing is None:
+                if key not in others:
+                    adds.append((key, source))
+                elif self._same_file(view_dir / key, source):
+                    # A hard link created when symlinks were not available
+                    unchanged += 1
+                else:
+                    conflicts.append(key)
+            elif existing == source or existing == str(Path(source)):
+                unchanged += 1
+            else:
+                retargets.append((key, source))
+        # Whatever is left was linked before but is no longer part of the view
+        removes = sorted(current.items())
+        
+        stats = {'added': len(adds), 'removed': len(removes), 'retargeted': len(retargets),
+                 'unchanged': unchanged, 'conflicts': len(conflicts), 'errors': len(conflicts)}
+        prefix = "[DRY-RUN] " if dry_run else ""
+        logger.info(f"{prefix}Sync plan for view '{view_name}' (state from {state}): "
+                    f"{len(adds)} to add, {len(removes)} to remove, {len(retargets)} to retarget, "
+                    f"{unchanged} unchanged, {len(conflicts)} blocked by non-link files")
+        for label, entries in (('add', [key for key, _ in adds]), ('remove', [key for key, _ in removes]),
+                               ('retarget', [key for key, _ in retargets]), ('blocked', conflicts)):
+            for key in entries[:PLAN_PREVIEW]:
+                logger.info(f"{prefix}  {label}: {view_dir / key}")
+            if len(entries) > PLAN_PREVIEW:
+                logger.info(f"{prefix}  ... and {len(entries) - PLAN_PREVIEW} more to {label}")
+        if dry_run:
+            return stats
+        
+        log = _WriteAheadLog(self.conn, view_name, 'sync', view_dir)
+        if conflicts:
+            blocked = [(Path(desired[key]), view_dir / key) for key in conflicts]
+            log.resolve(log.intend('create', blocked),
+                        [(False, f"Target already exists and is not a link: {link_path}")
+                         for _, link_path in blocked])
+        made_dirs = set()
+        with self._link_pool(workers) as pool:
+            emptied = set()
+            for batch in _batched(removes, LOG_BATCH_SIZE):
+                links = [(source, view_dir / key) for key, source in batch]
+                ids = log.intend('delete', links)
+                results = self._unlink_many(links, pool, check_source=False)
+                log.resolve(ids, results)
+                for (_, link_path), (success, _) in zip(links, results):
+                    if success:
+                        emptied.add(link_path.parent)
+                    else:
+                        stats['errors'] += 1
+            self._prune_empty_dirs(emptied)
+            
+            for batch in _batched(retargets + adds, LOG_BATCH_SIZE):
+                links = [(Path(source), view_dir / key) for key, source in batch]
+                ids = log.intend('create', links)
+                self._make_dirs((link_path.parent for _, link_path in links), made_dirs)
+                results = self._link_many(links, pool)
+                log.resolve(ids, results)
+                stats['errors'] += sum(1 for success, _ in results if not success)
+        log.finish()
+        
+        logger.info(f"Sync of view '{view_name}': {stats['added']} added, {stats['removed']} removed, "
+                    f"{stats['retargeted']} retargeted, {stats['unchanged']} unchanged, "
+                    f"{stats['errors']} errors")
+        return stats
+    
+    def _scan_view_links(self, view_dir: Path) -> Tuple[Dict[str, str], set]:
+        """
+        Links below view_dir as {relative path: link target}, plus the
+        relative paths of other files. Link targets are read, never followed.
+        """
+        links = {}
+        others = set()
+        stack = [(str(view_dir), '')]
+        while stack:
+            directory, prefix = stack.pop()
+            try:
+                entries = os.scandir(directory)
+            except FileNotFoundError:
+                continue
+            with entries:
+                for entry in entries:
+                    rel = prefix + entry.name
+                    if entry.is_symlink() or (os.name == 'nt' and entry.is_dir()
+                                              and is_junction(Path(entry.path))):
+                        links[rel] = os.readlink(entry.path)
+                    elif entry.is_dir(follow_symlinks=False):
+                        stack.append((entry.path, rel + os.sep))
+                    else:
+                        others.add(rel)
+        return links, others
+    
+    def _logged_links(self, view_name: str) -> Dict[str, str]:
+        """
+        Links of a view according to link_transactions, as {link path: source}:
+        successful creates and deletes since the last rollback of the whole view.
+        """
+        cursor = self.conn.execute("""
+            SELECT operation, source_path, link_path FROM link_transactions
+            WHERE view_name = ? AND success = 1
+              AND id > (SELECT COALESCE(MAX(l.id), 0) FROM link_runs r
+                        JOIN link_log l ON l.run_id = r.id
+                        WHERE r.view_name = ? AND r.operation IN ('rollback', 'import')
+                          AND l.operation = ?)
+            ORDER BY id
+        """, (view_name, view_name, LINK_OPERATIONS['rollback']))
+        links = {}
+        for operation, source_path, link_path in cursor:
+            if operation == 'create':
+                links[link_path] = source_path
+            elif operation == 'delete':
+                links.pop(link_path, None)
+        return links
+    
+    def _logged_view_links(self, view_name: str, view_dir: Path) -> Dict[str, str]:
+        """Links of a view according to link_transactions, as {relative path: source}."""
+        links = {}
+        prefix = str(view_dir) + os.sep
+        foreign = 0
+        for link_path, source_path in self._logged_links(view_name).items():
+            if link_path.startswith(prefix):
+                links[link_path[len(prefix):]] = source_path
+            else:
+                # Logged under another views root
+                foreign += 1
+        if foreign:
+            logger.warning(f"Ignored {foreign} logged links of view '{view_name}' outside {view_dir}")
+        return links
+    
+    @staticmethod
+    def _same_file(path: Path, source: str) -> bool:
+        try:
+            return os.path.samefile(path, source)
+        except OSError:
+            return False
+    
+    def recover_pending(self, view_name: Optional[str] = None) -> Dict[str, int]:
+        """
+        Resolve link operations an interrupted run logged but never confirmed.
         
-        # If a file or link already exists, remove it (optional)
-        if link_path.exists():
-            # If it's a symlink/junction, remove it
+        The file system decides: a pending 'create' succeeded if the link
+        exists and points to the logged source, a pending 'delete' if the
+        link is gone. Afterwards rollback_view and sync_links(state='log')
+        see exactly the links the interrupted run left behind. Returns the
+        number of pending operations found as done and as not done.
+        """
+        sql = "SELECT id, operation, source_path, link_path FROM link_transactions WHERE success IS NULL"
+        params = ()
+        if view_name is not None:
+            sql += " AND view_name = ?"
+            params = (view_name,)
+        updates = []
+        for row_id, operation, source_path, link_path in self.conn.execute(sql, params).fetchall():
+            if operation == 'delete':
+                done = not os.path.lexists(link_path)
+            else:
+                done = self._links_to(Path(link_path), source_path)
+            updates.append((done, None if done else "Interrupted before completion", row_id))
+        if updates:
+            with self.conn:
+                self.conn.executemany("UPDATE link_log SET success = ?, error = ? WHERE id = ?", updates)
+            done = sum(1 for update in updates if update[0])
+            logger.warning(f"Recovered {len(updates)} pending link operations of an interrupted run: "
+                           f"{done} completed, {len(updates) - done} not")
+        else:
+            done = 0
+        return {'completed': done, 'incomplete': len(updates) - done}
+    
+    def _links_to(self, link_path: Path, source: str) -> bool:
+        """True if link_path is a link (or the hard link fallback) to source."""
+        try:
             if link_path.is_symlink() or is_junction(link_path):
+                target = os.readlink(link_path)
+                return target == source or target == str(Path(source))
+        except OSError:
+            return False
+        return os.path.lexists(link_path) and self._same_file(link_path, source)
+    
+    @staticmethod
+    def _link_pool(workers: int):
+        if workers > 1:
+            return ThreadPoolExecutor(max_workers=workers, thread_name_prefix='link')
+        return contextlib.nullcontext()
+    
+    @staticmethod
+    def _make_dirs(directories: Iterable[Path], made: set):
+        """Create each directory not created before, parents before children."""
+        for directory in sorted(set(directories) - made):
+            try:
+                directory.mkdir(parents=True, exist_ok=True)
+            except OSError as e:
+                # The links below it fail and report the error
+                logger.warning(f"Failed to create directory {directory}: {e}")
+            made.add(directory)
+    
+    @staticmethod
+    def _map_chunks(pool, function, items: List) -> List:
+        """[function(item) for item in items], by the pool's threads in chunks when given."""
+        if pool is None:
+            return [function(item) for item in items]
+        chunks = [items[i:i + LINK_CHUNK_SIZE] for i in range(0, len(items), LINK_CHUNK_SIZE)]
+        results = []
+        for chunk_results in pool.map(lambda chunk: [function(item) for item in chunk], chunks):
+            results.extend(chunk_results)
+        return results
+    
+    def _link_many(self, links: List[Tuple[Path, Path]], pool) -> List[Tuple[bool, Optional[str]]]:
+        """
+        _create_single_link for every (source, link path), in parallel when a
+        pool is given. Link paths occurring more than once are created
+        afterwards in order, so that the last mapping wins as it does serially.
+        """
+        
+        def create(link):
+            return self._create_single_link(*link, make_parent=False)
+        
+        if pool is None:
+            return [create(link) for link in links]
+        counts = {}
+        for _, link_path in links:
+            counts[link_path] = counts.get(link_path, 0) + 1
+        results = [None] * len(links)
+        unique = [i for i, (_, link_path) in enumerate(links) if counts[link_path] == 1]
+        for i, result in zip(unique, self._map_chunks(pool, create, [links[i] for i in unique])):
+            results[i] = result
+        for i, result in enumerate(results):
+            if result is None:
+                results[i] = create(links[i])
+        return results
+    
+    def _unlink_many(self, links: List[Tuple[str, Path]], pool,
+                     check_source: bool) -> List[Tuple[bool, Optional[str]]]:
+        """
+        Remove the link at every (source, link path), in parallel when a pool
+        is given. Links already gone count as removed. Anything that is not
+        a link is left alone, and so are links to another source when
+        check_source is set.
+        """
+        
+        def unlink(link):
+            source, link_path = link
+            try:
+                existing = os.lstat(link_path)
+            except FileNotFoundError:
+                return True, None
+            except OSError as e:
+                return False, str(e)
+            if not (stat.S_ISLNK(existing.st_mode) or is_junction(link_path)):
+                if check_source and self._same_file(link_path, source):
+                    # The hard link fallback
+                    pass
+                else:
+                    return False, f"Not a link: {link_path}"
+            elif check_source and not self._links_to(link_path, source):
+                return False, f"Changed since it was linked: {link_path}"
+            try:
                 link_path.unlink()
+                return True, None
+            except FileNotFoundError:
+                return True, None
+            except OSError as e:
+                return False, str(e)
+        
+        return self._map_chunks(pool, unlink, links)
+    
+    def _prune_empty_dirs(self, directories: Iterable[Path]):
+        """
+        Remove the given directories and their ancestors below views_root
+        that are empty, in one pass from the deepest up; rmdir fails on
+        directories that are not empty, so nothing is listed.
+        """
+        root = self.views_root
+        affected = set()
+        for directory in directories:
+            if root not in directory.parents:
+                continue
+            while directory != root and directory not in affected:
+                affected.add(directory)
+                directory = directory.parent
+        for directory in sorted(affected, key=lambda d: len(d.parts), reverse=True):
+            try:
+                directory.rmdir()
+            except OSError:
+                pass
+    
+    def _create_single_link(self, source: Path, link_path: Path,
+                            make_parent: bool = True) -> Tuple[bool, Optional[str]]:
+        """Create a symbolic link (or junction) on Windows, with fallbacks."""
+        # Ensure parent directory exists (unless the caller created it already)
+        if make_parent:
+            try:
+                link_path.parent.mkdir(parents=True, exist_ok=True)
+            except OSError as e:
+                logger.error(f"Could not create directory for {link_path}: {e}")
+                return False, str(e)
+        
+        # If a link already exists (even one whose source is gone), replace it;
+        # one lstat call covers the common case of nothing being there yet
+        try:
+            existing = os.lstat(link_path)
+        except OSError:
+            existing = None
+        if existing is not None:
+            if stat.S_ISLNK(existing.st_mode) or is_junction(link_path):
+                # A failure here must not escape the worker and abort its batch
+                try:
+                    link_path.unlink()
+                except OSError as e:
+                    logger.error(f"Could not replace existing link {link_path}: {e}")
+                    return False, str(e)
             else:
                 # Regular file/directory – we shouldn't overwrite; skip with error
                 return False, f"Target already exists and is not a link: {link_path}"
@@ -180,71 +609,124 @@ class LinkCreator:
             else:
                 raise
     
-    def _store_logs(self, logs: List[Dict]):
-        cursor = self.conn.cursor()
-        for log in logs:
-            cursor.execute("""
-                INSERT INTO link_transactions 
-                (timestamp, operation, view_name, source_path, link_path, success, error)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (
-                log['timestamp'], log['operation'], log['view_name'],
-                log['source_path'], log['link_path'],
-                log['success'], log['error']
-            ))
-        self.conn.commit()
-    
-    def rollback_view(self, view_name: str):
-        """Delete all links created for a given view (using transaction log)."""
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT link_path FROM link_transactions 
-            WHERE view_name = ? AND operation = 'create' AND success = 1
-        """, (view_name,))
-        rows = cursor.fetchall()
+    def rollback_view(self, view_name: str, run_id: Optional[int] = None, workers: int = 1):
+        """
+        Delete the links of a view, using the transaction log.
+        
+        Without run_id every link the log says the view has is removed. With
+        run_id only the links created by that run (see list_runs) are removed,
+        and only those still pointing to the source the run linked them to.
+        Links are removed by ``workers`` threads; directories left empty are
+        pruned afterwards in a single pass. Returns (deleted, errors).
+        """
+        # Links of an interrupted run are only logged as pending
+        self.recover_pending(view_name)
+        if run_id is None:
+            links = [(source, Path(link_path))
+                     for link_path, source in self._logged_links(view_name).items()]
+        else:
+            links = [(source, Path(link_path)) for source, link_path in self.conn.execute("""
+                SELECT source_path, link_path FROM link_transactions
+                WHERE view_name = ? AND run_id = ? AND operation = 'create' AND success = 1
+                ORDER BY id
+            """, (view_name, run_id))]
         
+        log = _WriteAheadLog(self.conn, view_name, 'rollback', self.views_root / view_name)
         deleted = 0
         errors = []
-        for (link_path,) in rows:
-            path = Path(link_path)
-            try:
-                if path.exists():
-                    if path.is_symlink() or is_junction(path):
-                        path.unlink()
+        emptied = set()
+        with self._link_pool(workers) as pool:
+            for batch in _batched(links, LOG_BATCH_SIZE):
+                # Logged one by one, so that the view's logged state stays exact
+                # even if the rollback is interrupted
+                ids = log.intend('delete', batch)
+                results = self._unlink_many(batch, pool, check_source=run_id is not None)
+                log.resolve(ids, results)
+                for (_, link_path), (success, error) in zip(batch, results):
+                    if success:
+                        deleted += 1
+                        emptied.add(link_path.parent)
                     else:
-                        # Not a link – skip
-                        errors.append(f"Not a link: {link_path}")
-                        continue
-                    # Remove empty parent directories
-                    self._remove_empty_parents(path.parent)
-                deleted += 1
-            except OSError as e:
-                errors.append(str(e))
+                        errors.append(error)
+        self._prune_empty_dirs(emptied)
         
-        # Log rollback operation
-        cursor.execute("""
-            INSERT INTO link_transactions 
-            (timestamp, operation, view_name, source_path, link_path, success, error)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (
-            datetime.now().isoformat(), 'rollback', view_name, '', '', deleted > 0, '; '.join(errors)
-        ))
-        self.conn.commit()
+        if run_id is None:
+            # Marks the end of the view's logged state (compact_log drops what precedes it)
+            log.mark_rollback(deleted > 0, '; '.join(errors))
+        log.finish()
         
-        logger.info(f"Rollback deleted {deleted} links for view '{view_name}'")
+        logger.info(f"Rollback deleted {deleted} links for view '{view_name}'"
+                    + (f" created by run {run_id}" if run_id is not None else ""))
         return deleted, errors
     
-    def _remove_empty_parents(self, directory: Path):
-        """Recursively remove empty directories up to views_root."""
-        try:
-            while directory != self.views_root and directory.exists():
-                if not any(directory.iterdir()):
-                    directory.rmdir()
-                    directory = directory.parent
-                else:
-                    break
-        except OSError:
-            pass
+    def compact_log(self, view_names: Optional[List[str]] = None, vacuum: bool = False) -> Dict[str, int]:
+        """
+        Drop link log rows that no longer describe any link.
+        
+        Everything up to the last rollback of a whole view goes, and after it
+        only the latest successful create of each link is kept, plus the
+        latest operation on a link if it failed. The logged state of every
+        view (what sync_links(state='log') and rollback_view see) is
+        unchanged; link_runs keeps the summary of every run. A single run
+        can afterwards only be rolled back for the links it was the last to
+        create. vacuum=True returns the freed pages to the file system.
+        Returns the number of rows removed and kept.
+        """
+        if view_names is None:
+            view_names = [row[0] for row in self.conn.execute("SELECT DISTINCT view_name FROM link_runs")]
+        removed = 0
+        for view_name in view_names:
+            self.recover_pending(view_name)
+            with self.conn:
+                runs = "SELECT id FROM link_runs WHERE view_name = ?"
+                # The last rollback of the whole view removed every link logged before it
+                cursor = self.conn.execute(f"""
+                    DELETE FROM link_log WHERE run_id IN ({runs}) AND id <= (
+                        SELECT COALESCE(MAX(l.id), 0) FROM link_runs r
+                        JOIN link_log l ON l.run_id = r.id
+                        WHERE r.view_name = ? AND r.operation IN ('rollback', 'import')
+                          AND l.operation = ?)
+                """, (view_name, view_name, LINK_OPERATIONS['rollback']))
+                removed += cursor.rowcount
+                self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS compact_keep (id INTEGER PRIMARY KEY)")
+                self.conn.execute("DELETE FROM compact_keep")
+                self.conn.execute(f"""
+                    INSERT INTO compact_keep (id)
+                    SELECT id FROM (
+                        SELECT l.id, l.operation, l.success,
+                               ROW_NUMBER() OVER (PARTITION BY link ORDER BY l.id DESC) AS newest,
+                               ROW_NUMBER() OVER (PARTITION BY link, l.success ORDER BY l.id DESC) AS newest_alike
+                        FROM (SELECT l.*, COALESCE(l.link_path, r.link_prefix || l.target) AS link
+                              FROM link_log l JOIN link_runs r ON r.id = l.run_id
+                              WHERE r.view_name = ? AND l.success IS NOT NULL) l
+                    )
+                    WHERE (success = 1 AND newest_alike = 1 AND operation = ?)
+                       OR (success = 0 AND newest = 1)
+                """, (view_name, LINK_OPERATIONS['create']))
+                cursor = self.conn.execute(f"""
+                    DELETE FROM link_log WHERE run_id IN ({runs}) AND success IS NOT NULL
+                      AND id NOT IN (SELECT id FROM compact_keep)
+                """, (view_name,))
+                removed += cursor.rowcount
+                self.conn.execute("DELETE FROM compact_keep")
+        kept = self.conn.execute("SELECT COUNT(*) FROM link_log").fetchone()[0]
+        if vacuum:
+            self.conn.execute("VACUUM")
+        logger.info(f"Compacted the link log: {removed} rows removed, {kept} kept")
+        return {'removed': removed, 'kept': kept}
+    
+    def list_runs(self, view_name: str) -> List[Dict]:
+        """Link runs of a view, newest first (times as local ISO 8601, like link_transactions)."""
+        cursor = self.conn.execute("""
+            SELECT id, operation,
+                   strftime('%Y-%m-%dT%H:%M:%S', started_at, 'unixepoch', 'localtime') AS started_at,
+                   strftime('%Y-%m-%dT%H:%M:%S', finished_at, 'unixepoch', 'localtime') AS finished_at,
+                   links, errors
+            FROM link_runs
+            WHERE view_name = ? ORDER BY id DESC
+        """, (view_name,))
+        columns = [d[0] for d in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor]
     
     def close(self):
         self.conn.close()
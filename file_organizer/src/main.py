@@ -2,9 +2,9 @@
 Main entry point for the File Organizer tool.
 """
 import argparse
+import multiprocessing
 import sys
 import os
-import sqlite3
 from pathlib import Path
 import logging
 
@@ -16,7 +16,11 @@ from categorizer import Categorizer
 from database import CatalogDatabase
 from rule_engine import RuleEngine
 from view_generator import ViewGenerator
+from materializer import ViewMaterializer
 from link_creator import LinkCreator
+from hashing import available_algorithms
+from connection import connect
+from mapping_io import FORMATS, read_mappings, write_mappings
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -25,22 +29,24 @@ def scan_command(args):
     """Scan a directory and populate database."""
     scanner = FileScanner(args.db)
     try:
-        scanner.scan(args.root, compute_hash=args.hash, extensions_ignore=args.ignore)
+        scanner.scan(args.root, compute_hash=args.hash, extensions_ignore=args.ignore,
+                     workers=args.workers, batch_size=args.batch_size,
+                     commit_interval=args.commit_interval, resume=args.resume,
+                     incremental=args.incremental, hash_workers=args.hash_workers,
+                     fingerprint=args.fingerprint)
         
         # Categorize
         if not args.no_categorize:
             cat = Categorizer(args.categories)
             cat.update_database(scanner.conn)
         
-        # Duplicate detection
+        # Duplicate detection (hashes only the files that share a size)
         if args.detect_duplicates:
-            if not args.hash:
-                logger.warning("Duplicate detection requires hash computation. Skipping.")
-            else:
-                db = CatalogDatabase(args.db)
-                duplicates = db.find_duplicates()
-                db.close()
-                logger.info(f"Found {len(duplicates)} duplicate groups.")
+            db = CatalogDatabase(args.db)
+            duplicates = db.find_duplicates(threshold_mb=args.threshold_mb, workers=args.hash_workers,
+                                            algorithm=args.fingerprint or 'sha256')
+            db.close()
+            logger.info(f"Found {len(duplicates)} duplicate groups.")
         
         logger.info(f"Scan completed. Database: {args.db}")
     finally:
@@ -49,7 +55,7 @@ def scan_command(args):
 def categorize_command(args):
     """Run categorization on existing database."""
     cat = Categorizer(args.categories)
-    conn = sqlite3.connect(args.db)
+    conn = connect(args.db, 'bulk')
     cat.update_database(conn)
     conn.close()
     logger.info("Categorization complete.")
@@ -57,45 +63,105 @@ def categorize_command(args):
 def duplicates_command(args):
     """Find duplicate files in database."""
     db = CatalogDatabase(args.db)
-    duplicates = db.find_duplicates(threshold_mb=args.threshold_mb)
+    duplicates = db.find_duplicates(threshold_mb=args.threshold_mb, workers=args.workers,
+                                    algorithm=args.algorithm)
     db.close()
     logger.info(f"Found {len(duplicates)} duplicate groups.")
 
 def generate_command(args):
     """Generate virtual view mappings."""
-    engine = RuleEngine(args.db, args.rules)
-    mappings = engine.generate_view(args.view)
-    engine.close()
-    
-    # Save mappings as JSON
-    import json
-    with open(args.output, 'w') as f:
-        json.dump(mappings, f, indent=2)
-    logger.info(f"Generated {len(mappings)} mappings for view '{args.view}' -> {args.output}")
+    if args.materialized:
+        engine = ViewMaterializer(args.db, args.rules)
+    else:
+        engine = RuleEngine(args.db, args.rules, vectorized=args.vectorized, jobs=args.jobs)
+    try:
+        # Streamed from the cursor to the file, never held in memory
+        count = write_mappings(engine.iter_view(args.view), args.output, args.format)
+    finally:
+        engine.close()
+    logger.info(f"Generated {count} mappings for view '{args.view}' -> {args.output}")
 
 def dryrun_command(args):
     """Create a dry‑run HTML report."""
-    gen = ViewGenerator(args.db, args.rules)
-    mappings = gen.generate_all_views()
-    gen.create_dry_run_report(args.output, mappings)
+    gen = ViewGenerator(args.db, args.rules, jobs=args.jobs)
+    gen.create_dry_run_report(args.output, materialized=args.materialized)
     gen.close()
     logger.info(f"Dry‑run report written to {args.output}")
 
 def link_command(args):
     """Create symbolic links for a view."""
-    import json
-    with open(args.mappings, 'r') as f:
-        mappings = json.load(f)
-    
+    # JSON arrays (including older indented files) and NDJSON are both read incrementally
+    materializer = None
+    if args.mappings:
+        mappings = read_mappings(args.mappings)
+    elif args.materialized:
+        materializer = ViewMaterializer(args.db, args.rules)
+        try:
+            mappings = materializer.iter_view(args.view)
+        except ValueError as e:
+            # Linking (let alone syncing) nothing would remove the view's links
+            logger.error(str(e))
+            materializer.close()
+            sys.exit(1)
+    else:
+        logger.error("Either --mappings or --materialized is required.")
+        sys.exit(1)
     creator = LinkCreator(args.db, views_root=args.views_root)
-    created, errors = creator.create_links(mappings, args.view, dry_run=args.dry_run)
+    if args.sync:
+        # Only the differences to the existing links are applied (and reported first)
+        creator.sync_links(mappings, args.view, dry_run=args.dry_run, state=args.sync_state,
+                           workers=args.workers)
+        creator.close()
+        if materializer:
+            materializer.close()
+        return
+    created, errors = creator.create_links(mappings, args.view, dry_run=args.dry_run,
+                                          workers=args.workers)
     creator.close()
+    if materializer:
+        materializer.close()
     
     if args.dry_run:
         logger.info(f"[DRY‑RUN] Would create {created} links, {errors} errors.")
     else:
         logger.info(f"Created {created} links, {errors} errors.")
 
+def rollback_command(args):
+    """Remove the links of a view, or of one link run, or list the runs."""
+    creator = LinkCreator(args.db, views_root=args.views_root)
+    try:
+        if args.list:
+            for run in creator.list_runs(args.view):
+                state = run['finished_at'] or 'interrupted'
+                print(f"{run['id']:>6}  {run['operation']:<8}  {run['started_at']}  {state}  "
+                      f"{run['links']} links, {run['errors']} errors")
+            return
+        deleted, errors = creator.rollback_view(args.view, run_id=args.run, workers=args.workers)
+    finally:
+        creator.close()
+    for error in errors[:20]:
+        logger.warning(error)
+    logger.info(f"Removed {deleted} links, {len(errors)} errors.")
+
+def compact_log_command(args):
+    """Drop superseded entries from the link transaction log."""
+    creator = LinkCreator(args.db)
+    try:
+        stats = creator.compact_log(args.views or None, vacuum=args.vacuum)
+    finally:
+        creator.close()
+    logger.info(f"Removed {stats['removed']} log entries, {stats['kept']} kept.")
+
+def materialize_command(args):
+    """Store view mappings in the catalog, refreshing only what changed."""
+    materializer = ViewMaterializer(args.db, args.rules)
+    try:
+        stats = materializer.refresh(args.views or None, full=args.full)
+    finally:
+        materializer.close()
+    logger.info(f"Materialized {len(stats)} views "
+                f"({sum(entry['mode'] == 'incremental' for entry in stats.values())} incrementally).")
+
 def web_command(args):
     """Start the web search interface."""
     from webui.app import app
@@ -110,10 +176,20 @@ def main():
     scan_parser.add_argument('root', help='Root directory to scan')
     scan_parser.add_argument('--db', default='catalog.db', help='Database path')
     scan_parser.add_argument('--hash', action='store_true', help='Compute SHA‑256 hash')
-    scan_parser.add_argument('--detect-duplicates', action='store_true', help='Run duplicate detection after scanning (requires --hash)')
+    scan_parser.add_argument('--hash-workers', type=int, default=4, help='Threads used for hashing')
+    scan_parser.add_argument('--fingerprint', choices=[a for a in available_algorithms() if a != 'sha256'],
+                             help='Also record a fast content fingerprint (also used by --detect-duplicates)')
+    scan_parser.add_argument('--detect-duplicates', action='store_true', help='Run duplicate detection after scanning')
+    scan_parser.add_argument('--threshold-mb', type=float, default=0,
+                             help='Minimum file size in MB for --detect-duplicates (default: all files)')
     scan_parser.add_argument('--ignore', nargs='*', default=[], help='Extensions to ignore')
     scan_parser.add_argument('--no-categorize', action='store_true', help='Skip categorization')
     scan_parser.add_argument('--categories', default='config/categories.yaml', help='Category mapping')
+    scan_parser.add_argument('--workers', type=int, default=1, help='Threads listing directories in parallel (useful on network shares)')
+    scan_parser.add_argument('--batch-size', type=int, default=5000, help='Rows written and committed per batch')
+    scan_parser.add_argument('--commit-interval', type=float, default=2.0, help='Maximum seconds between commits')
+    scan_parser.add_argument('--resume', action='store_true', help='Resume the last interrupted scan of this root')
+    scan_parser.add_argument('--incremental', action='store_true', help='Only rewrite new or changed files and flag removed ones as deleted')
     
     # categorize
     cat_parser = subparsers.add_parser('categorize', help='Categorize files in database')
@@ -125,26 +201,63 @@ def main():
     gen_parser.add_argument('view', help='View name')
     gen_parser.add_argument('--db', default='catalog.db', help='Database path')
     gen_parser.add_argument('--rules', default='config/views.yaml', help='Rules file')
-    gen_parser.add_argument('--output', default='mappings.json', help='Output JSON file')
+    gen_parser.add_argument('--output', default='mappings.json', help='Output mappings file')
+    gen_parser.add_argument('--format', choices=FORMATS,
+                            help='json (array) or ndjson (one mapping per line); default from the output extension')
+    gen_parser.add_argument('--materialized', action='store_true', help='Read the mappings stored by materialize')
+    gen_parser.add_argument('--vectorized', action='store_true', help='Evaluate numeric rules over NumPy arrays (requires NumPy)')
+    gen_parser.add_argument('--jobs', type=int, default=1, help='Worker processes evaluating shards of the catalog')
     
     # dryrun
     dryrun_parser = subparsers.add_parser('dryrun', help='Generate dry‑run HTML report')
     dryrun_parser.add_argument('--db', default='catalog.db', help='Database path')
     dryrun_parser.add_argument('--rules', default='config/views.yaml', help='Rules file')
     dryrun_parser.add_argument('--output', default='dryrun_report.html', help='Output HTML file')
+    dryrun_parser.add_argument('--materialized', action='store_true', help='Report the mappings stored by materialize')
+    dryrun_parser.add_argument('--jobs', type=int, default=1, help='Worker processes evaluating shards of the catalog')
     
     # link
     link_parser = subparsers.add_parser('link', help='Create symbolic links')
     link_parser.add_argument('view', help='View name')
-    link_parser.add_argument('--mappings', required=True, help='JSON mappings file')
+    link_parser.add_argument('--mappings', help='Mappings file (JSON array or NDJSON)')
+    link_parser.add_argument('--materialized', action='store_true', help='Use the mappings stored by materialize instead of a file')
+    link_parser.add_argument('--rules', default='config/views.yaml', help='Rules file (with --materialized)')
     link_parser.add_argument('--db', default='catalog.db', help='Database path')
     link_parser.add_argument('--views-root', default='./_Views', help='Root for virtual views')
     link_parser.add_argument('--dry-run', action='store_true', help='Only log, do not create links')
+    link_parser.add_argument('--sync', action='store_true', help='Only add, remove and retarget the links that changed')
+    link_parser.add_argument('--sync-state', choices=['disk', 'log'], default='disk',
+                             help='Compare with the links on disk or with the transaction log (with --sync)')
+    link_parser.add_argument('--workers', type=int, default=1, help='Threads creating links in parallel (useful on network shares)')
+    
+    # rollback
+    rollback_parser = subparsers.add_parser('rollback', help='Remove the links of a view (or of one link run)')
+    rollback_parser.add_argument('view', help='View name')
+    rollback_parser.add_argument('--run', type=int, help='Only remove the links created by this run (see --list)')
+    rollback_parser.add_argument('--list', action='store_true', help='List the link runs of the view')
+    rollback_parser.add_argument('--db', default='catalog.db', help='Database path')
+    rollback_parser.add_argument('--views-root', default='./_Views', help='Root for virtual views')
+    rollback_parser.add_argument('--workers', type=int, default=1, help='Threads removing links in parallel')
+    
+    # compact-log
+    compact_parser = subparsers.add_parser('compact-log', help='Drop superseded link log entries')
+    compact_parser.add_argument('--views', nargs='*', help='Views to compact (default: all)')
+    compact_parser.add_argument('--db', default='catalog.db', help='Database path')
+    compact_parser.add_argument('--vacuum', action='store_true', help='Return the freed space to the file system')
+    
+    # materialize
+    mat_parser = subparsers.add_parser('materialize', help='Store view mappings in the catalog (incremental refresh)')
+    mat_parser.add_argument('--views', nargs='*', help='Views to refresh (default: all)')
+    mat_parser.add_argument('--db', default='catalog.db', help='Database path')
+    mat_parser.add_argument('--rules', default='config/views.yaml', help='Rules file')
+    mat_parser.add_argument('--full', action='store_true', help='Recompute every mapping instead of only changed files')
     
     # duplicates
     dup_parser = subparsers.add_parser('duplicates', help='Find duplicate files')
     dup_parser.add_argument('--db', default='catalog.db', help='Database path')
-    dup_parser.add_argument('--threshold-mb', type=int, default=10, help='Minimum file size in MB to consider')
+    dup_parser.add_argument('--threshold-mb', type=float, default=10, help='Minimum file size in MB to consider')
+    dup_parser.add_argument('--workers', type=int, default=4, help='Threads used for hashing')
+    dup_parser.add_argument('--algorithm', default='sha256', choices=available_algorithms(), help='Content hash used for the final comparison')
     
     # web
     web_parser = subparsers.add_parser('web', help='Start web search interface')
@@ -163,6 +276,12 @@ def main():
         dryrun_command(args)
     elif args.command == 'link':
         link_command(args)
+    elif args.command == 'rollback':
+        rollback_command(args)
+    elif args.command == 'compact-log':
+        compact_log_command(args)
+    elif args.command == 'materialize':
+        materialize_command(args)
     elif args.command == 'duplicates':
         duplicates_command(args)
     elif args.command == 'web':
@@ -171,4 +290,6 @@ def main():
         parser.print_help()
 
 if __name__ == '__main__':
+    # Needed by --jobs worker processes in frozen (PyInstaller) builds
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
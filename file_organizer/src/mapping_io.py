@@ -0,0 +1,129 @@
+"""
+Streaming reader and writer for view mapping files.
+
+Two formats are supported:
+
+* ``ndjson``: one compact JSON object per line. Written and read one mapping
+  at a time, so files of any size never need to fit in memory.
+* ``json``: a JSON array, as written by earlier versions (with indent=2).
+  New files are written compactly, one element at a time; existing files
+  are read element by element as well.
+
+read_mappings() detects the format from the content, so both kinds of files
+can be passed to the link command.
+"""
+import json
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('json', 'ndjson')
+
+# Characters read from a legacy JSON array per refill
+_READ_CHUNK = 1 << 20
+
+
+def format_for(path: str, fmt: Optional[str] = None) -> str:
+    """Pick the format: explicit, else '.ndjson'/'.jsonl' files are ndjson, anything else json."""
+    if fmt:
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown mappings format '{fmt}'. Available: {', '.join(FORMATS)}")
+        return fmt
+    return 'ndjson' if Path(path).suffix.lower() in ('.ndjson', '.jsonl') else 'json'
+
+
+def write_mappings(mappings: Iterable[Dict], path: str, fmt: Optional[str] = None) -> int:
+    """
+    Write mappings as they are produced and return how many were written.
+
+    Args:
+        mappings: Any iterable of mapping dicts, e.g. RuleEngine.iter_view().
+        path: Output file.
+        fmt: 'json' or 'ndjson'; chosen from the file extension when omitted.
+    """
+    fmt = format_for(path, fmt)
+    count = 0
+    dumps = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+    with open(path, 'w', encoding='utf-8', newline='\n') as f:
+        if fmt == 'ndjson':
+            for mapping in mappings:
+                f.write(dumps(mapping))
+                f.write('\n')
+                count += 1
+        else:
+            f.write('[')
+            for mapping in mappings:
+                if count:
+                    f.write(',\n')
+                f.write(dumps(mapping))
+                count += 1
+            f.write(']\n')
+    return count
+
+
+def read_mappings(path: str) -> Iterator[Dict]:
+    """Yield the mappings stored in a file written by write_mappings or json.dump."""
+    with open(path, 'r', encoding='utf-8') as f:
+        first = ''
+        while True:
+            char = f.read(1)
+            if not char or not char.isspace():
+                first = char
+                break
+        if not first:
+            return
+        if first == '[':
+            yield from _iter_json_array(f)
+            return
+        # NDJSON: the first object starts with the character already consumed
+        line = first + f.readline()
+        while line:
+            if line.strip():
+                yield json.loads(line)
+            line = f.readline()
+
+
+def _iter_json_array(f) -> Iterator[Dict]:
+    """Decode the elements of a JSON array one at a time (the '[' is already consumed)."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    eof = False
+    expect_value = True
+    while True:
+        # Skip whitespace and separators, refilling the buffer as needed
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n':
+                pos += 1
+            if pos < len(buffer) or eof:
+                break
+            buffer, pos = f.read(_READ_CHUNK), 0
+            eof = not buffer
+        if pos >= len(buffer):
+            raise ValueError("Unterminated JSON array in mappings file")
+        char = buffer[pos]
+        if char == ']':
+            return
+        if not expect_value:
+            if char != ',':
+                raise ValueError(f"Expected ',' in mappings file, found {char!r}")
+            pos += 1
+            expect_value = True
+            continue
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+                # A value ending exactly at the buffer end may continue in the next chunk
+                if end < len(buffer) or eof:
+                    break
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            chunk = f.read(_READ_CHUNK)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+        yield value
+        pos = end
+        expect_value = False
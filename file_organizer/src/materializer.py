@@ -0,0 +1,220 @@
+"""
+Materialized views: view mappings stored in the catalog and refreshed incrementally.
+"""
+import hashlib
+import json
+import logging
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from connection import connect
+from rule_engine import RuleEngine, FETCH_SIZE
+from schema import ensure_schema
+
+logger = logging.getLogger(__name__)
+
+# Columns written without bumping files.indexed_at (hash stages, resume
+# bookkeeping); views reading them are always refreshed in full
+UNTRACKED_COLUMNS = {'hash_sha256', 'fingerprint', 'scan_id', 'indexed_at'}
+
+
+def config_hash(config: Dict) -> str:
+    """Stable hash of a view's rule configuration."""
+    canonical = json.dumps(config, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class ViewMaterializer:
+    """
+    Keeps ``view_mappings`` in sync with the rules and the catalog.
+
+    Mappings are computed by RuleEngine and stored per (view, file). A
+    refresh only re-evaluates files whose ``indexed_at`` is not older than
+    the view's last refresh, and drops mappings of deleted files. A view is
+    recomputed in full when its rules changed (``views.config_hash``), when
+    it compares against the current time, or when it reads columns that are
+    updated without bumping ``indexed_at``.
+    """
+
+    def __init__(self, db_path: str, rules_path: str):
+        self.db_path = db_path
+        self.conn = connect(db_path, 'bulk')
+        ensure_schema(self.conn)
+        self.engine = RuleEngine(db_path, rules_path)
+
+    def _full_refresh_reason(self, view_name: str, stored: Optional[Tuple], digest: str) -> Optional[str]:
+        view = self.engine.compiled_views[view_name]
+        if stored is None or stored[1] is None:
+            return 'not materialized yet'
+        if stored[0] != digest:
+            return 'rules changed'
+        if view.time_dependent:
+            return 'depends on the current time'
+        if view.columns & UNTRACKED_COLUMNS:
+            return 'reads columns not tracked by indexed_at'
+        return None
+
+    def refresh(self, view_names: Optional[List[str]] = None, full: bool = False) -> Dict[str, Dict]:
+        """
+        Bring the stored mappings of the given views (default: all) up to date.
+
+        Runs in a single transaction, so readers keep seeing the previous
+        mappings until the refresh commits. Returns per-view statistics:
+        {'mode': 'full'|'incremental', 'reason': ..., 'computed': n, 'removed': n}.
+        """
+        views = self.engine.rules.get('views', {}) or {}
+        if view_names is None:
+            view_names = list(views)
+        for name in view_names:
+            if name not in views:
+                raise ValueError(f"View '{name}' not found in rules.")
+        cursor = self.conn.cursor()
+        # Watermark taken before reading, so rows changed during the refresh
+        # are picked up again by the next one
+        mark = cursor.execute("SELECT CURRENT_TIMESTAMP").fetchone()[0]
+        stored = {name: (digest, materialized_at) for name, digest, materialized_at in cursor.execute(
+            "SELECT name, config_hash, materialized_at FROM views")}
+
+        stats: Dict[str, Dict] = {}
+        full_views, incremental_views = [], []
+        for name in view_names:
+            if name in self.engine.compile_errors:
+                logger.error(f"Skipping view '{name}': {self.engine.compile_errors[name]}")
+                continue
+            digest = config_hash(views[name] or {})
+            reason = 'requested' if full else self._full_refresh_reason(name, stored.get(name), digest)
+            stats[name] = {'mode': 'full' if reason else 'incremental', 'reason': reason,
+                           'computed': 0, 'removed': 0, 'config_hash': digest}
+            (full_views if reason else incremental_views).append(name)
+
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            for name in full_views:
+                cursor.execute("DELETE FROM view_mappings WHERE view_name = ?", (name,))
+                stats[name]['removed'] = cursor.rowcount
+            self._store(cursor, full_views, None, mark, stats)
+
+            if incremental_views:
+                for name in incremental_views:
+                    since = stored[name][1]
+                    # Changed rows are recomputed below; deleted or replaced rows are gone for good
+                    cursor.execute("""
+                        DELETE FROM view_mappings WHERE view_name = ? AND file_id IN
+                            (SELECT id FROM files WHERE indexed_at >= ?)
+                    """, (name, since))
+                    removed = cursor.rowcount
+                    cursor.execute("""
+                        DELETE FROM view_mappings WHERE view_name = ? AND file_id NOT IN
+                            (SELECT id FROM files WHERE deleted_at IS NULL)
+                    """, (name,))
+                    stats[name]['removed'] = removed + cursor.rowcount
+                oldest = min(stored[name][1] for name in incremental_views)
+                self._store(cursor, incremental_views, oldest, mark, stats)
+
+            cursor.executemany("""
+                INSERT INTO views (name, description, config_json, config_hash, materialized_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET
+                    description = excluded.description, config_json = excluded.config_json,
+                    config_hash = excluded.config_hash, materialized_at = excluded.materialized_at
+            """, [(name, (views[name] or {}).get('description'),
+                   json.dumps(views[name] or {}, default=str, ensure_ascii=False),
+                   stats[name]['config_hash'], mark) for name in stats])
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+
+        for name, entry in stats.items():
+            del entry['config_hash']
+            logger.info(f"View '{name}': {entry['mode']} refresh"
+                        f"{' (' + entry['reason'] + ')' if entry['reason'] else ''}, "
+                        f"{entry['computed']} mappings computed, {entry['removed']} removed")
+        return stats
+
+    def _store(self, cursor, view_names: List[str], changed_since: Optional[str],
+               computed_at: str, stats: Dict[str, Dict]):
+        if not view_names:
+            return
+
+        def rows():
+            for view, file_id, rule_index, _, target in self.engine.iter_matches(
+                    view_names, changed_since=changed_since):
+                stats[view.name]['computed'] += 1
+                yield view.name, file_id, target, rule_index, computed_at
+
+        cursor.executemany("""
+            INSERT OR REPLACE INTO view_mappings (view_name, file_id, target_path, rule_index, computed_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, rows())
+
+    def _check_current(self, view_name: str):
+        """Raise ValueError unless the stored mappings of a view match its current rules."""
+        config = (self.engine.rules.get('views', {}) or {}).get(view_name)
+        if not config:
+            raise ValueError(f"View '{view_name}' not found in rules.")
+        stored = self.conn.execute("SELECT config_hash, materialized_at FROM views WHERE name = ?",
+                                   (view_name,)).fetchone()
+        if stored is None or stored[1] is None:
+            raise ValueError(f"View '{view_name}' is not materialized yet; run materialize first.")
+        if stored[0] != config_hash(config):
+            raise ValueError(f"Stored mappings of view '{view_name}' are stale (rules changed); "
+                             f"run materialize first.")
+
+    def iter_view(self, view_name: str, fetch_size: int = FETCH_SIZE) -> Iterator[Dict]:
+        """
+        Stream the stored mappings of a view in file id order (same shape as RuleEngine.iter_view).
+
+        Raises ValueError right away if the view is not in the rules, was never
+        materialized or was materialized with other rules: an empty or outdated
+        mapping set must not reach e.g. sync_links, which would remove links.
+        """
+        self._check_current(view_name)
+        return self._iter_stored(view_name, fetch_size)
+
+    def _iter_stored(self, view_name: str, fetch_size: int) -> Iterator[Dict]:
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT f.path, m.target_path FROM view_mappings m
+            JOIN files f ON f.id = m.file_id
+            WHERE m.view_name = ? AND f.deleted_at IS NULL
+            ORDER BY m.file_id
+        """, (view_name,))
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                return
+            for source_path, target_path in rows:
+                yield {'source_path': source_path, 'target_path': target_path, 'view_name': view_name}
+
+    def iter_views(self, view_names: Optional[List[str]] = None) -> Iterator[Tuple[str, Dict]]:
+        """Stream (view_name, mapping) pairs of stored views (default: all views in the rules)."""
+        if view_names is None:
+            view_names = list(self.engine.rules.get('views', {}) or {})
+        for name in view_names:
+            self._check_current(name)
+        for name in view_names:
+            for mapping in self.iter_view(name):
+                yield name, mapping
+
+    def status(self) -> List[Dict]:
+        """Materialization state of every view in the rules file."""
+        views = self.engine.rules.get('views', {}) or {}
+        stored = {row[0]: row[1:] for row in self.conn.execute("""
+            SELECT v.name, v.config_hash, v.materialized_at,
+                   (SELECT COUNT(*) FROM view_mappings m WHERE m.view_name = v.name)
+            FROM views v
+        """)}
+        result = []
+        for name, config in views.items():
+            digest, materialized_at, count = stored.get(name, (None, None, 0))
+            result.append({
+                'name': name,
+                'materialized_at': materialized_at,
+                'mappings': count,
+                'stale': digest != config_hash(config or {}),
+            })
+        return result
+
+    def close(self):
+        self.engine.close()
+        self.conn.close()
@@ -0,0 +1,93 @@
+"""
+Parallel view evaluation: shards of the catalog evaluated by worker processes.
+
+The id range of files is split into shards. Each worker process opens its
+own read-only connection, compiles the rules once, and evaluates whole
+shards with RuleEngine.iter_matches, using the parent's notion of "now" so
+time-relative rules agree across shards. Results are consumed shard by
+shard in id order, so the output is identical to a serial run; only a
+bounded number of shards is in flight at a time.
+"""
+import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Upper bound of ids per shard, which bounds the results buffered per shard
+SHARD_SIZE = 50000
+# Shards per worker at least, so that uneven shards still balance out
+SHARDS_PER_JOB = 4
+
+_worker_engine = None
+
+
+def shard_ranges(conn, jobs: int, changed_since: Optional[str] = None) -> List[Tuple[int, int]]:
+    """Split the ids of live files (optionally only changed ones) into [start, stop) ranges."""
+    sql = "SELECT MIN(id), MAX(id) FROM files WHERE deleted_at IS NULL"
+    params = []
+    if changed_since is not None:
+        sql += " AND indexed_at >= ?"
+        params.append(changed_since)
+    low, high = conn.execute(sql, params).fetchone()
+    if low is None:
+        return []
+    span = high - low + 1
+    count = max(jobs * SHARDS_PER_JOB, -(-span // SHARD_SIZE))
+    size = max(1, -(-span // count))
+    return [(start, min(start + size, high + 1)) for start in range(low, high + 1, size)]
+
+
+def _init_worker(db_path: str, rules_path: str, pushdown: bool, vectorized: bool):
+    global _worker_engine
+    from rule_engine import RuleEngine
+    _worker_engine = RuleEngine(db_path, rules_path, pushdown=pushdown, vectorized=vectorized)
+
+
+def _run_shard(view_names: List[str], id_range: Tuple[int, int], fetch_size: int,
+               changed_since: Optional[str], now: float) -> List[Tuple[int, int, int, str, str]]:
+    """Evaluate one shard; returns (view index, file_id, rule_index, source_path, target_path)."""
+    positions = {name: i for i, name in enumerate(view_names)}
+    return [(positions[view.name], file_id, rule_index, source_path, target)
+            for view, file_id, rule_index, source_path, target in _worker_engine.iter_matches(
+                view_names, fetch_size, changed_since, id_range, now)]
+
+
+def iter_matches_parallel(engine, views, fetch_size: int, changed_since: Optional[str],
+                          now: float) -> Iterator[Tuple]:
+    """
+    RuleEngine.iter_matches for compiled ``views`` with engine.jobs worker processes.
+
+    Yields the same tuples, in the same order, as the serial evaluation.
+    """
+    shards = shard_ranges(engine.conn, engine.jobs, changed_since)
+    if not shards:
+        return
+    view_names = [view.name for view in views]
+    logger.info(f"Evaluating {len(view_names)} view(s) in {len(shards)} shards "
+                f"with {engine.jobs} worker processes")
+    executor = ProcessPoolExecutor(max_workers=engine.jobs, initializer=_init_worker,
+                                   initargs=(engine.db_path, engine.rules_path,
+                                             engine.pushdown, engine.vectorized))
+    pending = deque()
+    remaining = iter(shards)
+    try:
+        # Keep every worker busy while the consumer handles the oldest shard
+        for id_range in remaining:
+            pending.append(executor.submit(_run_shard, view_names, id_range, fetch_size,
+                                           changed_since, now))
+            if len(pending) >= engine.jobs * 2:
+                break
+        while pending:
+            results = pending.popleft().result()
+            id_range = next(remaining, None)
+            if id_range is not None:
+                pending.append(executor.submit(_run_shard, view_names, id_range, fetch_size,
+                                               changed_since, now))
+            for index, file_id, rule_index, source_path, target in results:
+                yield views[index], file_id, rule_index, source_path, target
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
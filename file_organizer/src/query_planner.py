@@ -0,0 +1,231 @@
+"""
+Push compiled view conditions down into SQLite.
+
+A view's rules are translated, in order, into one CASE expression that
+yields the index of the first matching rule, so SQLite does the filtering
+and Python only renders target paths. Translation stops at the first rule
+whose condition has no exact SQL equivalent (regexes, arbitrary wildcards,
+...); rows not decided by then are evaluated in Python from that rule on.
+Every translation reproduces the Python semantics exactly, including how
+NULLs, text in numeric columns and case-insensitive comparison behave.
+"""
+import logging
+import sqlite3
+from typing import Dict, List, Optional, Set, Tuple
+
+from rule_compiler import (And, Always, ColumnRef, CompiledView, Compare, Match, Now, Or,
+                           DATE_FIELDS, may_render_empty, resolve_now, template_fields)
+
+logger = logging.getLogger(__name__)
+
+# Column alias carrying the index of the first matching rule
+RULE_INDEX = 'rule_index'
+
+# Text containing a character outside printable ASCII, where SQLite's
+# case-insensitive comparison differs from str.lower()
+_NON_ASCII_GLOB = '*[^ -~]*'
+# A newline followed by more text: the only strings '^.*$' does not match
+_INNER_NEWLINE_GLOB = '*\n?*'
+
+
+def _py_lower(value):
+    return value.lower() if isinstance(value, str) else value
+
+
+class ViewPlan:
+    """
+    One SQL query for one or more views, plus how to finish them in Python.
+
+    Rows come back as (id, <columns>..., one rule index per view), ordered
+    by id. For each view, rules before ``python_from[i]`` were decided by
+    SQLite (the index is the matching rule, NULL if none matched); an
+    index equal to ``python_from[i]`` means rules from there on still need
+    to be evaluated in Python.
+    """
+
+    def __init__(self, views: List[CompiledView], sql: Optional[str], params: List,
+                 python_from: List[int]):
+        self.views = views
+        self.sql = sql
+        self.params = params
+        self.python_from = python_from
+
+
+class _Translator:
+    """Translates condition trees to SQL; returns None where that would not be exact."""
+
+    def __init__(self, conn: sqlite3.Connection, columns: Set[str],
+                 numeric: Optional[Dict[str, bool]] = None):
+        self.conn = conn
+        self.columns = columns
+        self.now = None
+        self._numeric = {} if numeric is None else numeric
+
+    def column_sql(self, column: str) -> str:
+        # The Python side reads missing columns as None
+        return f'"{column}"' if column in self.columns else 'NULL'
+
+    def numeric_only(self, column: str) -> bool:
+        """True if a column holds nothing but numbers and NULLs (so SQL and Python compare alike)."""
+        if column not in self.columns:
+            return True
+        if column not in self._numeric:
+            # Text and blobs sort after all numbers, so this is true exactly for
+            # them, and on an indexed column SQLite answers it with one seek
+            row = self.conn.execute(
+                f"""SELECT EXISTS(SELECT 1 FROM files WHERE "{column}" >= '')""").fetchone()
+            self._numeric[column] = not row[0]
+        return self._numeric[column]
+
+    def translate(self, node) -> Optional[Tuple[str, List]]:
+        if isinstance(node, Always):
+            return ('1' if node.value else '0'), []
+        if isinstance(node, (And, Or)):
+            parts = [self.translate(child) for child in node.children]
+            if any(part is None for part in parts):
+                return None
+            if not parts:
+                return ('1' if isinstance(node, And) else '0'), []
+            joiner = ' AND ' if isinstance(node, And) else ' OR '
+            return ('(' + joiner.join(sql for sql, _ in parts) + ')',
+                    [param for _, params in parts for param in params])
+        if isinstance(node, Compare):
+            return self._compare(node)
+        if isinstance(node, Match):
+            return self._match(node)
+        return None
+
+    def _compare(self, node: Compare) -> Optional[Tuple[str, List]]:
+        # Python coerces numeric text; SQLite would compare it as text
+        if not self.numeric_only(node.column):
+            return None
+        column = self.column_sql(node.column)
+        rhs = node.rhs
+        if isinstance(rhs, Now):
+            return f"{column} {node.op} ?", [resolve_now(rhs.days, self.now)]
+        if isinstance(rhs, ColumnRef):
+            # A name that is not a column is compared as a string in Python
+            if rhs.name not in self.columns or not self.numeric_only(rhs.name):
+                return None
+            return f"{column} {node.op} \"{rhs.name}\"", []
+        return f"{column} {node.op} ?", [rhs]
+
+    def _match(self, node: Match) -> Optional[Tuple[str, List]]:
+        column = self.column_sql(node.column)
+        value = node.value
+        if node.kind == 'wildcard':
+            if value.strip('*') or not value:
+                return None
+            # '*' matches str(value) of anything without an inner newline
+            return (f"(typeof({column}) != 'text' OR {column} NOT GLOB ?)",
+                    [_INNER_NEWLINE_GLOB])
+        if node.kind != 'equals':
+            return None
+        if value is None:
+            return f"{column} IS NULL", []
+        if isinstance(value, str):
+            lowered = value.lower()
+            return (f"(typeof({column}) = 'text' AND CASE WHEN {column} GLOB ? "
+                    f"THEN py_lower({column}) = ? ELSE {column} = ? COLLATE NOCASE END)",
+                    [_NON_ASCII_GLOB, lowered, lowered])
+        if isinstance(value, (int, float)):
+            return f"(typeof({column}) IN ('integer', 'real') AND {column} = ?)", [value]
+        return None
+
+
+def _rule_index_sql(translator: _Translator, view: CompiledView) -> Tuple[str, List, int]:
+    """CASE expression giving the first matching rule of a view, its parameters and python_from."""
+    translator.now = view.now
+    whens, params = [], []
+    for index, rule in enumerate(view.rules):
+        translated = translator.translate(rule.condition)
+        if translated is None:
+            break
+        sql, rule_params = translated
+        whens.append(f"WHEN {sql} THEN {index}")
+        params.extend(rule_params)
+    python_from = len(whens)
+    logger.debug(f"View '{view.name}': {python_from}/{len(view.rules)} rules pushed down to SQLite")
+    if not view.rules:
+        return 'NULL', [], 0
+    if not whens:
+        return '0', [], 0
+    if python_from == len(view.rules):
+        return f"CASE {' '.join(whens)} END", params, python_from
+    return f"CASE {' '.join(whens)} ELSE {python_from} END", params, python_from
+
+
+def _needs_full_rows(view: CompiledView, python_from: int) -> bool:
+    # Python needs whole rows to evaluate rules, and to fall through past a
+    # rule whose target renders empty
+    return python_from < len(view.rules) or any(
+        may_render_empty(rule.target) for rule in view.rules)
+
+
+def scan_filter(changed_since: Optional[str] = None,
+                id_range: Optional[Tuple[int, int]] = None) -> Tuple[str, List]:
+    """Extra WHERE terms (starting with ' AND ') and parameters restricting a scan of files."""
+    sql, params = '', []
+    if changed_since is not None:
+        sql += ' AND indexed_at >= ?'
+        params.append(changed_since)
+    if id_range is not None:
+        sql += ' AND id >= ? AND id < ?'
+        params.extend(id_range)
+    return sql, params
+
+
+def plan_views(conn: sqlite3.Connection, views: List[CompiledView],
+               changed_since: Optional[str] = None, id_range: Optional[Tuple[int, int]] = None,
+               numeric: Optional[Dict[str, bool]] = None) -> ViewPlan:
+    """
+    Build one query evaluating several views in a single pass over files.
+
+    Each view contributes its own rule index column; rows matched by no view
+    are dropped by SQLite. With ``changed_since`` (a CURRENT_TIMESTAMP
+    value) only rows whose indexed_at is at least that recent are read;
+    with ``id_range`` (start, stop) only rows with start <= id < stop.
+    ``numeric`` caches which columns hold only numbers across calls (the
+    check reads the whole table unless the column is indexed).
+    """
+    if not any(view.rules for view in views):
+        return ViewPlan(views, None, [], [0] * len(views))
+    conn.create_function('py_lower', 1, _py_lower, deterministic=True)
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(files)")]
+    translator = _Translator(conn, set(columns), numeric)
+
+    indexes, params, python_from = [], [], []
+    for view in views:
+        sql, view_params, view_python_from = _rule_index_sql(translator, view)
+        indexes.append(sql)
+        params.extend(view_params)
+        python_from.append(view_python_from)
+
+    # Only the columns used by target templates are read, unless Python
+    # evaluates rules itself
+    if any(_needs_full_rows(view, start) for view, start in zip(views, python_from)):
+        select = '*'
+    else:
+        needed = {'path'}
+        for view in views:
+            for rule in view.rules:
+                for key in template_fields(rule.target):
+                    needed.add('created' if key in DATE_FIELDS else key)
+        select = ', '.join(f'"{c}"' for c in columns if c in needed)
+
+    aliases = [f"{RULE_INDEX}_{i}" for i in range(len(views))]
+    index_columns = ', '.join(f"{sql} AS {alias}" for sql, alias in zip(indexes, aliases))
+    any_match = ' OR '.join(f"{alias} IS NOT NULL" for alias in aliases)
+    filters, filter_params = scan_filter(changed_since, id_range)
+    params.extend(filter_params)
+    sql = f"""SELECT * FROM (
+                  SELECT id AS _id, {select}, {index_columns}
+                  FROM files WHERE deleted_at IS NULL{filters})
+              WHERE {any_match}
+              ORDER BY _id"""
+    return ViewPlan(views, sql, params, python_from)
+
+
+def plan_view(conn: sqlite3.Connection, view: CompiledView) -> ViewPlan:
+    """Build the SQL for a compiled view, pushing down as many rules as possible."""
+    return plan_views(conn, [view])
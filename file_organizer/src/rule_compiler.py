@@ -0,0 +1,434 @@
+"""
+Compile view rules into predicate closures and pre-parsed templates.
+
+The interpreter in RuleEngine re-parses condition strings, operators and
+relative times for every file. Here each view's rules are parsed once into a
+small condition tree (which later stages can also inspect, e.g. to push
+conditions down into SQL) and then turned into closures with every constant
+already resolved.
+"""
+import operator
+import re
+import time
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+# Condition tree -------------------------------------------------------------
+
+class Always(NamedTuple):
+    """Constant condition (empty conditions and plain truthy/falsy values)."""
+    value: bool
+
+
+class And(NamedTuple):
+    children: Tuple
+
+
+class Or(NamedTuple):
+    children: Tuple
+
+
+class Compare(NamedTuple):
+    """Numeric comparison ``column op rhs``."""
+    column: str
+    op: str
+    rhs: Any
+
+
+class Match(NamedTuple):
+    """Pattern match of a column: kind is 'regex', 'wildcard' or 'equals'."""
+    column: str
+    kind: str
+    value: Any
+
+
+class Now(NamedTuple):
+    """Right-hand side ``now - days days`` (days is 0 for plain ``now``)."""
+    days: int
+
+
+class ColumnRef(NamedTuple):
+    """Right-hand side naming another column (or, if no such column, a string)."""
+    name: str
+
+
+OPERATORS = {
+    '<': operator.lt,
+    '>': operator.gt,
+    '<=': operator.le,
+    '>=': operator.ge,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+
+# Two-character operators first; an optional leading column allows
+# "size >= 1 and size < 2", where later parts name their column again
+_COMPARISON_RE = re.compile(r'^\s*(?:(\w+)\s*)?(<=|>=|==|!=|<|>)\s*(.+)$')
+_NOW_RE = re.compile(r'now\s*-\s*(\d+)\s*days?', re.IGNORECASE)
+_PLACEHOLDER_RE = re.compile(r'\{(\w+)\}')
+_SLASHES_RE = re.compile(r'/+')
+# Characters that are invalid in Windows filenames, each replaced by '_'.
+# A string table indexed by code point (characters past its end are kept)
+# translates faster than a dict; most values need no change at all, which
+# one regex search finds out
+_INVALID_CHARS = '<>:"/\\|?*'
+_SANITIZE_TABLE = ''.join('_' if chr(i) in _INVALID_CHARS else chr(i) for i in range(128))
+_NEEDS_SANITIZING = re.compile('[' + re.escape(_INVALID_CHARS) + ']').search
+
+DATE_FIELDS = {'year', 'month', 'month_name', 'day'}
+# Position of each date field in the tuples returned by date_parts()
+_DATE_PART_INDEX = {'year': 0, 'month': 1, 'month_name': 2, 'day': 3}
+_UNKNOWN_DATE = ('Unknown', '00', 'Unknown', '00')
+_DAY = 86400
+
+
+def parse_condition(condition: Any):
+    """Parse a rule's ``condition`` value into a condition tree."""
+    if not condition:
+        # RuleEngine.evaluate_rule treats a missing or empty condition as a match
+        return Always(True)
+    return _parse(condition)
+
+
+def _parse(condition: Any):
+    if isinstance(condition, dict):
+        return And(tuple(_parse_key_value(key, expected) for key, expected in condition.items()))
+    if isinstance(condition, list):
+        return And(tuple(_parse(sub) for sub in condition))
+    return Always(bool(condition))
+
+
+def _parse_key_value(key: str, expected: Any):
+    if isinstance(expected, str):
+        return parse_expression(key, expected)
+    return _parse_match(key, expected)
+
+
+def parse_expression(column: str, expression: str):
+    """Parse ">= 102400", ">= now - 30 days", ">= 1 and size < 2", "pdf", ..."""
+    expr = expression.strip()
+    if ' and ' in expr:
+        return And(tuple(parse_expression(column, p.strip()) for p in expr.split(' and ')))
+    if ' or ' in expr:
+        return Or(tuple(parse_expression(column, p.strip()) for p in expr.split(' or ')))
+    m = _COMPARISON_RE.match(expr)
+    if m:
+        named_column, op, rhs = m.groups()
+        return Compare(named_column or column, op, _parse_rhs(rhs))
+    return _parse_match(column, expression)
+
+
+def _parse_rhs(rhs: str):
+    rhs = rhs.strip()
+    m = _NOW_RE.match(rhs)
+    if m:
+        return Now(int(m.group(1)))
+    if rhs.lower() == 'now':
+        return Now(0)
+    try:
+        return int(rhs)
+    except ValueError:
+        try:
+            return float(rhs)
+        except ValueError:
+            return ColumnRef(rhs)
+
+
+def _parse_match(column: str, expected: Any):
+    if isinstance(expected, str) and expected.startswith('/') and expected.endswith('/'):
+        return Match(column, 'regex', expected[1:-1])
+    if isinstance(expected, str) and '*' in expected:
+        return Match(column, 'wildcard', expected)
+    return Match(column, 'equals', expected)
+
+
+def is_time_dependent(node) -> bool:
+    """True if the condition compares against the current time."""
+    if isinstance(node, (And, Or)):
+        return any(is_time_dependent(child) for child in node.children)
+    return isinstance(node, Compare) and isinstance(node.rhs, Now)
+
+
+def condition_columns(node) -> set:
+    """Names of the columns a condition reads."""
+    if isinstance(node, (And, Or)):
+        return set().union(*(condition_columns(child) for child in node.children))
+    if isinstance(node, Compare):
+        columns = {node.column}
+        if isinstance(node.rhs, ColumnRef):
+            columns.add(node.rhs.name)
+        return columns
+    if isinstance(node, Match):
+        return {node.column}
+    return set()
+
+
+# Closures ------------------------------------------------------------------
+
+def coerce_to_number(value):
+    """Convert value to int or float, or None if it is not numeric."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    try:
+        return int(value)
+    except ValueError:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+
+
+def resolve_now(days: int, now: float) -> float:
+    """Timestamp of ``now - days days`` in local time, as the interpreter computes it."""
+    return (datetime.fromtimestamp(now) - timedelta(days=days)).timestamp()
+
+
+def build_predicate(node, now: float) -> Callable[[Dict], bool]:
+    """Turn a condition tree into a closure ``row -> bool``."""
+    if isinstance(node, Always):
+        value = node.value
+        return lambda row: value
+    if isinstance(node, And):
+        children = [build_predicate(child, now) for child in node.children]
+        if len(children) == 1:
+            return children[0]
+
+        def all_of(row):
+            for child in children:
+                if not child(row):
+                    return False
+            return True
+        return all_of
+    if isinstance(node, Or):
+        children = [build_predicate(child, now) for child in node.children]
+
+        def any_of(row):
+            for child in children:
+                if child(row):
+                    return True
+            return False
+        return any_of
+    if isinstance(node, Compare):
+        return _build_compare(node, now)
+    return _build_match(node)
+
+
+def _build_compare(node: Compare, now: float) -> Callable[[Dict], bool]:
+    column, op = node.column, OPERATORS[node.op]
+    rhs = node.rhs
+    if isinstance(rhs, Now):
+        rhs = resolve_now(rhs.days, now)
+
+    if isinstance(rhs, ColumnRef):
+        name = rhs.name
+
+        def rhs_value(row):
+            return coerce_to_number(row[name]) if name in row else name
+    else:
+        rhs_value = None
+
+    def predicate(row):
+        actual = row.get(column)
+        if type(actual) not in (int, float):
+            actual = coerce_to_number(actual)
+            if actual is None:
+                return False
+        try:
+            return op(actual, rhs if rhs_value is None else rhs_value(row))
+        except (TypeError, ValueError):
+            return False
+    return predicate
+
+
+def _build_match(node: Match) -> Callable[[Dict], bool]:
+    column = node.column
+    if node.kind == 'regex':
+        match = re.compile(node.value, re.IGNORECASE).match
+        return lambda row: bool(match(str(row.get(column))))
+    if node.kind == 'wildcard':
+        match = re.compile('^' + re.escape(node.value).replace('\\*', '.*') + '$', re.IGNORECASE).match
+        return lambda row: bool(match(str(row.get(column))))
+    expected = node.value
+    if isinstance(expected, str):
+        lowered = expected.lower()
+
+        def predicate(row):
+            actual = row.get(column)
+            if isinstance(actual, str):
+                return actual.lower() == lowered
+            return actual == expected
+        return predicate
+    return lambda row: row.get(column) == expected
+
+
+def sanitize(text: str) -> str:
+    """Replace characters that are invalid in Windows filenames."""
+    return text.translate(_SANITIZE_TABLE) if _NEEDS_SANITIZING(text) else text
+
+
+def parse_date(timestamp) -> Optional[datetime]:
+    if timestamp:
+        try:
+            return datetime.fromtimestamp(timestamp)
+        except (ValueError, OSError):
+            pass
+    return None
+
+
+def _format_date(dt: Optional[datetime]) -> Tuple[str, str, str, str]:
+    if dt is None:
+        return _UNKNOWN_DATE
+    return dt.strftime('%Y'), dt.strftime('%m'), dt.strftime('%B'), dt.strftime('%d')
+
+
+@lru_cache(maxsize=1 << 14)
+def _day_date_parts(day: int):
+    """
+    Local date parts of UTC day ``day``: (local midnight timestamp, parts
+    before it, parts from it on), or None if the UTC offset changes that day.
+    """
+    start = day * _DAY
+    try:
+        offset = time.localtime(start).tm_gmtoff
+        if time.localtime(start + _DAY - 1).tm_gmtoff != offset:
+            return None
+    except (ValueError, OSError, OverflowError):
+        return None
+    midnight = start + (-offset) % _DAY
+    return (midnight, _format_date(datetime.fromtimestamp(start)),
+            _format_date(datetime.fromtimestamp(midnight)) if midnight < start + _DAY else None)
+
+
+def date_parts(timestamp) -> Tuple[str, str, str, str]:
+    """
+    (year, month, month_name, day) of a timestamp in local time, as strftime
+    formats them ('%Y', '%m', '%B', '%d'), or the placeholders used for
+    files without a valid creation time.
+
+    Decompositions are cached per day, so files created on the same day
+    share one datetime conversion.
+    """
+    if not timestamp:
+        return _UNKNOWN_DATE
+    if type(timestamp) in (int, float):
+        try:
+            cached = _day_date_parts(int(timestamp // _DAY))
+        except (ValueError, OverflowError):
+            # NaN and infinities
+            cached = None
+        if cached is not None:
+            midnight, before, after = cached
+            return before if timestamp < midnight else after
+    return _format_date(parse_date(timestamp))
+
+
+def template_fields(template: str) -> List[str]:
+    """Placeholder names used by a template, in order."""
+    return _PLACEHOLDER_RE.split(template)[1::2]
+
+
+def may_render_empty(template: str) -> bool:
+    """True if a template has no literal text besides slashes (so may render as '')."""
+    return not ''.join(_PLACEHOLDER_RE.split(template)[0::2]).strip('/')
+
+
+def build_renderer(template: str) -> Callable[[Dict], str]:
+    """
+    Pre-split a path template such as "Date/{year}/{month_name}/{name}".
+
+    Returns a closure ``row -> target path`` producing the same result as
+    RuleEngine._render_template.
+    """
+    pieces = _PLACEHOLDER_RE.split(template)
+    # Segments after the leading literal: (field, date part index or None, literal)
+    segments = [(key, _DATE_PART_INDEX.get(key), literal)
+                for key, literal in zip(pieces[1::2], pieces[2::2])]
+    head = pieces[0]
+    uses_date = any(index is not None for _, index, _ in segments)
+
+    def render(row):
+        parts = date_parts(row.get('created')) if uses_date else None
+        out = [head]
+        for key, index, literal in segments:
+            if index is not None:
+                out.append(parts[index])
+            else:
+                value = row.get(key, '')
+                if type(value) is not str:
+                    value = str(value)
+                out.append(value.translate(_SANITIZE_TABLE) if _NEEDS_SANITIZING(value) else value)
+            out.append(literal)
+        result = ''.join(out)
+        if '//' in result:
+            result = _SLASHES_RE.sub('/', result)
+        return result.strip('/')
+    return render
+
+
+# Compiled views ------------------------------------------------------------
+
+class CompiledRule(NamedTuple):
+    position: int                        # index of the rule in the view's config
+    condition: Any                       # condition tree
+    target: str                          # raw template
+    predicate: Callable[[Dict], bool]
+    render: Callable[[Dict], str]
+
+
+class CompiledView:
+    """A view's rules as closures, evaluated first-match-wins."""
+
+    def __init__(self, name: str, config: Dict, now: float):
+        self.name = name
+        self.config = config
+        self.now = now
+        self.rules: List[CompiledRule] = []
+        for position, rule in enumerate(config.get('rules', []) or []):
+            target = rule.get('target', '')
+            if not target:
+                # Never produces a mapping (evaluate_rule returns None)
+                continue
+            condition = parse_condition(rule.get('condition'))
+            self.rules.append(CompiledRule(position, condition, target,
+                                           build_predicate(condition, now),
+                                           build_renderer(target)))
+        self.time_dependent = any(is_time_dependent(rule.condition) for rule in self.rules)
+        # Columns the view's result depends on
+        self.columns = {'path'}
+        for rule in self.rules:
+            self.columns |= condition_columns(rule.condition)
+            self.columns |= {'created' if key in DATE_FIELDS else key
+                             for key in template_fields(rule.target)}
+
+    def target_for(self, row: Dict, start: int = 0) -> Optional[str]:
+        """Target path of the first matching rule (from rule ``start`` on), or None."""
+        for rule in (self.rules[start:] if start else self.rules):
+            if rule.predicate(row):
+                target = rule.render(row)
+                if target:
+                    return target
+                # An empty target falls through to the next rule, as in the interpreter
+        return None
+
+    def match(self, row: Dict, start: int = 0) -> Optional[Tuple[int, str]]:
+        """Like target_for, but return (index into self.rules, target path)."""
+        for index in range(start, len(self.rules)):
+            rule = self.rules[index]
+            if rule.predicate(row):
+                target = rule.render(row)
+                if target:
+                    return index, target
+        return None
+
+
+def compile_view(name: str, config: Dict, now: float) -> CompiledView:
+    return CompiledView(name, config, now)
+
+
+def compile_views(rules: Dict, now: float) -> Dict[str, CompiledView]:
+    """Compile every view of a loaded rules file."""
+    return {name: compile_view(name, config or {}, now)
+            for name, config in (rules.get('views') or {}).items()}
@@ -6,22 +6,90 @@ import sqlite3
 from pathlib import Path, PureWindowsPath
 import re
 from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional
+from typing import Dict, Iterator, List, Any, Optional, Tuple
 import logging
 import math
 import operator
+import time
+
+from connection import connect
+from parallel import iter_matches_parallel
+from query_planner import plan_views, scan_filter
+from rule_compiler import CompiledView, build_renderer, compile_view, sanitize
+from schema import ensure_schema
+from vectorized import HAS_NUMPY, VectorizedView, iter_batch_matches
 
 logger = logging.getLogger(__name__)
 
+# Rows fetched from the cursor at a time while streaming mappings
+FETCH_SIZE = 10000
+
+
+def _fetch_rows(cursor: sqlite3.Cursor, size: int):
+    """Iterate over a cursor's rows, fetching them in batches."""
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            return
+        yield from rows
+
+
 class RuleEngine:
     """
     Evaluates rules against file metadata to determine target paths for virtual views.
     """
     
-    def __init__(self, db_path: str, rules_path: str):
+    def __init__(self, db_path: str, rules_path: str, compiled: bool = True,
+                 pushdown: bool = True, vectorized: bool = False, jobs: int = 1):
+        """
+        Args:
+            db_path: Catalog database.
+            rules_path: YAML file with view definitions.
+            compiled: Evaluate views through closures built once by
+                rule_compiler (default). False uses the interpreter below,
+                which re-parses every condition for every file.
+            pushdown: With compiled rules, let SQLite evaluate every condition
+                query_planner can translate (default).
+            vectorized: With compiled rules, evaluate numeric conditions over
+                NumPy arrays of each fetched batch instead (see vectorized.py).
+                Ignored, with a warning, when NumPy is not installed.
+            jobs: Worker processes evaluating compiled views, each over its
+                own shards of the catalog (default 1: no workers).
+        """
         self.db_path = db_path
+        self.rules_path = rules_path
         self.rules = self._load_rules(rules_path)
-        self.conn = sqlite3.connect(db_path)
+        # The read connection is query_only and cannot migrate a legacy catalog
+        conn = connect(db_path, 'bulk')
+        try:
+            ensure_schema(conn)
+        finally:
+            conn.close()
+        self.conn = connect(db_path, 'read')
+        self.compiled = compiled
+        if vectorized and not HAS_NUMPY:
+            logger.warning("NumPy is not installed; vectorized rule evaluation is disabled.")
+        self.vectorized = compiled and vectorized and HAS_NUMPY
+        self.pushdown = compiled and pushdown and not self.vectorized
+        if jobs > 1 and not compiled:
+            logger.warning("Parallel view generation needs compiled rules; using one process.")
+        self.jobs = jobs if compiled else 1
+        self._numeric_columns: Optional[Dict[str, bool]] = None
+        self._numeric_version: Optional[int] = None
+        self.compiled_views: Dict[str, CompiledView] = {}
+        self.compile_errors: Dict[str, Exception] = {}
+        self._renderers: Dict[str, Any] = {}
+        if compiled:
+            self._compile_all(time.time())
+    
+    def _compile_all(self, now: float):
+        for name, config in (self.rules.get('views') or {}).items():
+            try:
+                self.compiled_views[name] = compile_view(name, config or {}, now)
+            except (re.error, TypeError, AttributeError, KeyError) as e:
+                # Reported when the view is generated; other views stay usable
+                logger.error(f"Cannot compile rules of view '{name}': {e}")
+                self.compile_errors[name] = e
     
     def _load_rules(self, path: str) -> Dict:
         with open(path, 'r', encoding='utf-8') as f:
@@ -92,9 +160,13 @@ class RuleEngine:
         # Parse comparison operator
         # Patterns: operator number, operator "now - X days", operator variable
         # Supported operators: <, >, <=, >=, ==, !=
-        m = re.match(r'^\s*(<|>|<=|>=|==|!=)\s*(.+)$', expr)
+        # The left side may name the column again ("size < 1048576"); two-character
+        # operators must be tried before "<" and ">"
+        m = re.match(r'^\s*(?:(\w+)\s*)?(<=|>=|==|!=|<|>)\s*(.+)$', expr)
         if m:
-            op_str, rhs = m.groups()
+            column, op_str, rhs = m.groups()
+            if column:
+                actual = file_row.get(column)
             # Evaluate right-hand side
             rhs_val = self._eval_rhs(rhs, file_row)
             # Convert actual to appropriate type
@@ -175,31 +247,11 @@ class RuleEngine:
     
     def _render_template(self, template: str, file_row: Dict) -> str:
         """Render a path template using file metadata."""
-        # Replace placeholders like {category}, {year}, etc.
-        def replace(match):
-            key = match.group(1)
-            # Special handlers
-            if key == 'year':
-                dt = self._parse_date(file_row.get('created'))
-                return dt.strftime('%Y') if dt else 'Unknown'
-            if key == 'month':
-                dt = self._parse_date(file_row.get('created'))
-                return dt.strftime('%m') if dt else '00'
-            if key == 'month_name':
-                dt = self._parse_date(file_row.get('created'))
-                return dt.strftime('%B') if dt else 'Unknown'
-            if key == 'day':
-                dt = self._parse_date(file_row.get('created'))
-                return dt.strftime('%d') if dt else '00'
-            # Direct attribute
-            value = file_row.get(key, '')
-            # Sanitize for filesystem
-            return self._sanitize(str(value))
-        
-        result = re.sub(r'\{(\w+)\}', replace, template)
-        # Ensure no double slashes
-        result = re.sub(r'/+', '/', result)
-        return result.strip('/')
+        # Templates are split into literal and field segments once, on first use
+        render = self._renderers.get(template)
+        if render is None:
+            render = self._renderers[template] = build_renderer(template)
+        return render(file_row)
     
     def _parse_date(self, timestamp: float) -> Optional[datetime]:
         if timestamp:
@@ -211,38 +263,191 @@ class RuleEngine:
     
     def _sanitize(self, text: str) -> str:
         """Replace characters that are invalid in Windows filenames."""
-        invalid = r'[<>:"/\\|?*]'
-        return re.sub(invalid, '_', text)
+        return sanitize(text)
     
     def generate_view(self, view_name: str) -> List[Dict]:
         """
         Generate the mapping for a given view.
         Returns list of dicts with keys: source_path, target_path, view_name.
         """
+        return list(self.iter_view(view_name))
+    
+    def iter_view(self, view_name: str, fetch_size: int = FETCH_SIZE) -> Iterator[Dict]:
+        """
+        Stream the mappings of a view straight from the database cursor.
+        
+        Rows are fetched ``fetch_size`` at a time, so memory use does not grow
+        with the size of the catalog unless the caller collects the results.
+        """
         view_config = self.rules.get('views', {}).get(view_name)
         if not view_config:
             raise ValueError(f"View '{view_name}' not found in rules.")
         
-        rules = view_config.get('rules', [])
+        if not self.compiled:
+            cursor = self.conn.cursor()
+            cursor.execute("SELECT * FROM files WHERE deleted_at IS NULL ORDER BY id")
+            columns = [col[0] for col in cursor.description]
+            yield from self._interpret_view(view_name, view_config.get('rules', []),
+                                            _fetch_rows(cursor, fetch_size), columns)
+            return
+        
+        for _, mapping in self.iter_views([view_name], fetch_size):
+            yield mapping
+    
+    def generate_views(self, view_names: Optional[List[str]] = None) -> Dict[str, List[Dict]]:
+        """
+        Generate the mappings of several views (default: all) in one pass.
+        
+        Views whose rules cannot be compiled are logged and map to an empty list.
+        """
+        if view_names is None:
+            view_names = list(self.rules.get('views', {}) or {})
+        result = {name: [] for name in view_names}
+        if not self.compiled:
+            for name in view_names:
+                try:
+                    result[name] = self.generate_view(name)
+                except Exception as e:
+                    logger.error(f"Failed to generate view '{name}': {e}")
+            return result
+        usable = [name for name in view_names if name not in self.compile_errors]
+        for name, mapping in self.iter_views(usable):
+            result[name].append(mapping)
+        return result
+    
+    def iter_views(self, view_names: List[str],
+                   fetch_size: int = FETCH_SIZE) -> Iterator[Tuple[str, Dict]]:
+        """
+        Stream (view_name, mapping) pairs for several views from one read of the catalog.
+        
+        Every row is fetched once and evaluated against the compiled rules of
+        all views, so the cost grows with the number of files rather than
+        files × views. Pairs come in file id order.
+        """
+        for view, _, _, source_path, target in self.iter_matches(view_names, fetch_size):
+            yield view.name, {
+                'source_path': source_path,
+                'target_path': target,
+                'view_name': view.name
+            }
+    
+    def iter_matches(self, view_names: List[str], fetch_size: int = FETCH_SIZE,
+                     changed_since: Optional[str] = None, id_range: Optional[Tuple[int, int]] = None,
+                     now: Optional[float] = None
+                     ) -> Iterator[Tuple[CompiledView, int, int, str, str]]:
+        """
+        Stream (view, file_id, rule_index, source_path, target_path) for several views.
+        
+        rule_index is the position of the matching rule in the view's config.
+        With ``changed_since`` (a CURRENT_TIMESTAMP value) only files whose
+        indexed_at is at least that recent are evaluated; with ``id_range``
+        (start, stop) only files with start <= id < stop. ``now`` fixes the
+        time relative conditions compare against (default: the current time).
+        
+        With jobs > 1 the id range is split into shards evaluated by worker
+        processes (see parallel.py); the results are the same, in the same order.
+        """
+        if now is None:
+            now = time.time()
+        views = [self._compiled_view(name, now) for name in view_names]
+        if not views:
+            return
+        if self.jobs > 1 and id_range is None:
+            yield from iter_matches_parallel(self, views, fetch_size, changed_since, now)
+            return
+        if self.pushdown:
+            yield from self._iter_pushdown(views, fetch_size, changed_since, id_range)
+            return
+        if self.vectorized:
+            yield from self._iter_vectorized(views, fetch_size, changed_since, id_range)
+            return
+        filters, params = scan_filter(changed_since, id_range)
         cursor = self.conn.cursor()
-        cursor.execute("SELECT * FROM files")
+        cursor.execute(f"SELECT * FROM files WHERE deleted_at IS NULL{filters} ORDER BY id", params)
         columns = [col[0] for col in cursor.description]
-        rows = cursor.fetchall()
-        
-        mappings = []
+        for row in _fetch_rows(cursor, fetch_size):
+            file_row = dict(zip(columns, row))
+            for view in views:
+                match = view.match(file_row)
+                if match:
+                    yield (view, file_row['id'], view.rules[match[0]].position,
+                           file_row['path'], match[1])
+    
+    def _iter_pushdown(self, views: List[CompiledView], fetch_size: int, changed_since: Optional[str],
+                       id_range: Optional[Tuple[int, int]]) -> Iterator[Tuple[CompiledView, int, int, str, str]]:
+        """iter_matches with SQLite filtering rows and picking each view's matching rule."""
+        # The planner's column type checks are kept until the catalog changes
+        # (PRAGMA data_version moves whenever another connection commits)
+        version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        if self._numeric_columns is None or version != self._numeric_version:
+            self._numeric_columns, self._numeric_version = {}, version
+        plan = plan_views(self.conn, views, changed_since, id_range, self._numeric_columns)
+        if plan.sql is None:
+            return
+        cursor = self.conn.cursor()
+        cursor.execute(plan.sql, plan.params)
+        # Drop the leading id and the trailing rule index columns
+        first_index = len(cursor.description) - len(views)
+        columns = [col[0] for col in cursor.description][1:first_index]
+        checks = list(zip(range(first_index, first_index + len(views)), views, plan.python_from))
+        for row in _fetch_rows(cursor, fetch_size):
+            file_row = dict(zip(columns, row[1:]))
+            for position, view, python_from in checks:
+                index = row[position]
+                if index is None:
+                    continue
+                if index < python_from:
+                    target = view.rules[index].render(file_row)
+                    match = (index, target) if target else view.match(file_row, index + 1)
+                else:
+                    match = view.match(file_row, index)
+                if match:
+                    yield (view, row[0], view.rules[match[0]].position,
+                           file_row['path'], match[1])
+    
+    def _iter_vectorized(self, views: List[CompiledView], fetch_size: int, changed_since: Optional[str],
+                         id_range: Optional[Tuple[int, int]]) -> Iterator[Tuple[CompiledView, int, int, str, str]]:
+        """iter_matches with numeric conditions evaluated over NumPy arrays, batch by batch."""
+        # Compiled rules only read the columns a view names, so only those are fetched
+        needed = set().union(*(view.columns for view in views)) | {'id', 'path'}
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(files)") if row[1] in needed]
+        select = ', '.join(f'"{column}"' for column in columns)
+        filters, params = scan_filter(changed_since, id_range)
+        cursor = self.conn.cursor()
+        cursor.execute(f"SELECT {select} FROM files WHERE deleted_at IS NULL{filters} ORDER BY id", params)
+        vviews = [VectorizedView(view) for view in views]
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                return
+            for view, file_row, index, target in iter_batch_matches(vviews, columns, rows):
+                yield (view, file_row['id'], view.rules[index].position, file_row['path'], target)
+    
+    def _compiled_view(self, view_name: str, now: float) -> CompiledView:
+        """Compiled rules of a view, with relative times resolved for this run."""
+        if view_name in self.compile_errors:
+            raise ValueError(f"Rules of view '{view_name}' failed to compile: "
+                             f"{self.compile_errors[view_name]}")
+        if view_name not in self.compiled_views:
+            raise ValueError(f"View '{view_name}' not found in rules.")
+        view = self.compiled_views[view_name]
+        if view.time_dependent and view.now != now:
+            view = compile_view(view_name, view.config, now)
+            self.compiled_views[view_name] = view
+        return view
+    
+    def _interpret_view(self, view_name: str, rules: List[Dict], rows, columns) -> Iterator[Dict]:
         for row in rows:
             file_row = dict(zip(columns, row))
             for rule in rules:
                 target = self.evaluate_rule(rule, file_row)
                 if target:
-                    mappings.append({
+                    yield {
                         'source_path': file_row['path'],
                         'target_path': target,
                         'view_name': view_name
-                    })
+                    }
                     break  # first matching rule wins
-        
-        return mappings
     
     def close(self):
         self.conn.close()
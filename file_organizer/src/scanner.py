@@ -2,16 +2,21 @@
 File system scanner for metadata extraction.
 """
 import os
-import sqlite3
-import hashlib
 from pathlib import Path, PureWindowsPath
 import time
 import logging
+import queue
+import threading
 from datetime import datetime
 from typing import Optional, Dict, Any, List
 from tqdm import tqdm
 import sys
 
+from batch_writer import BatchWriter
+from connection import connect
+from hashing import HashPipeline, compute_hash as _hash_file, storage_for
+from schema import ensure_schema
+
 # Windows‑specific file attributes
 try:
     import win32file
@@ -51,43 +56,23 @@ class FileScanner:
     
     def __init__(self, db_path: str):
         self.db_path = db_path
-        self.conn = sqlite3.connect(db_path)
+        self.conn = connect(db_path, 'bulk')
+        # SQLite's own sidecar files change during the scan; never catalog them
+        db_file = str(Path(db_path).resolve())
+        self._sidecar_paths = {self._stored_path(Path(db_file + suffix))
+                               for suffix in ('-wal', '-shm', '-journal')}
         self._create_tables()
     
     def _create_tables(self):
-        """Create the necessary tables if they don't exist."""
-        cursor = self.conn.cursor()
-        # Main files table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS files (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                path TEXT UNIQUE NOT NULL,
-                name TEXT NOT NULL,
-                extension TEXT,
-                size INTEGER,
-                created REAL,
-                modified REAL,
-                accessed REAL,
-                attributes INTEGER,
-                hash_sha256 TEXT,
-                category TEXT,
-                subcategory TEXT,
-                tags TEXT,
-                project TEXT,
-                software TEXT,
-                version TEXT,
-                extra_json TEXT
-            )
-        """)
-        # Indexes for performance
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_files_path ON files(path)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_files_extension ON files(extension)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_files_category ON files(category)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_files_created ON files(created)")
-        self.conn.commit()
+        """Create or migrate the catalog schema."""
+        ensure_schema(self.conn)
     
     def scan(self, root: str, follow_symlinks: bool = False,
-             compute_hash: bool = False, extensions_ignore: list = None):
+             compute_hash: bool = False, extensions_ignore: list = None,
+             workers: int = 1, batch_size: int = 5000,
+             commit_interval: float = 2.0, resume: bool = False,
+             incremental: bool = False, hash_workers: int = 4,
+             fingerprint: Optional[str] = None):
         """
         Scan a directory recursively and insert/update metadata.
         
@@ -95,9 +80,27 @@ class FileScanner:
             root: Root directory to scan.
             follow_symlinks: Whether to follow symbolic links.
             compute_hash: Whether to compute SHA‑256 hash (slow for large files).
+                Hashing runs as a separate stage after the metadata walk.
             extensions_ignore: List of extensions to skip (e.g., ['.tmp', '.log']).
+            workers: Number of threads listing directories concurrently. Values
+                above 1 help on network shares where per-directory latency
+                dominates; the database is still written from this thread only.
+            batch_size: Rows per executemany batch. Every batch is committed.
+            commit_interval: Maximum seconds between commits.
+            resume: Continue the last unfinished scan of the same root, skipping
+                files that were already committed by it.
+            incremental: Compare against the rows already stored for this root
+                and only write files whose size or mtime changed. Unchanged
+                files keep their row (and hash); files that disappeared get
+                deleted_at set instead of being removed.
+            hash_workers: Threads used by the hashing stage.
+            fingerprint: Name of a fast hash algorithm (e.g. 'blake2b', or
+                'xxh3_128' when xxhash is installed) to record in the
+                fingerprint column. Independent of compute_hash, so SHA‑256
+                can be skipped or deferred.
         Returns:
-            dict with keys 'scanned' (int), 'errors' (int)
+            dict with keys 'scanned' (int), 'errors' (int), 'skipped' (int),
+            'unchanged' (int), 'deleted' (int)
         """
         if extensions_ignore is None:
             extensions_ignore = []
@@ -105,83 +108,394 @@ class FileScanner:
         root_path = _to_long_path(Path(root).resolve())
         logger.info(f"Starting scan of {root_path}")
         
-        # Collect all files recursively
-        file_paths = []
-        for dirpath, dirnames, filenames in os.walk(root_path, followlinks=follow_symlinks):
-            # Skip certain directories? (optional)
-            for fname in filenames:
-                full_path = Path(dirpath) / fname
-                file_paths.append(_to_long_path(full_path))
-        
-        logger.info(f"Found {len(file_paths)} files")
+        run_id, committed_paths = self._start_run(str(root_path), resume)
         
         # Prepare insert/update statement
+        if incremental:
+            # Update changed rows in place so ids, categories and tags survive
+            existing = self._load_existing(self._path_prefix(root_path))
+            insert_sql = """
+                INSERT INTO files
+                (path, name, extension, size, created, modified, accessed, attributes, hash_sha256, scan_id,
+                 indexed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(path) DO UPDATE SET
+                    name = excluded.name, extension = excluded.extension, size = excluded.size,
+                    created = excluded.created, modified = excluded.modified,
+                    accessed = excluded.accessed, attributes = excluded.attributes,
+                    hash_sha256 = excluded.hash_sha256, scan_id = excluded.scan_id,
+                    fingerprint = CASE WHEN files.size = excluded.size
+                                        AND files.modified = excluded.modified
+                                       THEN files.fingerprint END,
+                    deleted_at = NULL, indexed_at = CURRENT_TIMESTAMP
+            """
+        else:
+            existing = None
+            # Rewrite every row, but in place: the link log, view mappings and
+            # tags refer to files.id, which INSERT OR REPLACE would renumber
+            insert_sql = """
+                INSERT INTO files
+                (path, name, extension, size, created, modified, accessed, attributes, hash_sha256, scan_id,
+                 indexed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(path) DO UPDATE SET
+                    name = excluded.name, extension = excluded.extension, size = excluded.size,
+                    created = excluded.created, modified = excluded.modified,
+                    accessed = excluded.accessed, attributes = excluded.attributes,
+                    hash_sha256 = excluded.hash_sha256, scan_id = excluded.scan_id,
+                    category = NULL, subcategory = NULL, tags = NULL, project = NULL,
+                    software = NULL, version = NULL, extra_json = NULL, fingerprint = NULL,
+                    deleted_at = NULL, indexed_at = CURRENT_TIMESTAMP
+            """
+        
+        def checkpoint(cursor, count):
+            cursor.execute("""
+                UPDATE scan_runs SET files_committed = files_committed + ?, checkpoint_at = ?
+                WHERE id = ?
+            """, (count, time.time(), run_id))
+        
+        writer = BatchWriter(self.conn, insert_sql, batch_size=batch_size,
+                             flush_interval=commit_interval, on_flush=checkpoint)
+        counters = {'scanned': 0, 'errors': 0, 'skipped': 0, 'unchanged': 0, 'deleted': 0}
+        failed_dirs = []
+        if workers > 1:
+            entries = self._parallel_walk(str(root_path), follow_symlinks, counters, workers, failed_dirs)
+        else:
+            entries = self._walk(str(root_path), follow_symlinks, counters, failed_dirs)
+        rows = self._collect_rows(entries, extensions_ignore, counters,
+                                  run_id, committed_paths, existing)
+        prefix = self._path_prefix(root_path)
+        try:
+            # Stream rows straight into the database while the walk is still running
+            for row in tqdm(rows, desc="Scanning files", unit=" files"):
+                writer.add(row)
+                counters['scanned'] += 1
+            writer.close()
+            if existing:
+                counters['deleted'] = self._mark_deleted(existing, failed_dirs)
+            if compute_hash:
+                self.hash_files(prefix, workers=hash_workers, batch_size=batch_size,
+                                commit_interval=commit_interval)
+            if fingerprint:
+                self.hash_files(prefix, workers=hash_workers, batch_size=batch_size,
+                                commit_interval=commit_interval, algorithm=fingerprint)
+        except BaseException:
+            # Keep what was read so far; a later scan(resume=True) continues from here
+            try:
+                writer.close()
+            except Exception as e:
+                # Most likely the flush that failed in the first place
+                logger.error(f"Could not write the last batch of the interrupted scan: {e}")
+            self._finish_run(run_id, 'interrupted')
+            raise
+        
+        self._finish_run(run_id, 'completed')
+        scanned, errors = counters['scanned'], counters['errors']
+        logger.info(f"Scan completed. Scanned: {scanned}, Errors: {errors}")
+        if incremental:
+            logger.info(f"Unchanged: {counters['unchanged']}, Deleted: {counters['deleted']}")
+        return counters
+    
+    @staticmethod
+    def _stored_path(path: Path) -> str:
+        """Return the string form under which a path is stored in the files table."""
+        return str(PureWindowsPath(path)) if os.name == 'nt' else str(path)
+    
+    def _path_prefix(self, root_path: Path) -> str:
+        """Return the stored-path prefix shared by every file below root_path."""
+        root_str = self._stored_path(root_path)
+        sep = '\\' if os.name == 'nt' else os.sep
+        return root_str if root_str.endswith(sep) else root_str + sep
+    
+    def _load_existing(self, prefix: str) -> Dict[str, tuple]:
+        """Load path -> (id, size, modified, hash_sha256, deleted_at) for rows below prefix."""
         cursor = self.conn.cursor()
-        insert_sql = """
-            INSERT OR REPLACE INTO files
-            (path, name, extension, size, created, modified, accessed, attributes, hash_sha256)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        cursor.execute("""
+            SELECT path, id, size, modified, hash_sha256, deleted_at FROM files
+            WHERE substr(path, 1, ?) = ?
+        """, (len(prefix), prefix))
+        existing = {row[0]: row[1:] for row in cursor}
+        logger.info(f"Loaded {len(existing)} existing entries for incremental scan")
+        return existing
+    
+    def _mark_deleted(self, missing: Dict[str, tuple], failed_dirs: List[str]) -> int:
+        """Flag rows whose files were not seen by the walk as deleted."""
+        # Files below directories we could not list may still exist
+        prefixes = tuple(self._path_prefix(Path(d)) for d in failed_dirs)
+        now = time.time()
+        rows = [(now, file_id) for path, (file_id, _, _, _, deleted_at) in missing.items()
+                if deleted_at is None and not (prefixes and path.startswith(prefixes))]
+        if rows:
+            with self.conn:
+                self.conn.executemany("UPDATE files SET deleted_at = ? WHERE id = ?", rows)
+        return len(rows)
+    
+    def hash_files(self, prefix: str = '', workers: int = 4, batch_size: int = 5000,
+                   commit_interval: float = 2.0, chunk_size: int = 10000,
+                   algorithm: str = 'sha256') -> int:
+        """
+        Fill in hash_sha256 (or the fingerprint column, for any other
+        algorithm) for catalogued files that do not have one yet.
+        
+        (id, path, size) work items are read from the database in id-ordered
+        chunks, hashed by a HashPipeline and written back in batches.
+        
+        Args:
+            prefix: Only hash files whose stored path starts with this prefix.
+            workers: Number of hashing threads.
+            algorithm: Registered hash algorithm (see hashing.HASH_ALGORITHMS).
+        Returns:
+            Number of files hashed.
+        """
+        column, value_prefix = storage_for(algorithm)
+        
+        def pending():
+            last_id = 0
+            while True:
+                rows = self.conn.execute(f"""
+                    SELECT id, path, size FROM files
+                    WHERE id > ? AND {column} IS NULL AND deleted_at IS NULL
+                      AND substr(path, 1, ?) = ?
+                    ORDER BY id LIMIT ?
+                """, (last_id, len(prefix), prefix, chunk_size)).fetchall()
+                if not rows:
+                    return
+                for file_id, path, size in rows:
+                    yield file_id, _to_long_path(Path(path)), size
+                last_id = rows[-1][0]
+        
+        writer = BatchWriter(self.conn, f"UPDATE files SET {column} = ? WHERE id = ?",
+                             batch_size=batch_size, flush_interval=commit_interval)
+        hashed = 0
+        pipeline = HashPipeline(workers=workers, algorithm=algorithm)
+        with writer:
+            for file_id, digest in tqdm(pipeline.run(pending()), desc=f"Hashing files ({algorithm})",
+                                        unit=" files"):
+                if digest is None:
+                    logger.warning(f"Cannot hash file id {file_id}")
+                    continue
+                writer.add((value_prefix + digest, file_id))
+                hashed += 1
+        logger.info(f"Hashed {hashed} files with {algorithm}")
+        return hashed
+    
+    def _start_run(self, root: str, resume: bool):
+        """
+        Register a scan run and return (run_id, committed_paths).
+        
+        When resuming, the latest unfinished run for the same root is reused and
+        committed_paths holds the paths it already wrote; otherwise a new run is
+        started and committed_paths is empty.
+        """
+        cursor = self.conn.cursor()
+        if resume:
+            cursor.execute("""
+                SELECT id FROM scan_runs WHERE root = ? AND status != 'completed'
+                ORDER BY id DESC LIMIT 1
+            """, (root,))
+            row = cursor.fetchone()
+            if row:
+                run_id = row[0]
+                cursor.execute("SELECT path FROM files WHERE scan_id = ?", (run_id,))
+                committed_paths = {path for (path,) in cursor}
+                cursor.execute("UPDATE scan_runs SET status = 'running' WHERE id = ?", (run_id,))
+                self.conn.commit()
+                logger.info(f"Resuming scan run {run_id}: {len(committed_paths)} files already committed")
+                return run_id, committed_paths
+            logger.info("No unfinished scan to resume; starting a new one")
+        cursor.execute("INSERT INTO scan_runs (root, started_at) VALUES (?, ?)", (root, time.time()))
+        self.conn.commit()
+        return cursor.lastrowid, set()
+    
+    def _finish_run(self, run_id: int, status: str):
+        self.conn.execute("UPDATE scan_runs SET status = ?, finished_at = ? WHERE id = ?",
+                          (status, time.time(), run_id))
+        self.conn.commit()
+    
+    def _walk(self, root: str, follow_symlinks: bool, counters: Dict[str, int],
+              failed_dirs: List[str]):
         """
+        Yield (path, DirEntry) for every non-directory entry below root.
         
-        scanned = 0
-        errors = 0
-        # Process files with progress bar
-        for full_path in tqdm(file_paths, desc="Scanning files"):
+        Uses os.scandir with an explicit stack so that only the directories
+        still waiting to be listed are held in memory.
+        """
+        stack = [root]
+        while stack:
+            dirpath = stack.pop()
+            try:
+                with os.scandir(dirpath) as it:
+                    for entry in it:
+                        try:
+                            if entry.is_dir(follow_symlinks=follow_symlinks):
+                                stack.append(str(_to_long_path(Path(entry.path))))
+                                continue
+                            if entry.is_dir():
+                                # Symlink to a directory that we do not follow
+                                continue
+                        except OSError:
+                            pass
+                        yield entry.path, entry
+            except OSError as e:
+                logger.warning(f"Cannot list {dirpath}: {e}")
+                counters['errors'] += 1
+                failed_dirs.append(dirpath)
+    
+    def _parallel_walk(self, root: str, follow_symlinks: bool,
+                       counters: Dict[str, int], workers: int,
+                       failed_dirs: List[str]):
+        """
+        Yield (path, DirEntry) like _walk, but list directories from a pool of
+        worker threads.
+        
+        Workers pull directories from a shared queue, push subdirectories back
+        onto it and hand file entries (with their stat result already cached)
+        to the caller through a bounded queue, so the SQLite connection is only
+        ever used from the calling thread.
+        """
+        dir_queue = queue.Queue()
+        out_queue = queue.Queue(maxsize=workers * 1024)
+        stop = threading.Event()
+        done = object()
+        
+        def put(item):
+            # Give up if the consumer went away so workers never block forever
+            while not stop.is_set():
+                try:
+                    out_queue.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+        
+        def worker():
+            while True:
+                dirpath = dir_queue.get()
+                if dirpath is None:
+                    dir_queue.task_done()
+                    return
+                try:
+                    if stop.is_set():
+                        continue
+                    with os.scandir(dirpath) as it:
+                        for entry in it:
+                            try:
+                                if entry.is_dir(follow_symlinks=follow_symlinks):
+                                    dir_queue.put(str(_to_long_path(Path(entry.path))))
+                                    continue
+                                if entry.is_dir():
+                                    continue
+                                # Prime the stat cache off the writer thread
+                                entry.stat()
+                            except OSError:
+                                pass
+                            put((entry.path, entry))
+                except OSError as e:
+                    put((dirpath, e))
+                finally:
+                    dir_queue.task_done()
+        
+        def coordinator():
+            dir_queue.join()
+            for _ in threads:
+                dir_queue.put(None)
+            put(done)
+        
+        dir_queue.put(root)
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(workers)]
+        for t in threads:
+            t.start()
+        threading.Thread(target=coordinator, daemon=True).start()
+        
+        try:
+            while True:
+                item = out_queue.get()
+                if item is done:
+                    break
+                path, entry = item
+                if isinstance(entry, OSError):
+                    logger.warning(f"Cannot list {path}: {entry}")
+                    counters['errors'] += 1
+                    failed_dirs.append(path)
+                    continue
+                yield item
+        finally:
+            stop.set()
+    
+    def _collect_rows(self, entries, extensions_ignore: list,
+                      counters: Dict[str, int], scan_id: int, committed_paths: set,
+                      existing: Optional[Dict[str, tuple]] = None):
+        """
+        Turn walked entries into rows for the files table.
+        
+        When existing is given (incremental scan), every seen path is removed
+        from it, so that afterwards it only holds files that disappeared.
+        """
+        for path, entry in entries:
+            full_path = _to_long_path(Path(path))
             try:
-                # Skip ignored extensions
                 ext = full_path.suffix.lower()
-                if ext in extensions_ignore:
+                # Convert path to string (use Windows path style if on Windows)
+                path_str = self._stored_path(full_path)
+                if path_str in self._sidecar_paths:
                     continue
+                previous = existing.pop(path_str, None) if existing is not None else None
                 
-                # Get file stats
-                stat = os.stat(full_path)
-                size = stat.st_size
-                created = stat.st_ctime
-                modified = stat.st_mtime
-                accessed = stat.st_atime
-                # Get file attributes (Windows only)
-                if os.name == 'nt' and HAS_WIN32FILE:
-                    try:
-                        attributes = win32file.GetFileAttributes(str(full_path))
-                    except Exception:
-                        attributes = 0
-                else:
-                    attributes = 0
-                
-                # Compute hash if requested
-                hash_val = None
-                if compute_hash:
-                    hash_val = self._compute_hash(full_path)
-                
-                # Convert path to string (use Windows path style if on Windows)
-                path_str = str(PureWindowsPath(full_path)) if os.name == 'nt' else str(full_path)
-                name = full_path.name
+                # Skip ignored extensions
+                if ext in extensions_ignore:
+                    continue
+                if path_str in committed_paths:
+                    # Already written by the run we are resuming
+                    counters['skipped'] += 1
+                    continue
                 
-                cursor.execute(insert_sql, (
-                    path_str, name, ext if ext else None, size,
-                    created, modified, accessed, attributes, hash_val
-                ))
-                scanned += 1
+                # Get file stats (cached by scandir where the platform allows it)
+                stat = entry.stat()
+                known_hash = None
+                if previous is not None:
+                    _, size, modified, hash_val, deleted_at = previous
+                    if size == stat.st_size and modified == stat.st_mtime:
+                        if deleted_at is None:
+                            # Missing hashes are filled in by the hashing stage
+                            counters['unchanged'] += 1
+                            continue
+                        # Content unchanged: keep the stored hash
+                        known_hash = hash_val
+                yield self._build_row(full_path, path_str, ext, stat, known_hash) + (scan_id,)
                 
             except (OSError, PermissionError) as e:
                 logger.warning(f"Cannot read {full_path}: {e}")
-                errors += 1
+                counters['errors'] += 1
                 continue
+    
+    def _build_row(self, full_path: Path, path_str: str, ext: str,
+                   stat: os.stat_result, known_hash: Optional[str] = None) -> tuple:
+        """Build the insert tuple for a single file."""
+        size = stat.st_size
+        created = stat.st_ctime
+        modified = stat.st_mtime
+        accessed = stat.st_atime
+        # Get file attributes (Windows only)
+        if os.name == 'nt' and HAS_WIN32FILE:
+            try:
+                attributes = win32file.GetFileAttributes(str(full_path))
+            except Exception:
+                attributes = 0
+        else:
+            attributes = 0
         
-        self.conn.commit()
-        logger.info(f"Scan completed. Scanned: {scanned}, Errors: {errors}")
-        return {'scanned': scanned, 'errors': errors}
+        # Hashes are filled in later by hash_files(); keep a known one if we have it
+        hash_val = known_hash
+        
+        name = full_path.name
+        
+        return (
+            path_str, name, ext if ext else None, size,
+            created, modified, accessed, attributes, hash_val
+        )
     
-    def _compute_hash(self, filepath: Path, block_size: int = 65536) -> str:
+    def _compute_hash(self, filepath: Path, block_size: int = None) -> str:
         """Compute SHA‑256 hash of file content."""
-        sha256 = hashlib.sha256()
-        try:
-            with open(filepath, 'rb') as f:
-                for block in iter(lambda: f.read(block_size), b''):
-                    sha256.update(block)
-            return sha256.hexdigest()
-        except (OSError, PermissionError):
-            return None
+        return _hash_file(filepath, block_size=block_size)
     
     def close(self):
         self.conn.close()
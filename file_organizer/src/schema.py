@@ -0,0 +1,376 @@
+"""
+Catalog schema and versioned migrations.
+
+All DDL for the catalog lives here. The applied version is kept in SQLite's
+``PRAGMA user_version``; ensure_schema() applies every newer migration in
+order, each in its own transaction. Databases created before versioning
+(user_version 0) are upgraded in place: the first migration only uses
+IF NOT EXISTS and adds missing columns.
+"""
+import sqlite3
+import logging
+from typing import Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def _columns(cursor: sqlite3.Cursor, table: str) -> List[str]:
+    return [row[1] for row in cursor.execute(f"PRAGMA table_info({table})")]
+
+
+def _add_missing_columns(cursor: sqlite3.Cursor, table: str, columns: Dict[str, str]):
+    """Add columns (name -> declaration) that an older table does not have yet."""
+    existing = set(_columns(cursor, table))
+    for name, decl in columns.items():
+        if name not in existing:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+
+
+def _v1_base_tables(cursor: sqlite3.Cursor):
+    """Tables previously created separately by the scanner, database and link creator."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS files (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            path TEXT UNIQUE NOT NULL,
+            name TEXT NOT NULL,
+            extension TEXT,
+            size INTEGER,
+            created REAL,
+            modified REAL,
+            accessed REAL,
+            attributes INTEGER,
+            hash_sha256 TEXT,
+            category TEXT,
+            subcategory TEXT,
+            tags TEXT,
+            project TEXT,
+            software TEXT,
+            version TEXT,
+            extra_json TEXT,
+            indexed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            scan_id INTEGER,
+            deleted_at REAL,
+            fingerprint TEXT
+        )
+    """)
+    # Tables created by older scanner versions lack the later columns.
+    # (ALTER TABLE cannot add a CURRENT_TIMESTAMP default.)
+    _add_missing_columns(cursor, 'files', {
+        'indexed_at': 'TIMESTAMP',
+        'scan_id': 'INTEGER',
+        'deleted_at': 'REAL',
+        'fingerprint': 'TEXT',
+    })
+
+    # Scan runs (checkpoints for resuming interrupted scans)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS scan_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            root TEXT NOT NULL,
+            started_at REAL NOT NULL,
+            finished_at REAL,
+            status TEXT NOT NULL DEFAULT 'running',  -- 'running', 'interrupted', 'completed'
+            files_committed INTEGER DEFAULT 0,
+            checkpoint_at REAL
+        )
+    """)
+
+    # Tags table (many‑to‑many)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS tags (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS file_tags (
+            file_id INTEGER NOT NULL,
+            tag_id INTEGER NOT NULL,
+            added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (file_id, tag_id),
+            FOREIGN KEY (file_id) REFERENCES files(id) ON DELETE CASCADE,
+            FOREIGN KEY (tag_id) REFERENCES tags(id) ON DELETE CASCADE
+        )
+    """)
+
+    # Duplicate groups
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS duplicate_groups (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            hash_sha256 TEXT NOT NULL,
+            file_count INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS duplicate_files (
+            file_id INTEGER NOT NULL,
+            group_id INTEGER NOT NULL,
+            PRIMARY KEY (file_id),
+            FOREIGN KEY (file_id) REFERENCES files(id) ON DELETE CASCADE,
+            FOREIGN KEY (group_id) REFERENCES duplicate_groups(id) ON DELETE CASCADE
+        )
+    """)
+
+    # Relationships (file‑to‑file)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS relationships (
+            source_id INTEGER NOT NULL,
+            target_id INTEGER NOT NULL,
+            relation_type TEXT NOT NULL,  -- 'includes', 'references', 'version_of', etc.
+            strength REAL DEFAULT 1.0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (source_id, target_id, relation_type),
+            FOREIGN KEY (source_id) REFERENCES files(id) ON DELETE CASCADE,
+            FOREIGN KEY (target_id) REFERENCES files(id) ON DELETE CASCADE
+        )
+    """)
+
+    # Views (virtual view definitions)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS views (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL,
+            description TEXT,
+            config_json TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # Link transactions (undo log of the link creator)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS link_transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT NOT NULL,
+            operation TEXT NOT NULL,  -- 'create', 'delete', 'rollback'
+            view_name TEXT NOT NULL,
+            source_path TEXT NOT NULL,
+            link_path TEXT NOT NULL,
+            success INTEGER DEFAULT 0,
+            error TEXT
+        )
+    """)
+
+
+def _v2_query_indexes(cursor: sqlite3.Cursor):
+    """Drop redundant indexes and add ones matching the hot query shapes."""
+    # files.path and tags.name are UNIQUE, which already creates an index;
+    # single-column category/extension indexes are prefixes of the composites
+    for name in ('idx_files_path', 'idx_tags_name',
+                 'idx_files_category', 'idx_files_extension',
+                 'idx_files_hash', 'idx_files_fingerprint'):
+        cursor.execute(f"DROP INDEX IF EXISTS {name}")
+    # Web search: category/extension filters ordered by newest first
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_files_category_created ON files(category, created)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_files_extension_created ON files(extension, created)")
+    # Unfiltered search ordered by created, and date-based views
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_files_created ON files(created)")
+    # Size ranges in search and size grouping in duplicate detection
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_files_size ON files(size)")
+    # GROUP BY digest for duplicates; partial, since most rows have no digest
+    cursor.execute("""CREATE INDEX IF NOT EXISTS idx_files_hash_partial ON files(hash_sha256)
+                      WHERE hash_sha256 IS NOT NULL""")
+    cursor.execute("""CREATE INDEX IF NOT EXISTS idx_files_fingerprint_partial ON files(fingerprint)
+                      WHERE fingerprint IS NOT NULL""")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_duplicate_hash ON duplicate_groups(hash_sha256)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_files_scan_id ON files(scan_id)")
+
+
+def _v3_view_mappings(cursor: sqlite3.Cursor):
+    """Materialized view mappings, refreshed incrementally."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS view_mappings (
+            view_name TEXT NOT NULL,
+            file_id INTEGER NOT NULL,
+            target_path TEXT NOT NULL,
+            rule_index INTEGER NOT NULL,
+            computed_at TEXT NOT NULL,
+            PRIMARY KEY (view_name, file_id),
+            FOREIGN KEY (file_id) REFERENCES files(id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+    """)
+    # Hash of the rules the stored mappings were computed with, and the
+    # indexed_at watermark of the last refresh
+    _add_missing_columns(cursor, 'views', {
+        'config_hash': 'TEXT',
+        'materialized_at': 'TEXT',
+    })
+    # indexed_at marks when a row last changed; incremental refreshes read rows
+    # changed since the last refresh
+    cursor.execute("UPDATE files SET indexed_at = CURRENT_TIMESTAMP WHERE indexed_at IS NULL")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_files_indexed_at ON files(indexed_at)")
+
+
+def _v4_link_log_pending(cursor: sqlite3.Cursor):
+    """Find link operations logged ahead of time but never resolved."""
+    # success IS NULL marks an operation written before it was carried out;
+    # only an interrupted run leaves such rows behind, so the index stays tiny
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_link_transactions_pending
+        ON link_transactions(view_name) WHERE success IS NULL
+    """)
+
+
+def _v5_link_runs(cursor: sqlite3.Cursor):
+    """Group link operations by run, so that one run can be rolled back."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS link_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            view_name TEXT NOT NULL,
+            operation TEXT NOT NULL,  -- 'create', 'sync', 'rollback'
+            started_at TEXT NOT NULL,
+            finished_at TEXT,         -- NULL while running or if interrupted
+            links INTEGER DEFAULT 0,
+            errors INTEGER DEFAULT 0
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_link_runs_view ON link_runs(view_name)")
+    # Rows logged before runs existed keep run_id NULL
+    _add_missing_columns(cursor, 'link_transactions', {'run_id': 'INTEGER'})
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_link_transactions_run
+        ON link_transactions(view_name, run_id)
+    """)
+
+
+# link_log.operation codes
+LINK_OPERATIONS = {'create': 0, 'delete': 1, 'rollback': 2}
+
+_LINK_TRANSACTIONS_VIEW = """
+    CREATE VIEW IF NOT EXISTS link_transactions AS
+    SELECT l.id,
+           strftime('%Y-%m-%dT%H:%M:%S', l.ts, 'unixepoch', 'localtime') AS timestamp,
+           CASE l.operation WHEN 0 THEN 'create' WHEN 1 THEN 'delete' ELSE 'rollback' END AS operation,
+           r.view_name,
+           COALESCE(f.path, l.source_path, '') AS source_path,
+           COALESCE(l.link_path, r.link_prefix || l.target) AS link_path,
+           l.success,
+           l.error,
+           l.run_id
+    FROM link_log l
+    JOIN link_runs r ON r.id = l.run_id
+    LEFT JOIN files f ON f.id = l.file_id
+"""
+
+
+def _v6_compact_link_log(cursor: sqlite3.Cursor):
+    """Compact link log: interned views and sources, integer timestamps."""
+    # Run times become Unix times like link_log.ts; the column types change,
+    # so the table is rebuilt (the ISO strings were local time)
+    cursor.execute("""
+        CREATE TABLE link_runs_v6 (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            view_name TEXT NOT NULL,
+            operation TEXT NOT NULL,     -- 'create', 'sync', 'rollback', 'import'
+            started_at INTEGER NOT NULL, -- Unix time
+            finished_at INTEGER,         -- NULL while running or if interrupted
+            links INTEGER DEFAULT 0,
+            errors INTEGER DEFAULT 0,
+            link_prefix TEXT NOT NULL DEFAULT ''
+        )
+    """)
+    cursor.execute("""
+        INSERT INTO link_runs_v6 (id, view_name, operation, started_at, finished_at, links, errors)
+        SELECT id, view_name, operation,
+               COALESCE(CAST(strftime('%s', started_at, 'utc') AS INTEGER), 0),
+               CAST(strftime('%s', finished_at, 'utc') AS INTEGER), links, errors
+        FROM link_runs
+    """)
+    cursor.execute("DROP TABLE link_runs")
+    cursor.execute("ALTER TABLE link_runs_v6 RENAME TO link_runs")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_link_runs_view ON link_runs(view_name)")
+    
+    # The view name and the view directory are stored once per run; a row
+    # keeps the source as files.id and the link relative to the run's view
+    # directory (the *_path columns only hold what has no such reference)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS link_log (
+            id INTEGER PRIMARY KEY,
+            run_id INTEGER NOT NULL REFERENCES link_runs(id),
+            operation INTEGER NOT NULL,  -- LINK_OPERATIONS
+            ts INTEGER NOT NULL,         -- Unix time
+            file_id INTEGER,             -- files.id of the source
+            source_path TEXT,            -- source not in the catalog
+            target TEXT,                 -- link path below link_runs.link_prefix
+            link_path TEXT,              -- link path outside of it
+            success INTEGER,             -- NULL while pending
+            error TEXT
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_link_log_run ON link_log(run_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_link_log_file ON link_log(file_id) WHERE file_id IS NOT NULL")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_link_log_pending ON link_log(run_id) WHERE success IS NULL")
+    
+    if 'link_transactions' in [row[0] for row in cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'link_transactions'")]:
+        # Rows logged before runs existed are grouped into one imported run per view
+        cursor.execute("""
+            INSERT INTO link_runs (view_name, operation, started_at, finished_at, links, errors)
+            SELECT view_name, 'import',
+                   COALESCE(CAST(strftime('%s', MIN(timestamp), 'utc') AS INTEGER), 0),
+                   CAST(strftime('%s', MAX(timestamp), 'utc') AS INTEGER),
+                   COALESCE(SUM(success = 1), 0), COALESCE(SUM(success = 0), 0)
+            FROM link_transactions WHERE run_id IS NULL GROUP BY view_name
+        """)
+        cursor.execute("""
+            INSERT INTO link_log (id, run_id, operation, ts, file_id, source_path, link_path, success, error)
+            SELECT t.id,
+                   COALESCE(t.run_id, (SELECT MAX(r.id) FROM link_runs r
+                                       WHERE r.view_name = t.view_name AND r.operation = 'import')),
+                   CASE t.operation WHEN 'create' THEN 0 WHEN 'delete' THEN 1 ELSE 2 END,
+                   COALESCE(CAST(strftime('%s', t.timestamp, 'utc') AS INTEGER), 0),
+                   f.id,
+                   CASE WHEN f.id IS NULL THEN t.source_path END,
+                   t.link_path, t.success, t.error
+            FROM link_transactions t
+            LEFT JOIN files f ON f.path = t.source_path
+            ORDER BY t.id
+        """)
+        cursor.execute("DROP TABLE link_transactions")
+    # The former table, for audit queries and existing tools
+    cursor.execute(_LINK_TRANSACTIONS_VIEW)
+
+
+# (version, description, function) in application order
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Cursor], None]]] = [
+    (1, "base tables", _v1_base_tables),
+    (2, "indexes for query patterns", _v2_query_indexes),
+    (3, "materialized view mappings", _v3_view_mappings),
+    (4, "pending link operations", _v4_link_log_pending),
+    (5, "link runs", _v5_link_runs),
+    (6, "compact link log", _v6_compact_link_log),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def ensure_schema(conn: sqlite3.Connection) -> int:
+    """
+    Bring the catalog schema up to SCHEMA_VERSION.
+
+    Safe to call from every component on every start: when the database is
+    current this is a single PRAGMA read. Returns the resulting version.
+    """
+    if schema_version(conn) >= SCHEMA_VERSION:
+        return SCHEMA_VERSION
+    if conn.in_transaction:
+        conn.commit()
+    for version, description, migrate in MIGRATIONS:
+        # IMMEDIATE takes the write lock, so concurrent starters apply each step once
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if schema_version(conn) >= version:
+                conn.rollback()
+                continue
+            migrate(conn.cursor())
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        logger.info(f"Applied schema migration {version}: {description}")
+    return schema_version(conn)
@@ -0,0 +1,227 @@
+"""
+Columnar evaluation of numeric view rules with NumPy (optional).
+
+Rows are processed in batches: the numeric columns a view compares
+(size, created, modified, accessed, ...) become NumPy arrays, each rule's
+condition becomes a boolean mask, and the first matching rule of every row
+is found with argmax over the stacked masks. Row dicts are only built, and
+templates only rendered, for rows that end up matching.
+
+Like query_planner, only a leading run of rules is vectorized: the first
+rule with a condition that has no exact columnar equivalent (pattern
+matches, numbers too large for float64, ...) and every rule after it are
+evaluated in Python for the rows the vectorized rules did not decide.
+Results are identical to CompiledView.match.
+
+Without NumPy installed, HAS_NUMPY is False and RuleEngine keeps using the
+pure Python path.
+"""
+import logging
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from rule_compiler import (And, Always, ColumnRef, CompiledView, Compare, Now, Or,
+                           coerce_to_number, resolve_now)
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    np = None
+    HAS_NUMPY = False
+
+logger = logging.getLogger(__name__)
+
+# Integers beyond this are not exactly representable as float64
+_EXACT_INT = 2 ** 53
+
+_COMPARE = {
+    '<': lambda a, b: a < b,
+    '>': lambda a, b: a > b,
+    '<=': lambda a, b: a <= b,
+    '>=': lambda a, b: a >= b,
+    '==': lambda a, b: a == b,
+    '!=': lambda a, b: a != b,
+}
+
+
+def is_vectorizable(node) -> bool:
+    """True if a condition tree can be evaluated exactly as boolean masks."""
+    if isinstance(node, Always):
+        return True
+    if isinstance(node, (And, Or)):
+        return all(is_vectorizable(child) for child in node.children)
+    if isinstance(node, Compare):
+        rhs = node.rhs
+        if isinstance(rhs, (Now, ColumnRef)):
+            return True
+        if isinstance(rhs, int):
+            return -_EXACT_INT <= rhs <= _EXACT_INT
+        return isinstance(rhs, float)
+    return False
+
+
+class ColumnBatch:
+    """
+    A batch of rows with numeric columns converted on demand.
+
+    column() returns (values, valid): float64 values and a mask of the rows
+    whose value coerce_to_number accepts, or None if a column holds numbers
+    float64 cannot represent exactly (the batch then goes to Python).
+    """
+
+    def __init__(self, rows: Sequence[Tuple], positions: Dict[str, int]):
+        self.rows = rows
+        self.positions = positions
+        self.size = len(rows)
+        self._columns: Dict[str, Optional[Tuple]] = {}
+
+    def column(self, name: str):
+        if name not in self._columns:
+            self._columns[name] = self._convert(name)
+        return self._columns[name]
+
+    def _convert(self, name: str):
+        position = self.positions[name]
+        values = [row[position] for row in self.rows]
+        types = set(map(type, values))
+        if types <= {int, float, type(None)}:
+            # SQLite has no NaN (it stores NULL instead), so NaN marks NULLs here
+            array = np.array(values, dtype=np.float64)
+            valid = ~np.isnan(array)
+            if int in types and valid.any() and np.abs(array[valid]).max() > _EXACT_INT:
+                return None
+            return array, valid
+        # Text or blobs: coerce one value at a time, exactly like the predicates
+        coerced = [value if type(value) in (int, float) else coerce_to_number(value)
+                   for value in values]
+        valid = np.array([value is not None for value in coerced], dtype=bool)
+        if any(type(value) is int and abs(value) > _EXACT_INT for value in coerced):
+            return None
+        array = np.array([value if value is not None else np.nan for value in coerced],
+                         dtype=np.float64)
+        return array, valid
+
+
+class _Unrepresentable(Exception):
+    """A column of the batch cannot be compared exactly in float64."""
+
+
+class VectorizedView:
+    """A compiled view with its leading run of vectorizable rules."""
+
+    def __init__(self, view: CompiledView):
+        self.view = view
+        self.python_from = 0
+        for rule in view.rules:
+            if not is_vectorizable(rule.condition):
+                break
+            self.python_from += 1
+        logger.debug(f"View '{view.name}': {self.python_from}/{len(view.rules)} rules vectorized")
+
+    def first_match(self, batch: ColumnBatch):
+        """
+        Index of the first matching vectorized rule per row, or -1 where none
+        matched (rows then continue in Python from python_from, if any rules
+        are left).
+        """
+        if not self.python_from:
+            return np.full(batch.size, -1, dtype=np.int64)
+        masks = np.stack([self._mask(rule.condition, batch)
+                          for rule in self.view.rules[:self.python_from]])
+        return np.where(masks.any(axis=0), masks.argmax(axis=0), -1)
+
+    def _mask(self, node, batch: ColumnBatch):
+        if isinstance(node, Always):
+            return np.full(batch.size, node.value, dtype=bool)
+        if isinstance(node, And):
+            mask = np.ones(batch.size, dtype=bool)
+            for child in node.children:
+                mask &= self._mask(child, batch)
+            return mask
+        if isinstance(node, Or):
+            mask = np.zeros(batch.size, dtype=bool)
+            for child in node.children:
+                mask |= self._mask(child, batch)
+            return mask
+        return self._compare(node, batch)
+
+    def _compare(self, node: Compare, batch: ColumnBatch):
+        if node.column not in batch.positions:
+            # row.get() gives None, which never compares
+            return np.zeros(batch.size, dtype=bool)
+        column = batch.column(node.column)
+        if column is None:
+            raise _Unrepresentable(node.column)
+        values, valid = column
+        op = _COMPARE[node.op]
+        rhs = node.rhs
+        if isinstance(rhs, Now):
+            return valid & op(values, resolve_now(rhs.days, self.view.now))
+        if not isinstance(rhs, ColumnRef):
+            return valid & op(values, rhs)
+        if rhs.name not in batch.positions:
+            # Compared with the name itself: numbers are never equal to a string
+            return valid.copy() if node.op == '!=' else np.zeros(batch.size, dtype=bool)
+        other = batch.column(rhs.name)
+        if other is None:
+            raise _Unrepresentable(rhs.name)
+        other_values, other_valid = other
+        if node.op == '!=':
+            # A number is unequal to None; ordering against None is an error (False)
+            return valid & (~other_valid | (values != other_values))
+        return valid & other_valid & op(values, other_values)
+
+
+def iter_batch_matches(views: List[VectorizedView], columns: List[str], rows: Sequence[Tuple]
+                       ) -> Iterator[Tuple[CompiledView, Dict, int, str]]:
+    """
+    Evaluate a batch of rows against several views.
+
+    ``columns`` names the values of each row; it must include every column
+    the views read (CompiledView.columns) that exists in files.
+
+    Yields (view, file_row, rule index into view.rules, target path) in row
+    order, views in the given order for each row.
+    """
+    batch = ColumnBatch(rows, {name: i for i, name in enumerate(columns)})
+    firsts = []
+    for vview in views:
+        try:
+            firsts.append(vview.first_match(batch).tolist())
+        except _Unrepresentable as e:
+            logger.debug(f"Column '{e}' not exact in float64; batch evaluated in Python")
+            firsts.append(None)
+    # Rows no view can match are skipped without building a row dict
+    pending = np.zeros(batch.size, dtype=bool)
+    for vview, first in zip(views, firsts):
+        if first is None or vview.python_from < len(vview.view.rules):
+            pending[:] = True
+            break
+        pending |= np.asarray(first) >= 0
+    for i in np.flatnonzero(pending).tolist():
+        row = rows[i]
+        file_row = None
+        for vview, first in zip(views, firsts):
+            view = vview.view
+            if first is None:
+                start = 0
+            else:
+                index = first[i]
+                if index < 0:
+                    if vview.python_from == len(view.rules):
+                        continue
+                    start = vview.python_from
+                else:
+                    if file_row is None:
+                        file_row = dict(zip(columns, row))
+                    target = view.rules[index].render(file_row)
+                    if target:
+                        yield view, file_row, index, target
+                        continue
+                    # An empty target falls through to the next rule
+                    start = index + 1
+            if file_row is None:
+                file_row = dict(zip(columns, row))
+            match = view.match(file_row, start)
+            if match:
+                yield view, file_row, match[0], match[1]
@@ -6,41 +6,78 @@ import json
 import yaml
 from pathlib import Path, PureWindowsPath
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from rule_engine import RuleEngine
+from materializer import ViewMaterializer
 
 logger = logging.getLogger(__name__)
 
 class ViewGenerator:
-    def __init__(self, db_path: str, rules_path: str):
+    def __init__(self, db_path: str, rules_path: str, jobs: int = 1):
         self.db_path = db_path
         self.rules_path = rules_path
-        self.rule_engine = RuleEngine(db_path, rules_path)
+        self.rule_engine = RuleEngine(db_path, rules_path, jobs=jobs)
     
     def generate_for_view(self, view_name: str) -> List[Dict]:
         """Generate mapping for a single view."""
         return self.rule_engine.generate_view(view_name)
     
     def generate_all_views(self) -> Dict[str, List[Dict]]:
-        """Generate mapping for all views defined in rules."""
-        with open(self.rules_path, 'r', encoding='utf-8') as f:
-            rules = json.load(f) if self.rules_path.endswith('.json') else yaml.safe_load(f)
+        """
+        Generate mapping for all views defined in rules.
         
-        views = rules.get('views', {})
-        result = {}
-        for view_name in views.keys():
-            try:
-                result[view_name] = self.generate_for_view(view_name)
-            except Exception as e:
-                logger.error(f"Failed to generate view '{view_name}': {e}")
-                result[view_name] = []
-        return result
+        All views are evaluated in a single pass over the catalog.
+        """
+        return self.rule_engine.generate_views()
     
-    def create_dry_run_report(self, output_path: str, view_mappings: Dict[str, List[Dict]]):
-        """Generate an HTML report showing proposed changes."""
+    def summarize_views(self, sample_size: int = 100,
+                        materialized: bool = False) -> Tuple[Dict[str, Tuple[int, List[Dict]]], int]:
+        """
+        Stream all views once and keep only what the dry-run report shows.
+        
+        With materialized=True the stored view_mappings are read instead of
+        evaluating the rules (see ViewMaterializer).
+        
+        Returns ({view_name: (mapping_count, first sample_size mappings)},
+        number of unique source files).
+        """
+        views = list(self.rule_engine.rules.get('views', {}) or {})
+        summary = {name: [0, []] for name in views}
+        usable = [name for name in views if name not in self.rule_engine.compile_errors]
+        unique_paths = set()
+        materializer = ViewMaterializer(self.db_path, self.rules_path) if materialized else None
+        source = materializer.iter_views(usable) if materializer else self.rule_engine.iter_views(usable)
+        try:
+            for view_name, mapping in source:
+                entry = summary[view_name]
+                entry[0] += 1
+                if len(entry[1]) < sample_size:
+                    entry[1].append(mapping)
+                unique_paths.add(mapping['source_path'])
+        finally:
+            if materializer:
+                materializer.close()
+        return {name: (count, sample) for name, (count, sample) in summary.items()}, len(unique_paths)
+    
+    def create_dry_run_report(self, output_path: str,
+                              view_mappings: Optional[Dict[str, List[Dict]]] = None,
+                              materialized: bool = False):
+        """
+        Generate an HTML report showing proposed changes.
+        
+        Without view_mappings the views are streamed from the catalog (or from
+        the materialized mappings), so the full mappings are never held in memory.
+        """
         import html
         from datetime import datetime
         
+        if view_mappings is None:
+            summary, unique_files = self.summarize_views(materialized=materialized)
+        else:
+            summary = {name: (len(mappings), mappings[:100])
+                       for name, mappings in view_mappings.items()}
+            unique_files = self._count_unique_files(view_mappings)
+        
         html_content = f"""
         <!DOCTYPE html>
         <html>
@@ -68,11 +105,11 @@ class ViewGenerator:
         """
         
         total_links = 0
-        for view_name, mappings in view_mappings.items():
+        for view_name, (count, sample) in summary.items():
             html_content += f"""
             <div class="view">
                 <h2>View: {html.escape(view_name)}</h2>
-                <p class="count">{len(mappings)} files</p>
+                <p class="count">{count} files</p>
                 <table>
                     <thead>
                         <tr>
@@ -82,7 +119,7 @@ class ViewGenerator:
                     </thead>
                     <tbody>
             """
-            for mapping in mappings[:100]:  # limit to first 100 rows per view
+            for mapping in sample:  # limited to the first 100 rows per view
                 src = html.escape(mapping['source_path'])
                 tgt = html.escape(mapping['target_path'])
                 html_content += f"""
@@ -91,10 +128,10 @@ class ViewGenerator:
                             <td><code>{tgt}</code></td>
                         </tr>
                 """
-            if len(mappings) > 100:
+            if count > len(sample):
                 html_content += f"""
                         <tr>
-                            <td colspan="2"><em>… and {len(mappings) - 100} more files</em></td>
+                            <td colspan="2"><em>… and {count - len(sample)} more files</em></td>
                         </tr>
                 """
             html_content += """
@@ -102,13 +139,13 @@ class ViewGenerator:
                 </table>
             </div>
             """
-            total_links += len(mappings)
+            total_links += count
         
         html_content += f"""
             <div style="margin-top: 2em; padding: 1em; background-color: #e8f4fd; border-radius: 5px;">
                 <h3>Summary</h3>
                 <p>Total virtual links to create: <strong>{total_links}</strong></p>
-                <p>Total unique source files: <strong>{self._count_unique_files(view_mappings)}</strong></p>
+                <p>Total unique source files: <strong>{unique_files}</strong></p>
                 <p>No changes will be made to the original files.</p>
             </div>
         </body>
@@ -144,7 +181,6 @@ if __name__ == "__main__":
     out = sys.argv[3]
     
     gen = ViewGenerator(db, rules)
-    mappings = gen.generate_all_views()
-    gen.create_dry_run_report(out, mappings)
+    gen.create_dry_run_report(out)
     gen.close()
     print(f"Report generated: {out}")
\ No newline at end of file
@@ -6,7 +6,7 @@ import shutil
 import os
 import sqlite3
 import sys
-from pathlib import Path
+from pathlib import Path, PurePosixPath
 
 # Add src to path
 sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
@@ -15,6 +15,7 @@ from scanner import FileScanner
 from categorizer import Categorizer
 from rule_engine import RuleEngine
 from view_generator import ViewGenerator
+from database import CatalogDatabase
 
 def create_test_files(root: Path):
     """Create a small set of dummy files."""
@@ -26,6 +27,30 @@ def create_test_files(root: Path):
     (root / "subdir" / "notes.txt").write_text("some notes")
     (root / "subdir" / "photo.png").write_bytes(b"dummy png")
 
+def populate_catalog(db_path: str, count: int = 400):
+    """Insert synthetic catalog rows covering every branch of config/views.yaml."""
+    import time
+    now = time.time()
+    categories = ['Documents', 'Images', 'CAD', 'Code', 'Archives', 'Media', 'System', None,
+                  'documents', 'ÍMAGES', 'Kelvin\u212a', 42]
+    extensions = ['pdf', '.pdf', 'jpg', 'JPG', 'py', None, 'txt']
+    sizes = [0, 10, 102399, 102400, 500000, 1048576, 5242881, 10485760, 104857600, 2 * 104857600, None]
+    ages = [0, 5, 29, 31, 200, 364, 366, 2000]
+    scanner = FileScanner(db_path)
+    rows = []
+    for i in range(count):
+        accessed = None if i % 17 == 0 else now - ages[i % len(ages)] * 86400 + 60
+        created = None if i % 13 == 0 else now - (i * 7919 % 3000) * 86400
+        rows.append((f"/data/dir{i % 7}/file_{i}.x", f"file:{i}?.x", extensions[i % len(extensions)],
+                     sizes[i % len(sizes)], created, accessed, categories[i % len(categories)],
+                     'Sub' if i % 3 else None, f"Proj{i % 4}" if i % 5 else None,
+                     None if i % 2 else 'AutoCAD'))
+    scanner.conn.executemany("""INSERT INTO files (path, name, extension, size, created, accessed,
+                                category, subcategory, project, software)
+                                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""", rows)
+    scanner.conn.commit()
+    scanner.close()
+
 def test_scan():
     with tempfile.TemporaryDirectory() as tmp:
         tmp_path = Path(tmp)
@@ -45,6 +70,991 @@ def test_scan():
         conn.close()
         print("✓ Scan test passed")
 
+def test_scan_streams_nested_tree():
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        deep = tmp_path / "a" / "b" / "c"
+        deep.mkdir(parents=True)
+        (deep / "deep.txt").write_text("deep")
+        (tmp_path / "a" / "skip.tmp").write_text("ignored")
+        (tmp_path / "top.log").write_text("log")
+        
+        db_path = tmp_path / "test.db"
+        scanner = FileScanner(str(db_path))
+        result = scanner.scan(str(tmp_path / "a"), extensions_ignore=['.tmp'])
+        scanner.close()
+        
+        assert (result['scanned'], result['errors']) == (1, 0), result
+        conn = sqlite3.connect(db_path)
+        row = conn.execute("SELECT name, extension, size FROM files").fetchone()
+        conn.close()
+        assert row == ('deep.txt', '.txt', 4), row
+        print("✓ Streaming scan test passed")
+
+def test_scan_parallel_workers():
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        tree = tmp_path / "tree"
+        for i in range(5):
+            sub = tree / f"d{i}" / "nested"
+            sub.mkdir(parents=True)
+            for j in range(4):
+                (sub / f"f{j}.txt").write_text(str(j))
+        
+        db_path = tmp_path / "test.db"
+        scanner = FileScanner(str(db_path))
+        result = scanner.scan(str(tree), workers=4)
+        scanner.close()
+        
+        assert (result['scanned'], result['errors']) == (20, 0), result
+        conn = sqlite3.connect(db_path)
+        count = conn.execute("SELECT COUNT(DISTINCT path) FROM files").fetchone()[0]
+        conn.close()
+        assert count == 20
+        print("✓ Parallel scan test passed")
+
+def test_scan_failed_flush_marks_run_interrupted():
+    from batch_writer import BatchWriter
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        tree = tmp_path / "tree"
+        tree.mkdir()
+        for i in range(5):
+            (tree / f"f{i}.txt").write_text(str(i))
+        db_path = tmp_path / "test.db"
+        scanner = FileScanner(str(db_path))
+        original_flush = BatchWriter.flush
+        def locked_flush(self):
+            if self.rows:
+                raise sqlite3.OperationalError("database is locked")
+            return original_flush(self)
+        BatchWriter.flush = locked_flush
+        try:
+            scanner.scan(str(tree), batch_size=2, commit_interval=3600)
+            assert False, "scan should have failed"
+        except sqlite3.OperationalError as e:
+            # The original error, not the one from the cleanup
+            assert str(e) == "database is locked"
+        finally:
+            BatchWriter.flush = original_flush
+        assert scanner.conn.execute("SELECT status FROM scan_runs").fetchone() == ('interrupted',)
+        scanner.close()
+        print("✓ Failed flush test passed")
+
+def test_scan_resume_after_crash():
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        tree = tmp_path / "tree"
+        tree.mkdir()
+        for i in range(10):
+            (tree / f"f{i}.txt").write_text(str(i))
+        db_path = tmp_path / "test.db"
+        
+        # Crash after the fifth file; batches of two mean four rows are committed
+        scanner = FileScanner(str(db_path))
+        original_build_row = scanner._build_row
+        calls = []
+        def crashing_build_row(*args):
+            calls.append(args)
+            if len(calls) == 5:
+                raise KeyboardInterrupt
+            return original_build_row(*args)
+        scanner._build_row = crashing_build_row
+        try:
+            scanner.scan(str(tree), batch_size=2, commit_interval=3600)
+            assert False, "scan should have been interrupted"
+        except KeyboardInterrupt:
+            pass
+        scanner.close()
+        
+        conn = sqlite3.connect(db_path)
+        assert conn.execute("SELECT COUNT(*) FROM files").fetchone()[0] == 4
+        assert conn.execute("SELECT status, files_committed FROM scan_runs").fetchone() == ('interrupted', 4)
+        conn.close()
+        
+        scanner = FileScanner(str(db_path))
+        result = scanner.scan(str(tree), resume=True)
+        scanner.close()
+        assert result['skipped'] == 4 and result['scanned'] == 6, result
+        conn = sqlite3.connect(db_path)
+        assert conn.execute("SELECT COUNT(*) FROM files").fetchone()[0] == 10
+        assert conn.execute("SELECT COUNT(*), MAX(status) FROM scan_runs").fetchone() == (1, 'completed')
+        conn.close()
+        print("✓ Scan resume test passed")
+
+def test_incremental_rescan():
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        tree = tmp_path / "tree"
+        tree.mkdir()
+        for name in ("keep.txt", "change.txt", "remove.txt"):
+            (tree / name).write_text(name)
+        db_path = tmp_path / "test.db"
+        
+        scanner = FileScanner(str(db_path))
+        scanner.scan(str(tree), compute_hash=True)
+        conn = sqlite3.connect(db_path)
+        ids_before = dict(conn.execute("SELECT name, id FROM files"))
+        conn.execute("UPDATE files SET category = 'Kept'")
+        conn.commit()
+        
+        (tree / "change.txt").write_text("changed content")
+        (tree / "remove.txt").unlink()
+        (tree / "new.txt").write_text("new")
+        result = scanner.scan(str(tree), compute_hash=True, incremental=True)
+        scanner.close()
+        
+        assert result['scanned'] == 2 and result['unchanged'] == 1 and result['deleted'] == 1, result
+        rows = {name: (file_id, category, deleted_at is not None, hash_val)
+                for name, file_id, category, deleted_at, hash_val in conn.execute(
+                    "SELECT name, id, category, deleted_at, hash_sha256 FROM files")}
+        conn.close()
+        # Changed rows are updated in place, keeping id and category
+        assert rows['change.txt'][:3] == (ids_before['change.txt'], 'Kept', False)
+        assert rows['keep.txt'][:3] == (ids_before['keep.txt'], 'Kept', False)
+        assert rows['remove.txt'][2] is True
+        assert rows['new.txt'][3] is not None
+        print("✓ Incremental rescan test passed")
+
+def test_scan_hash_stage():
+    import hashlib
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        tree = tmp_path / "tree"
+        tree.mkdir()
+        contents = {f"f{i}.bin": os.urandom(i * 4096) for i in range(12)}
+        for name, data in contents.items():
+            (tree / name).write_bytes(data)
+        db_path = tmp_path / "test.db"
+        
+        scanner = FileScanner(str(db_path))
+        scanner.scan(str(tree), compute_hash=True, hash_workers=3)
+        scanner.close()
+        
+        conn = sqlite3.connect(db_path)
+        stored = dict(conn.execute("SELECT name, hash_sha256 FROM files"))
+        conn.close()
+        assert stored == {name: hashlib.sha256(data).hexdigest() for name, data in contents.items()}
+        print("✓ Hash stage test passed")
+
+def test_hash_backends_agree():
+    import hashlib
+    from hashing import compute_hash
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        for size in (0, 1, 70000, 5 * 1024 * 1024):
+            data = os.urandom(size)
+            path = tmp_path / f"f{size}.bin"
+            path.write_bytes(data)
+            expected = hashlib.sha256(data).hexdigest()
+            # Empty files cannot be mapped and must fall back to the read loop
+            for backend in ('auto', 'mmap', 'readinto'):
+                assert compute_hash(path, backend=backend) == expected, (size, backend)
+        assert compute_hash(tmp_path / "missing.bin") is None
+        print("✓ Hash backend test passed")
+
+def test_hash_pipeline_survives_unexpected_errors():
+    import threading
+    import hashing
+    from hashing import HashPipeline
+    original = hashing.compute_hash
+    def flaky_hash(path, size=None, algorithm='sha256'):
+        if str(path).endswith('bad'):
+            raise ValueError("mmap length is greater than file size")
+        return 'ok'
+    hashing.compute_hash = flaky_hash
+    try:
+        results = {}
+        items = [(i, f"/x/{'bad' if i % 3 == 0 else 'good'}", 10) for i in range(30)]
+        done = threading.Thread(target=lambda: results.update(HashPipeline(workers=3).run(items)),
+                                daemon=True)
+        done.start()
+        done.join(10)
+        assert not done.is_alive(), "hash pipeline hung"
+    finally:
+        hashing.compute_hash = original
+    assert results == {i: None if i % 3 == 0 else 'ok' for i in range(30)}
+    print("✓ Hash pipeline error test passed")
+
+def test_staged_duplicate_detection():
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        tree = tmp_path / "tree"
+        tree.mkdir()
+        payload = os.urandom(64 * 1024)
+        (tree / "a.bin").write_bytes(payload)
+        (tree / "copy_of_a.bin").write_bytes(payload)
+        # Same size and same head/tail as a.bin, different middle
+        (tree / "near_a.bin").write_bytes(payload[:30000] + b"x" + payload[30001:])
+        # Same size, different head
+        (tree / "other.bin").write_bytes(b"y" + payload[1:])
+        (tree / "unique.bin").write_bytes(os.urandom(1000))
+        (tree / "small1.txt").write_text("same")
+        (tree / "small2.txt").write_text("same")
+        db_path = tmp_path / "test.db"
+        
+        scanner = FileScanner(str(db_path))
+        scanner.scan(str(tree))
+        scanner.close()
+        
+        db = CatalogDatabase(str(db_path))
+        duplicates = db.find_duplicates(threshold_mb=0)
+        stats = db.last_duplicate_stats
+        names = [sorted(db.conn.execute(
+                    f"SELECT name FROM files WHERE id IN ({','.join('?' * len(ids))})", ids).fetchall())
+                 for _, ids in duplicates]
+        stored = db.conn.execute("SELECT COUNT(*) FROM duplicate_files").fetchone()[0]
+        db.close()
+        
+        assert sorted(names) == [[('a.bin',), ('copy_of_a.bin',)], [('small1.txt',), ('small2.txt',)]], names
+        assert stored == 4
+        assert stats['files_after_size'] == 6 and stats['files_after_partial'] == 5, stats
+        assert stats['bytes_avoided_by_size'] == 1000
+        assert stats['bytes_avoided_by_partial'] == 64 * 1024
+        print("✓ Staged duplicate detection test passed")
+
+def test_fingerprint_duplicates():
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        tree = tmp_path / "tree"
+        tree.mkdir()
+        payload = os.urandom(20000)
+        (tree / "one.bin").write_bytes(payload)
+        (tree / "two.bin").write_bytes(payload)
+        (tree / "three.bin").write_bytes(os.urandom(20000))
+        db_path = tmp_path / "test.db"
+        
+        scanner = FileScanner(str(db_path))
+        scanner.scan(str(tree), fingerprint='blake2b')
+        scanner.close()
+        
+        db = CatalogDatabase(str(db_path))
+        fingerprints = [row[0] for row in db.conn.execute("SELECT fingerprint FROM files")]
+        sha_count = db.conn.execute("SELECT COUNT(hash_sha256) FROM files").fetchone()[0]
+        duplicates = db.find_duplicates(threshold_mb=0, algorithm='blake2b')
+        db.close()
+        
+        assert all(fp.startswith('blake2b:') for fp in fingerprints), fingerprints
+        # SHA‑256 is not computed when only a fingerprint was requested
+        assert sha_count == 0
+        assert len(duplicates) == 1 and len(duplicates[0][1]) == 2
+        assert duplicates[0][0] in fingerprints
+        print("✓ Fingerprint duplicates test passed")
+
+def test_connection_profiles_allow_concurrent_reads():
+    from connection import connect
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp) / "test.db")
+        scanner = FileScanner(db_path)
+        assert scanner.conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+        
+        # A scan holds an open write transaction...
+        scanner.conn.execute("BEGIN")
+        scanner.conn.execute("INSERT INTO files (path, name) VALUES ('/x', 'x')")
+        # ...while a reader still gets a consistent snapshot without waiting
+        reader = connect(db_path, 'read', busy_timeout=0)
+        assert reader.execute("SELECT COUNT(*) FROM files").fetchone()[0] == 0
+        try:
+            reader.execute("DELETE FROM files")
+            assert False, "read profile must be query-only"
+        except sqlite3.OperationalError:
+            pass
+        scanner.conn.commit()
+        assert reader.execute("SELECT COUNT(*) FROM files").fetchone()[0] == 1
+        reader.close()
+        scanner.close()
+        print("✓ Connection profile test passed")
+
+def test_schema_migrates_legacy_database():
+    from schema import SCHEMA_VERSION
+    import yaml
+
+    def legacy_catalog(db_path):
+        # Catalog as created before schema versioning
+        conn = sqlite3.connect(db_path)
+        conn.execute("""CREATE TABLE files (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        path TEXT UNIQUE NOT NULL, name TEXT NOT NULL, extension TEXT,
+                        size INTEGER, created REAL, modified REAL, accessed REAL,
+                        attributes INTEGER, hash_sha256 TEXT, category TEXT,
+                        subcategory TEXT, tags TEXT, project TEXT, software TEXT,
+                        version TEXT, extra_json TEXT)""")
+        conn.execute("CREATE INDEX idx_files_path ON files(path)")
+        conn.execute("INSERT INTO files (path, name) VALUES ('/a.txt', 'a.txt')")
+        conn.commit()
+        conn.close()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp) / "test.db")
+        legacy_catalog(db_path)
+        db = CatalogDatabase(db_path)
+        assert db.conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+        columns = {row[1] for row in db.conn.execute("PRAGMA table_info(files)")}
+        assert {'scan_id', 'deleted_at', 'fingerprint', 'indexed_at'} <= columns
+        indexes = {row[0] for row in db.conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'files'")}
+        assert 'idx_files_path' not in indexes
+        assert db.conn.execute("SELECT COUNT(*) FROM files").fetchone()[0] == 1
+        db.close()
+        # Opening a current catalog again is a no-op
+        FileScanner(db_path).close()
+        
+        # Read-only components opened first migrate the catalog as well
+        db_path = str(Path(tmp) / "read_first.db")
+        legacy_catalog(db_path)
+        rules_path = Path(tmp) / "views.yaml"
+        rules_path.write_text(yaml.safe_dump({'views': {'All': {'rules': [
+            {'condition': {'name': 'a.txt'}, 'target': 'All/{name}'}]}}}), encoding='utf-8')
+        engine = RuleEngine(db_path, str(rules_path))
+        assert [m['target_path'] for m in engine.iter_view('All')] == ['All/a.txt']
+        engine.close()
+        print("✓ Schema migration test passed")
+
+def test_hot_queries_use_indexes():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp) / "test.db")
+        scanner = FileScanner(db_path)
+        alive = "deleted_at IS NULL"
+        queries = [
+            # Web UI search (count + page) per filter
+            f"SELECT COUNT(*) FROM files WHERE {alive} AND category = ?",
+            f"SELECT id FROM files WHERE {alive} AND category = ? ORDER BY created DESC LIMIT 50",
+            f"SELECT COUNT(*) FROM files WHERE {alive} AND extension = ?",
+            f"SELECT id FROM files WHERE {alive} AND extension = ? ORDER BY created DESC LIMIT 50",
+            f"SELECT COUNT(*) FROM files WHERE {alive} AND size >= ? AND size <= ?",
+            f"SELECT id FROM files WHERE {alive} AND size >= ? AND size <= ? ORDER BY created DESC LIMIT 50",
+            f"SELECT id FROM files WHERE {alive} ORDER BY created DESC LIMIT 50",
+            # Filter drop-downs
+            f"SELECT DISTINCT category FROM files WHERE category IS NOT NULL AND {alive} ORDER BY category",
+            f"SELECT DISTINCT extension FROM files WHERE extension IS NOT NULL AND {alive} ORDER BY extension",
+            # Duplicate listing and size grouping in duplicate detection
+            f"SELECT hash_sha256, COUNT(*) FROM files WHERE hash_sha256 IS NOT NULL AND {alive} "
+            f"GROUP BY hash_sha256 HAVING COUNT(*) > 1",
+            f"SELECT fingerprint, COUNT(*) FROM files WHERE fingerprint IS NOT NULL AND {alive} "
+            f"GROUP BY fingerprint HAVING COUNT(*) > 1",
+            f"SELECT size FROM files WHERE size >= ? AND {alive} GROUP BY size HAVING COUNT(*) > 1",
+        ]
+        for sql in queries:
+            params = (1,) * sql.count('?')
+            plan = [row[3] for row in scanner.conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+            # "SCAN files" alone is a full table scan; "SCAN files USING INDEX" is an ordered index walk
+            assert not any(step.startswith('SCAN files') and 'INDEX' not in step for step in plan), (sql, plan)
+        scanner.close()
+        print("✓ Query plan test passed")
+
+def test_rule_engines_agree():
+    import yaml
+    views_file = Path(__file__).parent.parent / 'config' / 'views.yaml'
+    with open(views_file, encoding='utf-8') as f:
+        rules = yaml.safe_load(f)
+    rules['views']['Edge'] = {'rules': [
+        {'condition': {'size': '<= 10'}, 'target': 'AtMost10/{name}'},
+        {'condition': {'name': '/file_1\\d*/'}, 'target': '{year}/{month}/{day}/{name}'},
+        {'condition': {'category': 'documents or images'}, 'target': 'Either/{category}'},
+        {'condition': [{'software': '*'}, {'size': '> 0'}], 'target': '{subcategory}//{software}'},
+        {'condition': {'project': 'Proj1'}, 'target': ''},
+        {'condition': {'subcategory': None}, 'target': '{missing}'},
+    ]}
+    rules['views']['PushedDown'] = {'rules': [
+        {'condition': {'subcategory': None}, 'target': '{missing}'},
+        {'condition': {'category': 'ímages', 'size': '>= 0 or accessed < now - 1 days'}, 'target': 'Img/{name}'},
+        {'condition': {'category': 'kelvin\u212a'}, 'target': 'Kelvin/{name}'},
+        {'condition': {'size': 102400, 'accessed': '>= size'}, 'target': 'Exact/{size}'},
+        {'condition': {'project': '*', 'nothing': None}, 'target': '{project}/{subcategory}/{name}'},
+    ]}
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp) / "test.db")
+        rules_file = Path(tmp) / 'rules.yaml'
+        with open(rules_file, 'w', encoding='utf-8') as f:
+            yaml.dump(rules, f)
+        populate_catalog(db_path)
+        pushdown = RuleEngine(db_path, str(rules_file))
+        compiled = RuleEngine(db_path, str(rules_file), pushdown=False)
+        interpreted = RuleEngine(db_path, str(rules_file), compiled=False)
+        for view_name in rules['views']:
+            expected = interpreted.generate_view(view_name)
+            assert compiled.generate_view(view_name) == expected, view_name
+            assert pushdown.generate_view(view_name) == expected, view_name
+        # Simple views are decided entirely by SQLite
+        from query_planner import plan_view
+        for view_name in ('BySize', 'ByUsage', 'ByCategory', 'PushedDown'):
+            view = pushdown.compiled_views[view_name]
+            assert plan_view(pushdown.conn, view).python_from == [len(view.rules)], view_name
+        assert plan_view(pushdown.conn, pushdown.compiled_views['Edge']).python_from == [1]
+        
+        # All views from a single read of the catalog, with the same mappings
+        statements = []
+        for engine in (pushdown, compiled):
+            engine.conn.set_trace_callback(statements.append)
+            fused = engine.generate_views()
+            assert fused == {name: interpreted.generate_view(name) for name in rules['views']}
+        assert sum('SELECT' in sql and 'FROM files' in sql and 'EXISTS' not in sql
+                   for sql in statements) == 2
+        # Column type checks are not repeated until the catalog changes
+        statements.clear()
+        pushdown.generate_view('BySize')
+        assert not any('EXISTS' in sql for sql in statements)
+        conn = sqlite3.connect(db_path)
+        conn.execute("UPDATE files SET size = '2048' WHERE id = 3")
+        conn.commit()
+        conn.close()
+        assert pushdown.generate_view('BySize') == interpreted.generate_view('BySize')
+        assert any('EXISTS' in sql for sql in statements)
+        # The "size < X" parts of BySize now take effect
+        sizes = {m['target_path'].split('/')[1] for m in compiled.generate_view('BySize')}
+        assert {'Tiny (<100KB)', 'Small (100KB‑1MB)', 'Medium (1‑10MB)',
+                'Large (10‑100MB)', 'Huge (>100MB)'} <= sizes
+        assert compiled.compiled_views['ByUsage'].time_dependent
+        assert not compiled.compiled_views['BySize'].time_dependent
+        pushdown.close()
+        compiled.close()
+        interpreted.close()
+        print("✓ Rule engine equivalence test passed")
+
+def test_vectorized_rules_agree():
+    import yaml
+    from vectorized import HAS_NUMPY, VectorizedView
+    if not HAS_NUMPY:
+        print("- Vectorized rules test skipped (NumPy not installed)")
+        return
+    views_file = Path(__file__).parent.parent / 'config' / 'views.yaml'
+    with open(views_file, encoding='utf-8') as f:
+        rules = yaml.safe_load(f)
+    rules['views']['Numeric'] = {'rules': [
+        {'condition': {'size': '== 0'}, 'target': '{missing}'},
+        {'condition': {'size': '!= accessed', 'created': '< now - 1000 days'}, 'target': 'Old/{name}'},
+        {'condition': {'size': '!= nothing or size >= 2e9'}, 'target': 'Big/{size}'},
+        {'condition': {'accessed': '>= now - 30 days and size <= 102400'}, 'target': 'Recent/{name}'},
+        {'condition': {'category': 'Code'}, 'target': 'Code/{name}'},
+        {'condition': {'size': '> 10'}, 'target': 'Rest/{name}'},
+    ]}
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp) / "test.db")
+        rules_file = Path(tmp) / 'rules.yaml'
+        with open(rules_file, 'w', encoding='utf-8') as f:
+            yaml.dump(rules, f)
+        populate_catalog(db_path)
+        # Text and out-of-float64-range numbers in numeric columns
+        conn = sqlite3.connect(db_path)
+        conn.executemany("INSERT INTO files (path, name, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                         [('/t/a', 'a', '2048', 1.5e9, '2048'), ('/t/b', 'b', 'big', None, 1e9),
+                          ('/t/c', 'c', ' 12 ', None, None), ('/t/d', 'd', 2 ** 60 + 1, 1e9, 2 ** 60)])
+        conn.commit()
+        conn.close()
+        vectorized = RuleEngine(db_path, str(rules_file), vectorized=True)
+        compiled = RuleEngine(db_path, str(rules_file), pushdown=False)
+        assert vectorized.vectorized and not vectorized.pushdown
+        for view_name in rules['views']:
+            expected = compiled.generate_view(view_name)
+            # Small batches also cover the per-batch fallback for huge integers
+            assert list(vectorized.iter_view(view_name, fetch_size=64)) == expected, view_name
+        assert VectorizedView(compiled.compiled_views['Numeric']).python_from == 4
+        assert VectorizedView(compiled.compiled_views['BySize']).python_from == 5
+        vectorized.close()
+        compiled.close()
+        print("✓ Vectorized rules test passed")
+
+def test_parallel_generation_matches_serial():
+    from view_generator import ViewGenerator
+    rules_file = str(Path(__file__).parent.parent / 'config' / 'views.yaml')
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp) / "test.db")
+        populate_catalog(db_path, 1000)
+        conn = sqlite3.connect(db_path)
+        # Gaps in the id range and flagged rows must not disturb the shards
+        conn.execute("DELETE FROM files WHERE id BETWEEN 100 AND 300")
+        conn.execute("UPDATE files SET deleted_at = CURRENT_TIMESTAMP WHERE id % 11 = 0")
+        conn.commit()
+        conn.close()
+        serial = RuleEngine(db_path, rules_file)
+        expected = serial.generate_views()
+        for options in ({}, {'pushdown': False}, {'vectorized': True}):
+            engine = RuleEngine(db_path, rules_file, jobs=2, **options)
+            assert engine.generate_views() == expected, options
+            assert engine.generate_view('ByDate') == expected['ByDate'], options
+            engine.close()
+        serial.close()
+        gen = ViewGenerator(db_path, rules_file, jobs=3)
+        summary, unique_files = gen.summarize_views()
+        assert unique_files == len({m['source_path'] for mappings in expected.values() for m in mappings})
+        assert {name: count for name, (count, _) in summary.items()} == \
+            {name: len(mappings) for name, mappings in expected.items()}
+        gen.close()
+        print("✓ Parallel generation test passed")
+
+def test_streamed_mappings_roundtrip():
+    import json
+    from mapping_io import read_mappings, write_mappings
+    from link_creator import LinkCreator
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        data_dir = tmp_path / "data"
+        data_dir.mkdir()
+        create_test_files(data_dir)
+        db_path = str(tmp_path / "test.db")
+        scanner = FileScanner(db_path)
+        scanner.scan(str(data_dir))
+        scanner.close()
+        
+        engine = RuleEngine(db_path, str(Path(__file__).parent.parent / 'config' / 'views.yaml'))
+        expected = engine.generate_view('ByDate')
+        assert len(expected) == 6
+        # The generator fetches in batches straight from the cursor
+        assert list(engine.iter_view('ByDate', fetch_size=2)) == expected
+        
+        legacy = tmp_path / "legacy.json"
+        with open(legacy, 'w') as f:
+            json.dump(expected, f, indent=2)
+        assert list(read_mappings(str(legacy))) == expected
+        for name in ("mappings.json", "mappings.ndjson"):
+            path = str(tmp_path / name)
+            assert write_mappings(engine.iter_view('ByDate'), path) == 6
+            assert list(read_mappings(path)) == expected
+        ndjson_lines = (tmp_path / "mappings.ndjson").read_text(encoding='utf-8').splitlines()
+        assert len(ndjson_lines) == 6 and json.loads(ndjson_lines[0]) == expected[0]
+        engine.close()
+        
+        # The link creator consumes the mappings lazily
+        creator = LinkCreator(db_path, views_root=str(tmp_path / "_Views"))
+        created, errors = creator.create_links(read_mappings(str(tmp_path / "mappings.ndjson")),
+                                               'ByDate', dry_run=False)
+        assert (created, errors) == (6, 0)
+        logged = creator.conn.execute("SELECT COUNT(*) FROM link_transactions").fetchone()[0]
+        assert logged == 6
+        creator.close()
+        print("✓ Streamed mappings test passed")
+
+def test_link_sync_applies_only_changes():
+    from link_creator import LinkCreator
+    if os.name == 'nt':
+        print("✓ Link sync test skipped (symlinks need privileges on Windows)")
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        sources = tmp_path / "data"
+        sources.mkdir()
+        for name in ("a.txt", "b.txt", "c.txt", "d.txt"):
+            (sources / name).write_text(name)
+        view_dir = tmp_path / "_Views" / "V"
+        
+        def mapping(name, target):
+            return {'source_path': str(sources / name), 'target_path': target}
+        
+        creator = LinkCreator(str(tmp_path / "test.db"), views_root=str(tmp_path / "_Views"))
+        first = [mapping("a.txt", "x/a.txt"), mapping("b.txt", "x/b.txt"), mapping("c.txt", "y/c.txt")]
+        assert creator.sync_links(first, 'V', dry_run=False)['added'] == 3
+        # Files in the view that are not links are left alone
+        (view_dir / "notes.txt").write_text("mine")
+        
+        second = [mapping("a.txt", "x/a.txt"), mapping("d.txt", "x/b.txt"), mapping("d.txt", "z/d.txt")]
+        expected = {'added': 1, 'removed': 1, 'retargeted': 1, 'unchanged': 1, 'conflicts': 0, 'errors': 0}
+        for state in ('disk', 'log'):
+            assert creator.sync_links(second, 'V', state=state) == expected, state
+        assert os.path.islink(view_dir / "y" / "c.txt")
+        assert creator.sync_links(second, 'V', dry_run=False) == expected
+        assert not (view_dir / "y").exists()
+        assert (view_dir / "x" / "b.txt").read_text() == "d.txt"
+        assert (view_dir / "z" / "d.txt").read_text() == "d.txt"
+        assert (view_dir / "notes.txt").read_text() == "mine"
+        
+        unchanged = {'added': 0, 'removed': 0, 'retargeted': 0, 'unchanged': 3, 'conflicts': 0, 'errors': 0}
+        for state in ('disk', 'log'):
+            assert creator.sync_links(second, 'V', dry_run=False, state=state) == unchanged, state
+        blocked = creator.sync_links(second + [mapping("c.txt", "notes.txt")], 'V', dry_run=False)
+        assert (blocked['conflicts'], blocked['errors']) == (1, 1)
+        assert (view_dir / "notes.txt").read_text() == "mine"
+        creator.close()
+        print("✓ Link sync test passed")
+
+def test_parallel_link_creation():
+    from link_creator import LinkCreator
+    if os.name == 'nt':
+        print("✓ Parallel link test skipped (symlinks need privileges on Windows)")
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        sources = tmp_path / "data"
+        sources.mkdir()
+        mappings = []
+        for i in range(300):
+            (sources / f"f{i}.txt").write_text(str(i))
+            mappings.append({'source_path': str(sources / f"f{i}.txt"),
+                             'target_path': f"D{i % 7}/S{i % 13}/f{i}.txt"})
+        # Two mappings to the same link: the later one wins, as when linking serially
+        mappings.append({'source_path': str(sources / "f1.txt"), 'target_path': "D0/S0/f0.txt"})
+        (tmp_path / "_Views" / "V" / "D3").mkdir(parents=True)
+        (tmp_path / "_Views" / "V" / "D3" / "S3").write_text("not a directory")
+        creator = LinkCreator(str(tmp_path / "test.db"), views_root=str(tmp_path / "_Views"))
+        created, errors = creator.create_links(mappings, 'V', dry_run=False, workers=4)
+        blocked = sum(1 for m in mappings if m['target_path'].startswith("D3/S3/"))
+        assert (created, errors) == (len(mappings) - blocked, blocked) and blocked
+        view_dir = tmp_path / "_Views" / "V"
+        assert (view_dir / "D0" / "S0" / "f0.txt").read_text() == "1"
+        assert (view_dir / "D6" / "S12" / "f90.txt").read_text() == "90"
+        logged = creator.conn.execute(
+            "SELECT COUNT(*), SUM(success) FROM link_transactions WHERE view_name = 'V'").fetchone()
+        assert logged == (len(mappings), created)
+
+        # An existing link that cannot be replaced fails on its own, the batch goes on
+        original_unlink = Path.unlink
+        def unlink(self, missing_ok=False):
+            if self.name == "f5.txt":
+                raise PermissionError("denied")
+            return original_unlink(self, missing_ok)
+        Path.unlink = unlink
+        try:
+            # f3 is blocked by the file D3/S3 as before
+            assert creator.create_links(mappings[:20], 'V', dry_run=False, workers=4) == (18, 2)
+        finally:
+            Path.unlink = original_unlink
+        assert creator.conn.execute(
+            "SELECT COUNT(*) FROM link_transactions WHERE success IS NULL").fetchone()[0] == 0
+        creator.close()
+        print("✓ Parallel link test passed")
+
+def test_interrupted_link_run_recovers():
+    from link_creator import LinkCreator
+    if os.name == 'nt':
+        print("✓ Interrupted link run test skipped (symlinks need privileges on Windows)")
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        sources = tmp_path / "data"
+        sources.mkdir()
+        mappings = []
+        for i in range(5):
+            (sources / f"f{i}.txt").write_text(str(i))
+            mappings.append({'source_path': str(sources / f"f{i}.txt"), 'target_path': f"D/f{i}.txt"})
+        db_path = str(tmp_path / "test.db")
+        views_root = str(tmp_path / "_Views")
+        
+        creator = LinkCreator(db_path, views_root=views_root)
+        assert creator.create_links(mappings, 'V', dry_run=True) == (0, 0)
+        assert creator.conn.execute("SELECT COUNT(*) FROM link_transactions").fetchone()[0] == 0
+        link_many = creator._link_many
+        
+        def crash(links, pool):
+            link_many(links[:3], pool)
+            raise RuntimeError("killed")
+        creator._link_many = crash
+        try:
+            creator.create_links(mappings, 'V', dry_run=False)
+            assert False, "expected the simulated crash"
+        except RuntimeError:
+            pass
+        # The whole batch was logged before any link was created
+        pending = creator.conn.execute(
+            "SELECT COUNT(*) FROM link_transactions WHERE success IS NULL").fetchone()[0]
+        assert pending == 5
+        creator.close()
+        
+        creator = LinkCreator(db_path, views_root=views_root)
+        deleted, errors = creator.rollback_view('V')
+        assert (deleted, errors) == (3, [])
+        assert not any(os.path.lexists(tmp_path / "_Views" / "V" / "D" / f"f{i}.txt") for i in range(5))
+        outcomes = creator.conn.execute("""
+            SELECT success, COUNT(*) FROM link_transactions WHERE operation = 'create'
+            GROUP BY success ORDER BY success""").fetchall()
+        assert outcomes == [(0, 2), (1, 3)]
+        # Resuming after a crash
+        creator._link_many = crash
+        try:
+            creator.create_links(mappings, 'V', dry_run=False)
+        except RuntimeError:
+            pass
+        creator.close()
+        creator = LinkCreator(db_path, views_root=views_root)
+        stats = creator.sync_links(mappings, 'V', dry_run=False, state='log')
+        assert (stats['added'], stats['unchanged'], stats['errors']) == (2, 3, 0)
+        assert all((tmp_path / "_Views" / "V" / "D" / f"f{i}.txt").read_text() == str(i) for i in range(5))
+
+        # An interrupted rollback of the whole view: the log knows which links are gone
+        unlink_many = creator._unlink_many
+
+        def crash_unlink(links, pool, check_source):
+            unlink_many(links[:2], pool, check_source)
+            raise RuntimeError("killed")
+        creator._unlink_many = crash_unlink
+        try:
+            creator.rollback_view('V')
+            assert False, "expected the simulated crash"
+        except RuntimeError:
+            pass
+        creator.close()
+        creator = LinkCreator(db_path, views_root=views_root)
+        stats = creator.sync_links(mappings, 'V', dry_run=True, state='log')
+        assert (stats['added'], stats['unchanged']) == (2, 3)
+        assert creator.rollback_view('V') == (3, [])
+        creator.close()
+        print("✓ Interrupted link run test passed")
+
+def test_rollback_single_run():
+    from link_creator import LinkCreator
+    if os.name == 'nt':
+        print("✓ Run rollback test skipped (symlinks need privileges on Windows)")
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        sources = tmp_path / "data"
+        sources.mkdir()
+        for name in "abcd":
+            (sources / name).write_text(name)
+        view_dir = tmp_path / "_Views" / "V"
+        
+        def mapping(name, target):
+            return {'source_path': str(sources / name), 'target_path': target}
+        
+        creator = LinkCreator(str(tmp_path / "test.db"), views_root=str(tmp_path / "_Views"))
+        creator.create_links([mapping("a", "x/a"), mapping("b", "x/b")], 'V', dry_run=False)
+        creator.create_links([mapping("c", "y/z/c")], 'V', dry_run=False)
+        creator.sync_links([mapping("a", "x/a"), mapping("d", "x/b"), mapping("c", "y/z/c")], 'V',
+                           dry_run=False)
+        runs = creator.list_runs('V')
+        assert [run['operation'] for run in runs] == ['sync', 'create', 'create']
+        assert [run['links'] for run in runs] == [1, 1, 2] and runs[0]['finished_at']
+        first, second = runs[2]['id'], runs[1]['id']
+        
+        # x/b was retargeted by the sync, so it no longer belongs to the first run
+        deleted, errors = creator.rollback_view('V', run_id=first, workers=4)
+        assert deleted == 1 and len(errors) == 1 and 'Changed since' in errors[0]
+        assert not os.path.lexists(view_dir / "x" / "a")
+        assert (view_dir / "x" / "b").read_text() == "d"
+        assert creator.rollback_view('V', run_id=second) == (1, [])
+        # Emptied directories are pruned up to the view
+        assert not (view_dir / "y").exists()
+        assert creator._logged_view_links('V', view_dir) == {'x' + os.sep + 'b': str(sources / "d")}
+        
+        assert creator.rollback_view('V') == (1, [])
+        assert not view_dir.exists()
+        assert creator.list_runs('V')[0]['operation'] == 'rollback'
+        creator.close()
+        print("✓ Run rollback test passed")
+
+def test_link_log_survives_full_rescan():
+    from link_creator import LinkCreator
+    if os.name == 'nt':
+        print("✓ Link log rescan test skipped (symlinks need privileges on Windows)")
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp).resolve()
+        sources = tmp_path / "data"
+        sources.mkdir()
+        mappings = []
+        for i in range(5):
+            (sources / f"f{i}.txt").write_text(str(i))
+            mappings.append({'source_path': str(sources / f"f{i}.txt"), 'target_path': f"D/f{i}.txt"})
+        db_path = str(tmp_path / "test.db")
+        view_dir = tmp_path / "_Views" / "V"
+        
+        scanner = FileScanner(db_path)
+        scanner.scan(str(sources))
+        ids = scanner.conn.execute("SELECT path, id FROM files ORDER BY path").fetchall()
+        creator = LinkCreator(db_path, views_root=str(tmp_path / "_Views"))
+        creator.create_links(mappings[:3], 'V', dry_run=False)
+        run_id = creator.list_runs('V')[0]['id']
+        # The log refers to the cataloged sources by id
+        assert creator.conn.execute(
+            "SELECT COUNT(*) FROM link_log WHERE file_id IS NOT NULL").fetchone()[0] == 3
+        link_many = creator._link_many
+        
+        def crash(links, pool):
+            link_many(links[:1], pool)
+            raise RuntimeError("killed")
+        creator._link_many = crash
+        try:
+            creator.create_links(mappings[3:], 'V', dry_run=False)
+        except RuntimeError:
+            pass
+        creator.close()
+        
+        # A full (non-incremental) scan rewrites every row but keeps its id
+        scanner.scan(str(sources))
+        assert scanner.conn.execute("SELECT path, id FROM files ORDER BY path").fetchall() == ids
+        scanner.close()
+        
+        creator = LinkCreator(db_path, views_root=str(tmp_path / "_Views"))
+        assert creator.recover_pending('V') == {'completed': 1, 'incomplete': 1}
+        stats = creator.sync_links(mappings, 'V', dry_run=True, state='log')
+        assert (stats['unchanged'], stats['added'], stats['retargeted']) == (4, 1, 0)
+        assert creator.rollback_view('V', run_id=run_id) == (3, [])
+        assert not any(os.path.lexists(view_dir / "D" / f"f{i}.txt") for i in range(3))
+        assert (view_dir / "D" / "f3.txt").read_text() == "3"
+        creator.close()
+        print("✓ Link log rescan test passed")
+
+def test_link_log_migration_and_compaction():
+    from link_creator import LinkCreator
+    from schema import MIGRATIONS
+    if os.name == 'nt':
+        print("✓ Link log compaction test skipped (symlinks need privileges on Windows)")
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        sources = tmp_path / "data"
+        sources.mkdir()
+        for name in "abcd":
+            (sources / name).write_text(name)
+        db_path = str(tmp_path / "test.db")
+        view_dir = tmp_path / "_Views" / "V"
+        
+        # A catalog whose log predates the compact layout
+        conn = sqlite3.connect(db_path)
+        for version, _, migrate in MIGRATIONS[:5]:
+            migrate(conn.cursor())
+            conn.execute(f"PRAGMA user_version = {version}")
+        conn.execute("INSERT INTO files (path, name) VALUES (?, 'a')", (str(sources / "a"),))
+        conn.executemany("""
+            INSERT INTO link_transactions (timestamp, operation, view_name, source_path, link_path, success, error)
+            VALUES (?, ?, 'V', ?, ?, ?, ?)""", [
+            ('2024-05-01T10:00:00.123456', 'create', str(sources / "a"), str(view_dir / "old" / "a"), 1, None),
+            ('2024-05-01T10:00:01.000000', 'create', '/gone/x', str(view_dir / "old" / "x"), 0, 'failed'),
+            ('2024-05-02T09:30:00.000000', 'rollback', '', '', 1, '')])
+        conn.execute("""
+            INSERT INTO link_runs (view_name, operation, started_at, finished_at, links, errors)
+            VALUES ('W', 'create', '2024-05-03T08:00:00.500000', '2024-05-03T08:00:05.000000', 1, 0)""")
+        conn.commit()
+        legacy = conn.execute("SELECT id, substr(timestamp, 1, 19), operation, view_name, source_path, "
+                              "link_path, success, error FROM link_transactions ORDER BY id").fetchall()
+        conn.close()
+        
+        creator = LinkCreator(db_path, views_root=str(tmp_path / "_Views"))
+        migrated = creator.conn.execute("SELECT id, timestamp, operation, view_name, source_path, "
+                                        "link_path, success, error FROM link_transactions ORDER BY id").fetchall()
+        assert migrated == legacy
+        # The cataloged source is stored by id, the other one as text
+        assert creator.conn.execute("SELECT file_id IS NOT NULL, source_path IS NULL FROM link_log "
+                                    "ORDER BY id").fetchall()[:2] == [(1, 1), (0, 0)]
+        # Run times are stored as Unix times and listed as before
+        assert creator.conn.execute(
+            "SELECT DISTINCT typeof(started_at), typeof(finished_at) FROM link_runs").fetchall() == [
+            ('integer', 'integer')]
+        assert [(run['operation'], run['started_at'], run['finished_at']) for run in creator.list_runs('W')] == [
+            ('create', '2024-05-03T08:00:00', '2024-05-03T08:00:05')]
+        assert [(run['operation'], run['started_at'], run['finished_at']) for run in creator.list_runs('V')] == [
+            ('import', '2024-05-01T10:00:00', '2024-05-02T09:30:00')]
+        
+        def mapping(name, target):
+            return {'source_path': str(sources / name), 'target_path': target}
+        
+        creator.create_links([mapping("a", "x/a"), mapping("b", "x/b")], 'V', dry_run=False)
+        creator.sync_links([mapping("a", "x/a"), mapping("c", "x/b"), mapping("d", "y/d")], 'V', dry_run=False)
+        creator.sync_links([mapping("a", "x/a"), mapping("c", "x/b")], 'V', dry_run=False)
+        (view_dir / "z").write_text("not a link")
+        creator.create_links([mapping("b", "z")], 'V', dry_run=False)
+        rows = creator.conn.execute("SELECT link_path FROM link_transactions WHERE id > 3 "
+                                    "ORDER BY id").fetchall()
+        # Links below the view directory are stored relative to it
+        assert creator.conn.execute("SELECT COUNT(*) FROM link_log WHERE target IS NOT NULL").fetchone()[0] == 6
+        assert rows[0] == (str(view_dir / "x" / "a"),)
+        state = creator._logged_links('V')
+        
+        stats = creator.compact_log(vacuum=True)
+        assert stats == {'removed': 6, 'kept': 3}
+        assert creator._logged_links('V') == state == {str(view_dir / "x" / "a"): str(sources / "a"),
+                                                        str(view_dir / "x" / "b"): str(sources / "c")}
+        assert creator.conn.execute("SELECT operation, success FROM link_transactions WHERE link_path = ?",
+                                    (str(view_dir / "z"),)).fetchall() == [('create', 0)]
+        assert creator.compact_log() == {'removed': 0, 'kept': 3}
+        assert creator.rollback_view('V') == (2, [])
+        assert (view_dir / "z").read_text() == "not a link"
+        creator.close()
+        print("✓ Link log compaction test passed")
+
+def test_materialized_views_refresh_incrementally():
+    import yaml
+    from materializer import ViewMaterializer
+    rules = {'views': {
+        'ByCategory': {'description': 'Category folders', 'rules': [
+            {'condition': {'category': 'Documents'}, 'target': 'Docs/{name}'},
+            {'condition': {'size': '>= 500000'}, 'target': 'Big/{category}/{name}'}]},
+        'Recent': {'rules': [
+            {'condition': {'accessed': '>= now - 30 days'}, 'target': 'Recent/{year}/{name}'}]},
+    }}
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp) / "test.db")
+        rules_path = Path(tmp) / "views.yaml"
+        rules_path.write_text(yaml.safe_dump(rules), encoding='utf-8')
+        populate_catalog(db_path, 200)
+        # indexed_at has one-second resolution: rows written in the second of
+        # a refresh are evaluated again by the next one
+        conn = sqlite3.connect(db_path)
+        conn.execute("UPDATE files SET indexed_at = '2000-01-01 00:00:00'")
+        conn.commit()
+        conn.close()
+
+        def check(materializer):
+            engine = RuleEngine(db_path, str(rules_path))
+            for name in rules['views']:
+                assert list(materializer.iter_view(name)) == engine.generate_view(name), name
+            engine.close()
+
+        materializer = ViewMaterializer(db_path, str(rules_path))
+        # Unknown and never materialized views are errors, not empty views
+        for name in ('Missing', 'ByCategory'):
+            try:
+                materializer.iter_view(name)
+                assert False, f"expected ValueError for {name}"
+            except ValueError:
+                pass
+        stats = materializer.refresh()
+        assert stats['ByCategory']['mode'] == 'full' and stats['ByCategory']['computed'] > 0
+        check(materializer)
+        # Nothing changed: the time-independent view reads no rows at all
+        stats = materializer.refresh()
+        assert stats['ByCategory'] == {'mode': 'incremental', 'reason': None, 'computed': 0, 'removed': 0}
+        assert stats['Recent']['mode'] == 'full'
+
+        # Recategorized, removed, flagged as deleted and new files
+        conn = sqlite3.connect(db_path)
+        conn.execute("UPDATE files SET category = 'Documents', indexed_at = CURRENT_TIMESTAMP WHERE id = 2")
+        conn.execute("UPDATE files SET category = 'Images', indexed_at = CURRENT_TIMESTAMP WHERE id = 9")
+        conn.execute("DELETE FROM files WHERE id = 1")
+        conn.execute("UPDATE files SET deleted_at = CURRENT_TIMESTAMP WHERE id = 5")
+        conn.execute("INSERT INTO files (path, name, size, category) VALUES ('/new/a.pdf', 'a.pdf', 10, 'Documents')")
+        conn.commit()
+        conn.close()
+        stats = materializer.refresh(['ByCategory'])
+        assert stats['ByCategory']['mode'] == 'incremental'
+        assert stats['ByCategory']['computed'] < 10
+        check(materializer)
+        assert ['Docs/a.pdf'] == [m['target_path'] for m in materializer.iter_view('ByCategory')
+                                  if m['source_path'] == '/new/a.pdf']
+        materializer.close()
+
+        # Editing a view's rules forces a full refresh of that view only
+        rules['views']['ByCategory']['rules'][0]['target'] = 'Documents/{name}'
+        rules_path.write_text(yaml.safe_dump(rules), encoding='utf-8')
+        materializer = ViewMaterializer(db_path, str(rules_path))
+        assert [v['stale'] for v in materializer.status()] == [True, False]
+        try:
+            materializer.iter_view('ByCategory')
+            assert False, "expected ValueError for stale mappings"
+        except ValueError as e:
+            assert 'stale' in str(e)
+        stats = materializer.refresh(['ByCategory'])
+        assert stats['ByCategory']['reason'] == 'rules changed'
+        check(materializer)
+        materializer.close()
+        print("✓ Materialized views test passed")
+
+def test_template_renderer_date_cache():
+    import random
+    import time
+    from datetime import datetime
+    from rule_compiler import build_renderer, sanitize
+    render = build_renderer("Date/{year}/{month}/{month_name}/{day}//{name}/{category}")
+    rng = random.Random(7)
+    now = time.time()
+    # Many files per day share one cached decomposition; the result must
+    # still match a datetime conversion of each timestamp
+    for created in [now - rng.uniform(0, 4000) * 86400 for _ in range(2000)] + [-86399.5, 1.0]:
+        dt = datetime.fromtimestamp(created)
+        expected = f"Date/{dt:%Y}/{dt:%m}/{dt:%B}/{dt:%d}/a_b_c.txt/x_y"
+        assert render({'created': created, 'name': 'a:b?c.txt', 'category': 'x/y'}) == expected
+    assert render({'created': None, 'name': 'n'}) == "Date/Unknown/00/Unknown/00/n"
+    assert render({'created': float('nan'), 'name': 'n', 'category': 3}) == "Date/Unknown/00/Unknown/00/n/3"
+    assert sanitize('<>:"/\\|?*Í') == '_________Í'
+    print("✓ Template renderer test passed")
+
 def test_categorize():
     with tempfile.TemporaryDirectory() as tmp:
         tmp_path = Path(tmp)
@@ -67,6 +1077,73 @@ def test_categorize():
         conn.close()
         print("✓ Categorization test passed")
 
+def test_bulk_categorize_matches_per_row():
+    import yaml
+    with open(Path(__file__).parent.parent / 'config' / 'categories.yaml', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+    default = config.get('default', {'category': 'Miscellaneous', 'subcategory': 'Unknown'})
+    # An extension mapped to the default pair still tries the filename patterns
+    config['mapping']['unk'] = dict(default)
+    config['mapping']['UPPER'] = {'category': 'Never', 'subcategory': 'Matched'}
+    names = ['report.PDF', 'Screenshot 1.xyz', 'screenshot.unk', 'invoice.pdf', 'notes', '.bashrc',
+             'archive.tar.gz', 'photo.JPG', 'cad drawing.bak', 'project plan', 'data.', 'x.upper',
+             'resume.Unk', 'diagram.DWG', 'weird.ñame']
+    paths = [f"/share/dir{i}/{name}" for i, name in enumerate(names)] + [
+        "C:\\Users\\me\\invoice.docx", "/share/dir.d/README"]
+    with tempfile.TemporaryDirectory() as tmp:
+        config_path = Path(tmp) / 'categories.yaml'
+        config_path.write_text(yaml.safe_dump(config), encoding='utf-8')
+        cat = Categorizer(str(config_path))
+        results = []
+        for bulk in (False, True):
+            conn = sqlite3.connect(str(Path(tmp) / f"bulk{bulk}.db"))
+            conn.execute("CREATE TABLE files (id INTEGER PRIMARY KEY, path TEXT, extension TEXT, "
+                         "category TEXT, subcategory TEXT, indexed_at TIMESTAMP)")
+            # The extension as the scanner stores it, without the dot (as other
+            # writers may store it) or left out
+            suffixes = [PurePosixPath(p).suffix for p in paths]
+            extensions = [[None, suffix.lower() or None, suffix[1:] or None][i % 3]
+                          for i, suffix in enumerate(suffixes)]
+            conn.executemany("INSERT INTO files (path, extension) VALUES (?, ?)", zip(paths, extensions))
+            conn.execute("UPDATE files SET category = 'Kept', subcategory = 'Kept' WHERE id = 1")
+            assert cat.update_database(conn, bulk=bulk) == len(paths) - 1
+            results.append(conn.execute("SELECT path, category, subcategory FROM files ORDER BY id").fetchall())
+            assert conn.execute("SELECT COUNT(*) FROM files WHERE indexed_at IS NULL").fetchone()[0] == 1
+            conn.close()
+        assert results[0] == results[1]
+        categorized = {path.rsplit('/', 1)[-1]: (c, s) for path, c, s in results[1]}
+        assert categorized['screenshot.unk'] == ('Images', 'Screenshots')
+        assert categorized['x.upper'] == (default['category'], default['subcategory'])
+        print("✓ Bulk categorization test passed")
+
+def test_filename_patterns():
+    import yaml
+    cat = Categorizer(str(Path(__file__).parent.parent / 'config' / 'categories.yaml'))
+    # Keywords are found anywhere in the name, not only at its start
+    assert cat.categorize_by_filename('Q3 report.xyz') == ('Documents', 'Reports')
+    assert cat.categorize_by_filename('final-Invoice-2024') == ('Documents', 'Invoices')
+    # Earlier patterns win regardless of where they occur
+    assert cat.categorize_by_filename('report screenshot.xyz') == ('Images', 'Screenshots')
+    # Whole words only
+    assert cat.categorize_by_filename('cascade.xyz') is None
+    assert cat.categorize_by_filename('my_report.xyz') is None
+    with tempfile.TemporaryDirectory() as tmp:
+        config_path = Path(tmp) / 'categories.yaml'
+        config_path.write_text(yaml.safe_dump({
+            'mapping': {},
+            'default': {'category': 'Misc', 'subcategory': 'Unknown'},
+            'filename_patterns': [
+                {'pattern': r'^IMG_\d+', 'category': 'Images', 'subcategory': 'Camera'},
+                {'keywords': ['meeting notes', 'minutes'], 'category': 'Documents'},
+            ],
+        }), encoding='utf-8')
+        custom = Categorizer(str(config_path))
+        assert custom.categorize_by_filename('IMG_0042 minutes') == ('Images', 'Camera')
+        assert custom.categorize_by_filename('Team Meeting Notes') == ('Documents', 'Unknown')
+        assert custom.categorize_by_filename('meeting agenda notes') is None
+        assert custom.categorize(Path('/x/screenshot.bin')) == ('Misc', 'Unknown')
+    print("✓ Filename pattern test passed")
+
 def test_rule_engine():
     # Create a simple rule file
     import yaml
@@ -155,7 +1232,34 @@ def test_view_generator():
 if __name__ == '__main__':
     print("Running integration tests...")
     test_scan()
+    test_scan_streams_nested_tree()
+    test_scan_parallel_workers()
+    test_scan_failed_flush_marks_run_interrupted()
+    test_scan_resume_after_crash()
+    test_incremental_rescan()
+    test_scan_hash_stage()
+    test_hash_backends_agree()
+    test_hash_pipeline_survives_unexpected_errors()
+    test_staged_duplicate_detection()
+    test_fingerprint_duplicates()
+    test_connection_profiles_allow_concurrent_reads()
+    test_schema_migrates_legacy_database()
+    test_hot_queries_use_indexes()
+    test_rule_engines_agree()
+    test_vectorized_rules_agree()
+    test_parallel_generation_matches_serial()
+    test_streamed_mappings_roundtrip()
+    test_materialized_views_refresh_incrementally()
+    test_template_renderer_date_cache()
     test_categorize()
+    test_bulk_categorize_matches_per_row()
+    test_filename_patterns()
+    test_link_sync_applies_only_changes()
+    test_parallel_link_creation()
+    test_interrupted_link_run_recovers()
+    test_rollback_single_run()
+    test_link_log_survives_full_rescan()
+    test_link_log_migration_and_compaction()
     test_rule_engine()
     test_view_generator()
     print("All tests passed!")
\ No newline at end of file
@@ -9,6 +9,8 @@ import sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
 from scanner import FileScanner
+from connection import connect
+from schema import ensure_schema
 
 app = Flask(__name__)
 
@@ -16,8 +18,21 @@ app = Flask(__name__)
 DATABASE = str(Path(__file__).parent.parent / "catalog.db")  # absolute path
 VIEWS_ROOT = "./_Views"  # relative to current working directory
 
+def migrate_db():
+    # get_db connections are query_only, so a legacy catalog is migrated once up front
+    if not os.path.exists(DATABASE):
+        return
+    conn = connect(DATABASE, 'bulk')
+    try:
+        ensure_schema(conn)
+    finally:
+        conn.close()
+
+migrate_db()
+
 def get_db():
-    conn = sqlite3.connect(DATABASE)
+    # Read-only profile: WAL lets searches run while a scan is writing
+    conn = connect(DATABASE, 'read')
     conn.row_factory = sqlite3.Row
     return conn
 
@@ -49,8 +64,8 @@ def search():
     conn = get_db()
     cursor = conn.cursor()
     
-    # Build WHERE clause
-    conditions = []
+    # Build WHERE clause (files flagged by an incremental scan as gone are hidden)
+    conditions = ["deleted_at IS NULL"]
     params = []
     
     if query:
@@ -81,7 +96,7 @@ def search():
         except ValueError:
             return jsonify({'error': 'Invalid size_max parameter'}), 400
     
-    where_clause = " AND ".join(conditions) if conditions else "1"
+    where_clause = " AND ".join(conditions)
 
     try:
         # Get total count
@@ -121,7 +136,7 @@ def categories():
     conn = get_db()
     try:
         cursor = conn.cursor()
-        cursor.execute("SELECT DISTINCT category FROM files WHERE category IS NOT NULL ORDER BY category")
+        cursor.execute("SELECT DISTINCT category FROM files WHERE category IS NOT NULL AND deleted_at IS NULL ORDER BY category")
         categories = [row[0] for row in cursor.fetchall()]
         return jsonify(categories)
     except Exception as e:
@@ -135,7 +150,7 @@ def extensions():
     conn = get_db()
     try:
         cursor = conn.cursor()
-        cursor.execute("SELECT DISTINCT extension FROM files WHERE extension IS NOT NULL ORDER BY extension")
+        cursor.execute("SELECT DISTINCT extension FROM files WHERE extension IS NOT NULL AND deleted_at IS NULL ORDER BY extension")
         extensions = [row[0] for row in cursor.fetchall()]
         return jsonify(extensions)
     except Exception as e:
@@ -147,14 +162,20 @@ def extensions():
 
 @app.route('/api/duplicates')
 def duplicates():
+    # Group by SHA‑256 (default) or by the fast fingerprint column
+    by = request.args.get('by', 'sha256')
+    columns = {'sha256': 'hash_sha256', 'fingerprint': 'fingerprint'}
+    if by not in columns:
+        return jsonify({'error': 'Parameter "by" must be "sha256" or "fingerprint"'}), 400
+    column = columns[by]
     conn = get_db()
     try:
         cursor = conn.cursor()
-        cursor.execute("""
-            SELECT hash_sha256, GROUP_CONCAT(path) as paths, COUNT(*) as count
+        cursor.execute(f"""
+            SELECT {column}, GROUP_CONCAT(path) as paths, COUNT(*) as count
             FROM files
-            WHERE hash_sha256 IS NOT NULL
-            GROUP BY hash_sha256
+            WHERE {column} IS NOT NULL AND deleted_at IS NULL
+            GROUP BY {column}
             HAVING COUNT(*) > 1
             LIMIT 50
         """)
@@ -173,6 +194,60 @@ def duplicates():
     finally:
         conn.close()
 
+@app.route('/api/views')
+def views():
+    # Views stored by the materialize command
+    conn = get_db()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT v.name, v.description, v.materialized_at,
+                   (SELECT COUNT(*) FROM view_mappings m WHERE m.view_name = v.name) AS mappings
+            FROM views v
+            WHERE v.materialized_at IS NOT NULL
+            ORDER BY v.name
+        """)
+        return jsonify([dict(row) for row in cursor.fetchall()])
+    except Exception as e:
+        logger.error(f"Database error in views: {e}")
+        return jsonify({'error': 'Failed to retrieve views'}), 500
+    finally:
+        conn.close()
+
+@app.route('/api/views/<name>')
+def view_mappings(name):
+    # Keyset pagination on the (view_name, file_id) primary key: pass the
+    # returned "next" value as "after" to get the following page
+    try:
+        limit = int(request.args.get('limit', 100))
+        after = int(request.args.get('after', 0))
+        if limit < 1 or limit > 1000:
+            return jsonify({'error': 'Limit must be between 1 and 1000'}), 400
+    except ValueError as e:
+        return jsonify({'error': f'Invalid numeric parameter: {str(e)}'}), 400
+    conn = get_db()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT m.file_id, f.path AS source_path, m.target_path, m.rule_index, m.computed_at
+            FROM view_mappings m
+            JOIN files f ON f.id = m.file_id
+            WHERE m.view_name = ? AND m.file_id > ? AND f.deleted_at IS NULL
+            ORDER BY m.file_id
+            LIMIT ?
+        """, (name, after, limit))
+        mappings = [dict(row) for row in cursor.fetchall()]
+        return jsonify({
+            'view': name,
+            'mappings': mappings,
+            'next': mappings[-1]['file_id'] if len(mappings) == limit else None
+        })
+    except Exception as e:
+        logger.error(f"Database error in view_mappings: {e}")
+        return jsonify({'error': 'Failed to retrieve view mappings'}), 500
+    finally:
+        conn.close()
+
 @app.route('/api/scan', methods=['POST'])
 def scan():
     data = request.get_json()
@@ -182,6 +257,8 @@ def scan():
     if not root:
         return jsonify({'error': 'Missing "root" directory'}), 400
     compute_hash = data.get('compute_hash', False)
+    incremental = data.get('incremental', False)
+    fingerprint = data.get('fingerprint') or None
     ignore_extensions = data.get('ignore_extensions', [])
     # Convert space-separated strings to list of extensions with dot
     if isinstance(ignore_extensions, str):
@@ -196,7 +273,9 @@ def scan():
         return jsonify({'error': 'Path is not a directory'}), 400
     try:
         scanner = FileScanner(DATABASE)
-        result = scanner.scan(str(root_path), compute_hash=compute_hash, extensions_ignore=ignore_extensions)
+        result = scanner.scan(str(root_path), compute_hash=compute_hash,
+                              extensions_ignore=ignore_extensions, incremental=incremental,
+                              fingerprint=fingerprint)
         scanner.close()
         return jsonify({
             'success': True,